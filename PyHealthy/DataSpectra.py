@@ -10,7 +10,7 @@ from typing import Optional
 import customtkinter as ctk
 import threading
 import math
-from datetime import datetime
+from datetime import datetime, timedelta
 import shutil
 import requests
 import ctypes
@@ -24,7 +24,25 @@ from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from openpyxl.utils import get_column_letter
 import json
 import traceback
+from itertools import chain
 from supabase.lib.client_options import ClientOptions
+import motor_plantillas
+import replay_pantalla
+import telemetria
+import driver_tecfood
+import proceso_facturas
+import bitacora
+import perfiles_tiempo
+import validacion_facturas
+import planificador
+import simulador
+import indice_pdf
+import coordinador
+import trazas
+import carga_supabase
+import espejo_local
+import armado_facturas
+from driver_tecfood import buscar_y_click, buscar_y_click_primero, esperar_pantalla
 
 # === CONFIGURACIÓN ===
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -45,6 +63,13 @@ import requests
 TEMP_PDF_DIR = Path("PDF_Descargados")
 TEMP_PDF_DIR.mkdir(exist_ok=True)
 
+# Precargar plantillas de botones una sola vez (NumPy en escala de grises)
+# y recuperar la última posición conocida de cada botón
+motor_plantillas.cargar_plantillas(CARPETA_BOTONES)
+motor_plantillas.cargar_regiones()
+# Topes de espera aprendidos en este equipo (perfiles_tiempo.json)
+perfiles_tiempo.cargar_perfiles()
+
 # Estados de procesamiento
 ESTADO_PENDIENTE = "pendiente"
 ESTADO_PROCESANDO = "procesando"
@@ -53,10 +78,53 @@ ESTADO_COMPLETADO = "completado"
 ESTADO_ERROR = "error"
 
 MAX_INTENTOS = 3
+# Facturas que se reclaman por llamada al RPC (Scrpts SQL/07_reclamar_facturas_rpc.sql)
+RPC_RECLAMAR_FACTURAS = "reclamar_facturas_pendientes"
+TAM_LOTE_RECLAMO = 50
+
+# Backend para manejar TecFood: "imagenes" (pyautogui + plantillas) o "dom"
+# (Edge controlado por DevTools con selectores; ver driver_tecfood.py)
+DRIVER_TECFOOD = "imagenes"
+# Entrada de productos con el driver por imágenes: "imagenes" o "teclado"
+# (una búsqueda por factura + secuencias de teclas; ver driver_tecfood.py)
+MODO_PRODUCTOS = "imagenes"
+CARPETA_PDF_FACTURAS = r"C:\Users\Maicol Hernandez\Documents\GitHub\PyHealthy\PDF"
+# Validación previa: las facturas sin PDF quedan fuera de la cola
+PDF_OBLIGATORIO = True
+CARPETA_VALIDACIONES = os.path.join(BASE_DIR, "Validaciones")
+# Índice NIT/ID → PDF de las dos carpetas (se re-escanea solo si cambian)
+indice_pdfs = indice_pdf.IndicePDF([CARPETA_PDF_FACTURAS, TEMP_PDF_DIR])
+
+# Grabar capturas y clics/teclas de cada ejecución para reproducirlas sin TecFood
+GRABAR_SESION = False
+CARPETA_GRABACIONES = os.path.join(BASE_DIR, "Grabaciones")
+grabador_sesion = None
+
+# Histogramas de latencia por botón (JSON + CSV al final de cada ejecución)
+CARPETA_TELEMETRIA = os.path.join(BASE_DIR, "Telemetria")
+# Trazas por factura/paso/producto/espera (JSON para Perfetto o chrome://tracing)
+CARPETA_TRAZAS = os.path.join(BASE_DIR, "Trazas")
+
+# Bitácora de avance por factura/producto para reanudar tras un fallo
+CARPETA_BITACORAS = os.path.join(BASE_DIR, "Bitacoras")
+
+# Copia local (SQLite) de facturas, items, proveedores y catálogo: la carga abre con
+# ella al instante y sincroniza los cambios en segundo plano
+USAR_ESPEJO_LOCAL = True
+ARCHIVO_ESPEJO = os.path.join(BASE_DIR, "espejo_supabase.sqlite")
+espejo = espejo_local.EspejoLocal(ARCHIVO_ESPEJO) if USAR_ESPEJO_LOCAL else None
+
+# Sesiones paralelas (una por grupo de unidades; ver coordinador.py). Con el
+# driver por imágenes solo hay un escritorio, así que requiere DRIVER_TECFOOD = "dom"
+# o XVFB_TRABAJADORES en Linux
+TRABAJADORES_PARALELOS = 1
+XVFB_TRABAJADORES = False
 
 # === VARIABLES GLOBALES ===
 archivo_excel = None
 df_facturas = pd.DataFrame()
+# Productos de todas las facturas, una fila por producto, indexados por N° Factura
+items_facturas = pd.DataFrame(columns=armado_facturas.COLUMNAS_PRODUCTO)
 productos_por_factura = {}
 codigo_clinica = ""
 origen_datos = ""
@@ -1325,9 +1393,12 @@ def descargar_informes_inventario():
     
     def _proceso_descarga():
         try:
+            iniciar_grabacion("inventario")
+            telemetria.reiniciar_telemetria()
+            trazas.iniciar_trazas()
             print("🔗 Abriendo sistema de inventario en Edge...")
             subprocess.Popen(["C:/Program Files (x86)/Microsoft/Edge/Application/msedge.exe", URL_RETIRADA])
-            time.sleep(12)
+            esperar_pantalla(12, ventana_estable=2.0)
             
             # Limpiar descargas anteriores
             limpiar_carpeta_descargas()
@@ -1340,7 +1411,11 @@ def descargar_informes_inventario():
             archivos_descargados = []
             
             # Proceso para descargar 9 informes (uno por cada clínica)
+            traza_clinica = None
             for i, codigo_clinica in enumerate(CODIGOS_CLINICAS):
+                # El tramo de la clínica anterior termina aquí aunque haya salido con continue
+                trazas.cerrar(traza_clinica)
+                traza_clinica = trazas.abrir(f"informe {codigo_clinica}", "informe", posicion=i + 1)
                 print(f"\n{'='*50}")
                 print(f"📥 DESCARGANDO INFORME {i+1}/9 - CLÍNICA {codigo_clinica}")
                 print(f"{'='*50}")
@@ -1351,9 +1426,9 @@ def descargar_informes_inventario():
                     continue
                 
                 try:
-                    time.sleep(2)
+                    esperar_pantalla(2)
                     pyautogui.typewrite(codigo_clinica)
-                    time.sleep(3)
+                    esperar_pantalla(3, requiere_cambio=True)
                     x, y = pyautogui.position()
                     pyautogui.moveTo(x, y + 50)
                     pyautogui.click()
@@ -1362,16 +1437,16 @@ def descargar_informes_inventario():
                     print(f"❌ Error al ingresar código de clínica {codigo_clinica}: {e}")
                     continue
                 
-                time.sleep(3)
+                esperar_pantalla(3)
                 
                 # Llenar los campos necesarios para el informe
                 if not buscar_y_click("tipo_costo.png", "tipo_costo", intentos=3):
                     print(f"❌ No se encontró 'tipo_costo.png' para clínica {codigo_clinica}")
                     continue
                 
-                time.sleep(2)
+                esperar_pantalla(2)
                 pyautogui.typewrite("01")
-                time.sleep(3)
+                esperar_pantalla(3, requiere_cambio=True)
                 x, y = pyautogui.position()
                 pyautogui.moveTo(x, y + 40)
                 pyautogui.click()
@@ -1381,7 +1456,7 @@ def descargar_informes_inventario():
                     print(f"❌ No se encontró 'nivel_totalizacion.png' para clínica {codigo_clinica}")
                     continue
                 
-                time.sleep(3)
+                esperar_pantalla(3, requiere_cambio=True)
                 x, y = pyautogui.position()
                 pyautogui.moveTo(x, y + 40)
                 pyautogui.click()
@@ -1391,9 +1466,9 @@ def descargar_informes_inventario():
                     print(f"❌ No se encontró 'producto_inicial.png' para clínica {codigo_clinica}")
                     continue
                 
-                time.sleep(2)
+                esperar_pantalla(2)
                 pyautogui.typewrite("1")
-                time.sleep(3)
+                esperar_pantalla(3, requiere_cambio=True)
                 x, y = pyautogui.position()
                 pyautogui.moveTo(x, y + 40)
                 pyautogui.click()
@@ -1403,9 +1478,9 @@ def descargar_informes_inventario():
                     print(f"❌ No se encontró 'producto_final.png' para clínica {codigo_clinica}")
                     continue
                 
-                time.sleep(2)
+                esperar_pantalla(2)
                 pyautogui.typewrite("5")
-                time.sleep(3)
+                esperar_pantalla(3, requiere_cambio=True)
                 x, y = pyautogui.position()
                 pyautogui.moveTo(x, y + 40)
                 pyautogui.click()
@@ -1427,7 +1502,7 @@ def descargar_informes_inventario():
                 
                 # Esperar a que se complete la descarga
                 print("⏳ Esperando a que se complete la descarga...")
-                time.sleep(3)
+                esperar_pantalla(3)
                 
                 # Buscar el archivo descargado
                 archivo_descargado = esperar_archivo_descargado(carpeta_descargas, tiempo_maximo=5)
@@ -1453,13 +1528,14 @@ def descargar_informes_inventario():
                     print("🔄 Recargando página para siguiente clínica...")
                     try:
                         pyautogui.hotkey("ctrl", "r")
-                        time.sleep(7)
+                        esperar_pantalla(7, requiere_cambio=True, ventana_estable=1.5)
                     except Exception:
                         try:
                             pyautogui.press("f5")
-                            time.sleep(7)
+                            esperar_pantalla(7, requiere_cambio=True, ventana_estable=1.5)
                         except Exception:
                             pass
+            trazas.cerrar(traza_clinica)
             
             # RESUMEN FINAL
             print(f"\n{'='*60}")
@@ -1492,6 +1568,9 @@ def descargar_informes_inventario():
             print(f"❌ Error en descarga de informes: {e}")
             mostrar_toast(f"Error en descarga de informes:\n{e}", tipo="error", titulo="Error")
         finally:
+            detener_grabacion()
+            telemetria.exportar_telemetria(CARPETA_TELEMETRIA, "inventario")
+            trazas.exportar_trazas(CARPETA_TRAZAS, "inventario")
             # Reactivar botón de descargar
             root.after(0, lambda: btn_descargar_informes.configure(state="normal"))
             print("🔄 Botón 'Descargar Informes' REACTIVADO")
@@ -1654,140 +1733,44 @@ def actualizar_tabla_inventario():
 
 # FUNCIONES AUXILIARES ORIGINALES 
 
-def buscar_y_click(imagen, nombre, confianza=0.9, intentos=3, esperar=5):
-    # Resolver ruta absoluta (CLAVE)
-    ruta_imagen = os.path.abspath(os.path.join(CARPETA_BOTONES, imagen))
-    inicio_total = time.time()
-
-    # Validación temprana (evita 100 warnings inútiles)
-    if not os.path.isfile(ruta_imagen):
-        print(f"❌ Imagen no encontrada: {ruta_imagen}")
-        return False
-
-    pyautogui.FAILSAFE = True
-    pyautogui.PAUSE = 0.1
-
-    for i in range(intentos):
-        print(f"🔎 Buscando botón '{nombre}' (Intento {i+1}/{intentos})...")
-
-        tiempo_inicio_intento = time.time()
-        ubicacion_estable = None
-        frames_estables = 0
-
-        while time.time() - tiempo_inicio_intento < esperar:
-            try:
-                ubicacion = pyautogui.locateCenterOnScreen(
-                    ruta_imagen,
-                    confidence=max(confianza - 0.15, 0.6),
-                    grayscale=True
-                )
-
-                if ubicacion:
-                    if ubicacion_estable:
-                        dx = abs(ubicacion.x - ubicacion_estable.x)
-                        dy = abs(ubicacion.y - ubicacion_estable.y)
-
-                        if dx < 4 and dy < 4:
-                            frames_estables += 1
-                        else:
-                            frames_estables = 1
-                            ubicacion_estable = ubicacion
-                    else:
-                        ubicacion_estable = ubicacion
-                        frames_estables = 1
-
-                    if frames_estables >= 3:
-                        pyautogui.moveTo(ubicacion_estable, duration=0.25)
-                        pyautogui.click()
-                        print(f"✅ Botón '{nombre}' encontrado y clickeado.")
-                        return True
-                else:
-                    frames_estables = 0
-                    ubicacion_estable = None
-
-            except Exception:
-                pass
-
-            time.sleep(0.3)
-
-        print("⚠️ No encontrado en este intento, reintentando...")
+def iniciar_grabacion(nombre_proceso):
+    """Inicia la grabación de la sesión si GRABAR_SESION está activo"""
+    global grabador_sesion
+    if not GRABAR_SESION or grabador_sesion is not None:
+        return
+    carpeta = os.path.join(CARPETA_GRABACIONES, f"{nombre_proceso}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    grabador_sesion = replay_pantalla.GrabadorSesion(carpeta)
+    grabador_sesion.iniciar()
 
-    print(
-        f"❌ No se encontró el botón '{nombre}' tras {intentos} intentos "
-        f"({int(time.time() - inicio_total)}s)."
-    )
-    return False
+def detener_grabacion():
+    global grabador_sesion
+    if grabador_sesion is not None:
+        grabador_sesion.detener()
+        grabador_sesion = None
 
 # ============================================================
 # FUNCIONES DE AUTOMATIZACIÓN DESDE SUPABASE
 # ============================================================
 
-def obtener_facturas_pendientes_supabase():
-    """Obtiene facturas con estado_procesamiento = 'pendiente'"""
+def obtener_facturas_pendientes_supabase(limite=TAM_LOTE_RECLAMO):
+    """
+    Reclama el siguiente lote de facturas pendientes (ver Scrpts SQL/07_reclamar_facturas_rpc.sql):
+    en una sola llamada quedan en 'procesando' con un intento más, de modo
+    que otro equipo procesando a la vez no las toma. Devuelve las facturas
+    con proveedores {nombre, nit}.
+    """
     try:
-        print("\n" + "="*60)
-        print("🔍 DEBUG: Buscando facturas pendientes en Supabase...")
-        print(f"   Estado buscado: '{ESTADO_PENDIENTE}'")
-        print(f"   Max intentos: {MAX_INTENTOS}")
-        print("="*60)
-        
-        # PRUEBA 1: Contar TODAS las facturas
-        response_total = supabase.table('facturas').select('id', count='exact').execute()
-        print(f"📊 Total de facturas en la tabla: {response_total.count}")
-        
-        # PRUEBA 2: Contar facturas con estado_procesamiento = 'pendiente'
-        response_pendientes = supabase.table('facturas') \
-            .select('id', count='exact') \
-            .eq('estado_procesamiento', 'pendiente') \
-            .execute()
-        print(f"📊 Facturas con estado 'pendiente': {response_pendientes.count}")
-        
-        # PRUEBA 3: Ver los valores REALES de estado_procesamiento
-        response_estados = supabase.table('facturas') \
-            .select('id, numero_factura, estado_procesamiento, intentos_procesamiento') \
-            .limit(5) \
-            .execute()
-        
-        print(f"\n📋 Muestra de estados reales en BD:")
-        for f in response_estados.data:
-            print(f"   ID: {f['id']} | Factura: {f['numero_factura']} | Estado: '{f.get('estado_procesamiento')}' | Intentos: {f.get('intentos_procesamiento')}")
-        
-        # CONSULTA ORIGINAL (con debugging)
-        print(f"\n🔎 Ejecutando consulta original...")
-        response = supabase.table('facturas') \
-            .select('id, numero_factura, pdf_url, codigo_unidad, valor_total, fecha_factura, intentos_procesamiento, proveedores(nombre, nit)') \
-            .eq('estado_procesamiento', ESTADO_PENDIENTE) \
-            .lt('intentos_procesamiento', MAX_INTENTOS) \
-            .order('created_at', desc=False) \
-            .execute()
-        
-        facturas = response.data
-        print(f"✅ Resultado: {len(facturas)} facturas encontradas con la consulta completa")
-        
-        # Si no encontró nada, probar SIN el filtro de intentos
-        if len(facturas) == 0:
-            print(f"\n⚠️ No se encontraron facturas con la consulta completa")
-            print(f"🔄 Probando SIN el filtro de intentos_procesamiento...")
-            
-            response_sin_filtro = supabase.table('facturas') \
-                .select('id, numero_factura, pdf_url, codigo_unidad, valor_total, fecha_factura, intentos_procesamiento, proveedores(nombre, nit)') \
-                .eq('estado_procesamiento', 'pendiente') \
-                .order('created_at', desc=False) \
-                .execute()
-            
-            facturas_sin_filtro = response_sin_filtro.data
-            print(f"📊 Facturas encontradas SIN filtro de intentos: {len(facturas_sin_filtro)}")
-            
-            if len(facturas_sin_filtro) > 0:
-                print(f"⚠️ PROBLEMA DETECTADO: El filtro de 'intentos_procesamiento' está bloqueando")
-                print(f"   Usando facturas sin filtro de intentos...")
-                facturas = facturas_sin_filtro
-        
-        print(f"\n{'='*60}")
+        print(f"🔍 Reclamando hasta {limite} facturas pendientes (max intentos: {MAX_INTENTOS})...")
+        response = supabase.rpc(RPC_RECLAMAR_FACTURAS, {
+            "p_limite": limite,
+            "p_max_intentos": MAX_INTENTOS,
+        }).execute()
+        facturas = response.data or []
+        print(f"✅ {len(facturas)} facturas reclamadas")
         return facturas
     
     except Exception as e:
-        print(f"❌ Error al obtener facturas: {e}")
+        print(f"❌ Error al reclamar facturas: {e}")
         import traceback
         print(f"Stack trace completo:")
         traceback.print_exc()
@@ -1850,19 +1833,9 @@ def limpiar_pdfs_temporales():
 
 
 def actualizar_estado_factura_supabase(factura_id, estado, error=None):
-    """Actualiza el estado de procesamiento en la BD"""
+    """Actualiza el estado de procesamiento en la BD (el intento ya lo contó el reclamo)"""
     try:
-        factura = supabase.table('facturas') \
-            .select('intentos_procesamiento') \
-            .eq('id', factura_id) \
-            .execute()
-        
-        intentos_actual = factura.data[0]['intentos_procesamiento'] if factura.data else 0
-        
-        datos = {
-            'estado_procesamiento': estado,
-            'intentos_procesamiento': intentos_actual + 1
-        }
+        datos = {'estado_procesamiento': estado}
         
         if estado == ESTADO_COMPLETADO:
             from datetime import datetime
@@ -1916,9 +1889,7 @@ def procesar_facturas_pendientes_automatico():
                 pdf_path = None
                 
                 try:
-                    # Actualizar a "procesando"
-                    actualizar_estado_factura_supabase(factura_id, ESTADO_PROCESANDO)
-                    
+                    # Ya está en "procesando": la reclamó obtener_facturas_pendientes_supabase
                     # Descargar PDF
                     if pdf_url:
                         pdf_path = descargar_pdf_desde_supabase(pdf_url, factura_id)
@@ -1965,114 +1936,175 @@ def procesar_facturas_pendientes_automatico():
 
 
 
-def cargar_datos_desde_supabase():
-    global df_facturas, productos_por_factura, codigo_clinica, origen_datos
+# Estados de procesamiento que ofrece el diálogo de carga ("Todos" = sin filtro)
+ESTADOS_CARGA = ["Todos", ESTADO_PENDIENTE, ESTADO_PROCESANDO, ESTADO_SUBIENDO_TECFOOD, ESTADO_COMPLETADO, ESTADO_ERROR]
+DIAS_RANGO_CARGA = 30
+
+def pedir_filtros_supabase():
+    """Diálogo de carga: unidad, rango de fecha_factura y estado, aplicados en el servidor"""
+    win = ctk.CTkToplevel(root)
+    win.title("Cargar facturas desde Supabase")
+    win.resizable(False, False)
+    win.configure(fg_color="#0F1724")
+    win.attributes("-topmost", True)
+    win.grab_set()
+
+    win.update_idletasks()
+    W, H = 460, 430
+    x = (win.winfo_screenwidth() // 2) - (W // 2)
+    y = (win.winfo_screenheight() // 2) - (H // 2)
+    win.geometry(f"{W}x{H}+{x}+{y}")
+
+    card = ctk.CTkFrame(win, fg_color=CARD_BG, corner_radius=20)
+    card.pack(fill="both", expand=True, padx=20, pady=20)
+    contenido = ctk.CTkFrame(card, fg_color="transparent")
+    contenido.pack(fill="both", expand=True, padx=25, pady=20)
+
+    ctk.CTkLabel(contenido, text="☁️ Cargar desde Supabase", font=("Segoe UI", 20, "bold"),
+                 text_color="white").pack(anchor="w")
+    ctk.CTkLabel(contenido, text="Solo se descargan las facturas que cumplen los filtros",
+                 font=("Segoe UI", 12), text_color="#AAB4C0").pack(anchor="w", pady=(2, 15))
+
+    ctk.CTkLabel(contenido, text="Unidad", font=("Segoe UI", 13, "bold"), text_color="white").pack(anchor="w")
+    combo_unidad = ctk.CTkComboBox(contenido, values=["Todas"] + CODIGOS_CLINICAS, width=200)
+    combo_unidad.set("Todas")
+    combo_unidad.pack(anchor="w", pady=(4, 12))
+
+    ctk.CTkLabel(contenido, text="Estado", font=("Segoe UI", 13, "bold"), text_color="white").pack(anchor="w")
+    combo_estado = ctk.CTkComboBox(contenido, values=ESTADOS_CARGA, width=200)
+    combo_estado.set(ESTADO_PENDIENTE)
+    combo_estado.pack(anchor="w", pady=(4, 12))
+
+    var_fechas = ctk.BooleanVar(value=False)
+    ctk.CTkCheckBox(contenido, text="Filtrar por fecha de factura", variable=var_fechas,
+                    font=("Segoe UI", 13, "bold"), text_color="white").pack(anchor="w")
+    fechas_frame = ctk.CTkFrame(contenido, fg_color="#111827", corner_radius=10)
+    fechas_frame.pack(fill="x", pady=(6, 15))
+    estilo_fecha = dict(width=12, background="#111827", foreground="white", borderwidth=0,
+                        date_pattern="dd/mm/yyyy", font=("Segoe UI", 11), justify="center")
+    ctk.CTkLabel(fechas_frame, text="Desde", text_color="#D1D5DB").pack(side="left", padx=(12, 6), pady=10)
+    fecha_desde = DateEntry(fechas_frame, **estilo_fecha)
+    fecha_desde.set_date(datetime.now() - timedelta(days=DIAS_RANGO_CARGA))
+    fecha_desde.pack(side="left", pady=10)
+    ctk.CTkLabel(fechas_frame, text="Hasta", text_color="#D1D5DB").pack(side="left", padx=(12, 6), pady=10)
+    fecha_hasta = DateEntry(fechas_frame, **estilo_fecha)
+    fecha_hasta.pack(side="left", pady=10)
+
+    def cargar():
+        unidad = combo_unidad.get().strip()
+        estado = combo_estado.get().strip()
+        filtros = {
+            "codigo_unidad": None if unidad in ("", "Todas") else unidad,
+            "estados": None if estado in ("", "Todos") else [estado],
+        }
+        if var_fechas.get():
+            filtros["fecha_desde"] = fecha_desde.get_date().isoformat()
+            filtros["fecha_hasta"] = fecha_hasta.get_date().isoformat()
+        win.destroy()
+        mostrar_toast("Cargando desde Supabase...", tipo="info", titulo="Supabase")
+        cargar_datos_desde_supabase(**filtros)
+
+    botones = ctk.CTkFrame(contenido, fg_color="transparent")
+    botones.pack(fill="x")
+    ctk.CTkButton(botones, text="Cargar", command=cargar, fg_color="#3B82F6", hover_color="#2563EB",
+                  corner_radius=10, font=("Segoe UI", 13, "bold"), height=40).pack(side="left", padx=(0, 10))
+    ctk.CTkButton(botones, text="Cancelar", command=win.destroy, fg_color="transparent", hover_color="#374151",
+                  border_width=1, border_color="#4B5563", text_color="#9CA3AF", corner_radius=10,
+                  font=("Segoe UI", 13), height=40).pack(side="left")
+
+def _tras_sincronizar_espejo(cambios, filtros, desde_espejo):
+    """Al terminar la sincronización en segundo plano, recarga la vista si hubo cambios"""
+    if cambios is None or not desde_espejo:
+        return
+    if sum(cambios.values()):
+        cargar_datos_desde_supabase(**filtros, sincronizar=False)
+        mostrar_toast(f"Espejo local actualizado ({sum(cambios.values())} filas nuevas o cambiadas)",
+                      tipo="info", titulo="Sincronización")
+
+def cargar_datos_desde_supabase(codigo_unidad=None, fecha_desde=None, fecha_hasta=None, estados=None,
+                                sincronizar=True):
+    """
+    Carga facturas e items desde Supabase. Los filtros (unidad, rango de
+    fecha_factura en 'YYYY-MM-DD', lista de estado_procesamiento) se aplican
+    en el servidor; sin filtros se carga la tabla completa. Con el espejo
+    local lleno se lee de él y la sincronización corre en segundo plano.
+    """
+    global df_facturas, items_facturas, productos_por_factura, codigo_clinica, origen_datos
 
     try:
         print("\n" + "="*60)
         print("🔄 Cargando datos desde Supabase...")
+        print(f"   Unidad: {codigo_unidad or 'todas'} | Fechas: {fecha_desde or '…'} a {fecha_hasta or '…'} | "
+              f"Estados: {', '.join(estados) if estados else 'todos'}")
         print("="*60)
         
-        # Obtener facturas con proveedores
-        facturas_response = supabase.table("facturas") \
-            .select("*, proveedores(nombre, nit)") \
-            .execute()
-        
-        # Obtener items con JOIN a catalogo_productos
-        items_response = supabase.table("factura_items") \
-            .select("*, catalogo_productos(codigo_arbol, nombre)") \
-            .execute()
-
-        print(f"📊 Facturas obtenidas: {len(facturas_response.data)}")
-        print(f"📦 Items obtenidos: {len(items_response.data)}")
-
-        if not facturas_response.data:
-            mostrar_toast("No se encontraron facturas en Supabase", tipo="warning", titulo="Sin datos")
-            return
-        
-        if not items_response.data:
-            mostrar_toast("No se encontraron items en Supabase", tipo="warning", titulo="Sin datos")
-            return
-
-        facturas = []
-        productos_por_factura = {}
+        filtros = {"codigo_unidad": codigo_unidad, "fecha_desde": fecha_desde,
+                   "fecha_hasta": fecha_hasta, "estados": estados}
+        desde_espejo = espejo is not None and espejo.tiene_datos()
+        if desde_espejo:
+            print(f"💾 Leyendo del espejo local ({ARCHIVO_ESPEJO})")
+            carga_facturas = espejo.facturas(**filtros)
+        else:
+            # Facturas con proveedores, filtradas en el servidor y por páginas de
+            # clave primaria (sin el corte de filas de PostgREST)
+            carga_facturas = carga_supabase.CargaPaginada(
+                supabase,
+                "facturas",
+                "*, proveedores(nombre, nit)",
+                filtrar=carga_supabase.filtros_facturas(**filtros)
+            )
 
-        # Obtener código de clínica del primer registro
-        if facturas_response.data:
-            codigo_clinica = str(facturas_response.data[0].get("codigo_unidad", "0000")).strip()
+        # Una tabla por columnas con el proveedor aplanado (proveedores.nombre / .nit),
+        # armada por bloques a medida que llegan las páginas
+        filas_facturas = iter(carga_facturas)
+        primera = next(filas_facturas, None)
+        if primera is not None:
+            filas_facturas = chain([primera], filas_facturas)
+            # Código de clínica: el filtrado o, sin filtro, el del primer registro
+            codigo_clinica = str(codigo_unidad or primera.get("codigo_unidad") or "").strip()
             if not codigo_clinica or codigo_clinica == "None":
                 codigo_clinica = "0000"
-        
-        print(f"🏥 Código de clínica detectado: {codigo_clinica}")
-
-        # Procesar facturas
-        for f in facturas_response.data:
-            factura_id = str(f["id"])
-            numero_factura = str(f["numero_factura"])
-            
-            # Obtener datos del proveedor
-            proveedor = f.get("proveedores", {})
-            if proveedor is None:
-                proveedor = {}
-            
-            nombre_proveedor = proveedor.get("nombre", "Sin nombre") if isinstance(proveedor, dict) else "Sin nombre"
-            nit_proveedor = proveedor.get("nit", "Sin NIT") if isinstance(proveedor, dict) else "Sin NIT"
-            
-            facturas.append({
-                "ID_Factura": factura_id,
-                "N° Factura": numero_factura,
-                "Fecha": str(f["fecha_factura"]),
-                "Empresa": nombre_proveedor,
-                "NIT": nit_proveedor
-            })
-            
-            # Inicializar lista de productos para esta factura
-            productos_por_factura[numero_factura] = []
-            
-            print(f"   ✅ Factura {numero_factura}: {nombre_proveedor} (NIT: {nit_proveedor})")
-
-        # Crear mapeo de ID a número de factura
-        facturas_por_id = {
-            str(f["id"]).strip(): str(f["numero_factura"]).strip()
-            for f in facturas_response.data
-        }
+            print(f"🏥 Código de clínica detectado: {codigo_clinica}")
+        facturas = armado_facturas.facturas_desde_supabase(filas_facturas, codigo_clinica)
 
-        # Procesar items (productos de cada factura)
-        productos_agregados = 0
-        for item in items_response.data:
-            factura_id = str(item.get("factura_id", "")).strip()
-            if not factura_id:
-                continue
-
-            numero_factura = facturas_por_id.get(factura_id)
-            if not numero_factura:
-                print(f"   ⚠️ Item sin factura válida: factura_id={factura_id}")
-                continue
-
-            if numero_factura not in productos_por_factura:
-                productos_por_factura[numero_factura] = []
-
-
-
-            # Obtener datos del catálogo de productos (JOIN)
-            catalogo = item.get("catalogo_productos", {})
-            if catalogo is None:
-                catalogo = {}
+        print(f"📊 Facturas obtenidas: {len(facturas)}")
+        if facturas.empty:
+            mostrar_toast("No se encontraron facturas en Supabase", tipo="warning", titulo="Sin datos")
+            return
 
-            codigo_producto = catalogo.get("codigo_arbol", "SIN CODIGO") if isinstance(catalogo, dict) else "SIN CODIGO"
-            nombre_producto = catalogo.get("nombre", "SIN NOMBRE") if isinstance(catalogo, dict) else "SIN NOMBRE"
+        # Items con JOIN a catalogo_productos, solo de las facturas cargadas
+        if desde_espejo:
+            carga_items = espejo.items(facturas["ID_Factura"])
+        else:
+            carga_items = carga_supabase.CargaPorIds(
+                supabase,
+                "factura_items",
+                "*, catalogo_productos(codigo_arbol, nombre)",
+                "factura_id",
+                facturas["ID_Factura"]
+            )
 
-            productos_por_factura[numero_factura].append({
-                "Código Producto": str(codigo_producto).strip(),
-                "Nombre Producto": str(nombre_producto).strip(),
-                "Cantidad": str(item.get("cantidad", "")).replace(",", ".").strip(),
-                "Precio": str(item.get("precio_unitario", "")).replace(",", ".").strip(),
-            })
+        items, huerfanos = armado_facturas.items_desde_supabase(carga_items, facturas)
+        if huerfanos:
+            print(f"   ⚠️ {huerfanos} items sin factura válida")
+        productos_agregados = len(items)
 
+        print(f"📦 Items obtenidos: {productos_agregados + huerfanos}")
+        if not productos_agregados + huerfanos:
+            mostrar_toast("No se encontraron items en Supabase", tipo="warning", titulo="Sin datos")
+            return
 
-            productos_agregados += 1
+        diferencias = [] if desde_espejo else carga_facturas.diferencias + carga_items.diferencias
+        if diferencias:
+            mostrar_toast(
+                "La lectura no coincide con count=exact:\n" + "\n".join(diferencias[:3]),
+                tipo="warning",
+                titulo="Carga incompleta"
+            )
 
-        df_facturas = pd.DataFrame(facturas)
+        df_facturas = facturas
+        items_facturas = items
+        productos_por_factura = armado_facturas.productos_por_factura(items, facturas)
         origen_datos = "supabase"
 
         print(f"\n{'='*60}")
@@ -2084,8 +2116,8 @@ def cargar_datos_desde_supabase():
         print(f"{'='*60}\n")
 
         # Mostrar resumen por factura
-        for k, v in productos_por_factura.items():
-            print(f"   📄 Factura {k}: {len(v)} productos")
+        for numero, cantidad in armado_facturas.conteo_por_factura(items, facturas).items():
+            print(f"   📄 Factura {numero}: {cantidad} productos")
 
         # Actualizar interfaz
         actualizar_tabla_facturas()
@@ -2107,6 +2139,15 @@ def cargar_datos_desde_supabase():
             titulo="Datos cargados"
         )
 
+        # Trae al espejo lo nuevo de Supabase sin bloquear la interfaz
+        if espejo is not None and sincronizar:
+            espejo.sincronizar_en_segundo_plano(
+                supabase,
+                al_terminar=lambda cambios: root.after(
+                    0, lambda: _tras_sincronizar_espejo(cambios, filtros, desde_espejo)
+                )
+            )
+
     except Exception as e:
         print(f"❌ Error al cargar datos desde Supabase: {e}")
         import traceback
@@ -2122,59 +2163,19 @@ def cargar_datos_desde_excel():
         mostrar_toast("No se seleccionó ningún archivo.", tipo="warning", titulo="Aviso")
         return
 
-    global archivo_excel, df_facturas, productos_por_factura, codigo_clinica, origen_datos
+    global archivo_excel, df_facturas, items_facturas, productos_por_factura, codigo_clinica, origen_datos
     archivo_excel = archivo
 
     try:
         df = pd.read_excel(archivo, dtype=str).fillna("")
-        columnas_esperadas = [
-            "Tipo",
-            "N° Factura",
-            "Fecha",
-            "Empresa",
-            "NIT",
-            "Código Producto",
-            "Nombre Producto",
-            "Cantidad",
-            "Precio",
-        ]
-        for col in columnas_esperadas:
+        for col in armado_facturas.COLUMNAS_EXCEL:
             if col not in df.columns:
                 mostrar_toast(f"Falta la columna '{col}' en el archivo.", tipo="error", titulo="Error de formato")
                 return
 
-        facturas = []
-        productos_por_factura = {}
-        factura_actual = None
-
-        for _, fila in df.iterrows():
-            tipo = str(fila["Tipo"]).strip().upper()
-
-            if tipo == "FACTURA":
-                factura_actual = str(fila["N° Factura"]).strip()
-                if not factura_actual:
-                    continue
-                facturas.append(
-                    {
-                        "ID_Factura": factura_actual,
-                        "N° Factura": factura_actual,
-                        "Fecha": fila["Fecha"].strip(),
-                        "Empresa": fila["Empresa"].strip(),
-                        "NIT": fila["NIT"].strip(),
-                    }
-                )
-                productos_por_factura[factura_actual] = []
-            elif tipo == "PRODUCTO" and factura_actual:
-                productos_por_factura[factura_actual].append(
-                    {
-                        "Código Producto": str(fila["Código Producto"]).strip(),
-                        "Nombre Producto": str(fila["Nombre Producto"]).strip(),
-                        "Cantidad": str(fila["Cantidad"]).replace(",", ".").strip(),
-                        "Precio": str(fila["Precio"]).replace(",", ".").strip(),
-                    }
-                )
-
-        df_facturas = pd.DataFrame(facturas)
+        # Cada producto toma el número de la fila FACTURA anterior
+        df_facturas, items_facturas = armado_facturas.desde_excel(df)
+        productos_por_factura = armado_facturas.productos_por_factura(items_facturas, df_facturas)
         codigo_clinica = "".join(
             [c for c in os.path.basename(archivo) if c.isdigit()][-4:]
         )
@@ -2237,230 +2238,152 @@ def mostrar_productos(event):
     print(f"🧾 Factura seleccionada: {numero_factura}")
     print(f"📦 Productos encontrados: {len(productos)}")
 
-def iniciar_proceso():
+def buscar_pdf_factura(empresa, nit, factura_id=None):
+    """Busca el PDF de la factura: descargado de Supabase por ID, o por NIT + nombre de la empresa"""
+    # En Excel el ID es el número de factura y no corresponde a las descargas de Supabase
+    if origen_datos != "supabase":
+        factura_id = None
+    return indice_pdfs.buscar(empresa, nit, factura_id)
+
+def preparar_cola():
+    """Valida las facturas cargadas y devuelve (cola planificada, veredicto); cola None si no hay nada que correr"""
+    # Validación previa: solo se encolan las facturas que pueden completarse
+    veredicto = validacion_facturas.validar_facturas(
+        df_facturas,
+        items_facturas,
+        buscar_pdf=buscar_pdf_factura,
+        pdf_obligatorio=PDF_OBLIGATORIO
+    )
+    rechazadas = veredicto[~veredicto["ejecutable"]]
+    print(f"🔍 Validación: {int(veredicto['ejecutable'].sum())} ejecutables, {len(rechazadas)} rechazadas")
+    for _, fila in rechazadas.iterrows():
+        print(f"   ⛔ {fila['N° Factura']} ({fila['Empresa']}): {fila['motivos']}")
+    if not rechazadas.empty:
+        reporte = validacion_facturas.exportar_reporte(veredicto, CARPETA_VALIDACIONES, f"facturas_{codigo_clinica}")
+        mostrar_toast(
+            f"{len(rechazadas)} facturas no pasaron la validación.\nReporte: {reporte}",
+            tipo="warning",
+            titulo="Validación"
+        )
+    cola = df_facturas[veredicto["ejecutable"]]
+    if cola.empty:
+        mostrar_toast("Ninguna factura pasó la validación.", tipo="error", titulo="Sin facturas")
+        return None, veredicto
+    # Agrupar por (unidad, fecha) para no repetir unidad/fecha/filtro/recarga
+    return planificador.planificar(cola, codigo_clinica), veredicto
+
+def iniciar_proceso(reanudar=False):
     if df_facturas.empty:
         mostrar_toast("Primero carga datos desde Excel o Supabase.", tipo="error", titulo="Error")
         return
 
     print(f"🏁 Iniciando proceso para la clínica {codigo_clinica} ({origen_datos.upper()})...")
-    print("🔹 Abriendo TecFood en Edge...")
-    subprocess.Popen(["C:/Program Files (x86)/Microsoft/Edge/Application/msedge.exe", URL_TECFOOD])
-    time.sleep(20)
-
-    # Bucle principal: una iteración por cada fila (factura) en df_facturas
-    for index, factura_actual in df_facturas.iterrows():
-        numero_factura = str(factura_actual["N° Factura"]).strip()
-        empresa = str(factura_actual.get("Empresa", "")).strip()
-        nit = str(factura_actual.get("NIT", "")).strip()
-        productos = productos_por_factura.get(numero_factura, [])
-
-        print(f"\n\n🔁 Procesando factura {index+1}/{len(df_facturas)} → {numero_factura}")
-        print(f"   Empresa: {empresa}  NIT: {nit}  Productos: {len(productos)}")
-
-        if not productos:
-            print(f"⚠️ Sin productos para {numero_factura}, se salta.")
-            continue
-        
-
-        if not buscar_y_click("unidad_select.png", "unidad_select", confianza=0.6):
-            mostrar_toast("No se encontró el botón unidad_select.png", tipo="warning", titulo="Botón no encontrado")
-            continue
-
-        # Selección de clínica
-        try:
-            time.sleep(3)
-            pyautogui.typewrite(codigo_clinica)
-            time.sleep(2)
-            x, y = pyautogui.position()
-            pyautogui.moveTo(x, y + 50, duration=0.5)
-            pyautogui.click()
-            print(f"✅ Clínica {codigo_clinica} seleccionada correctamente.")
-        except Exception as e:
-            print("Error al seleccionar clínica:", e)
-            continue
-        pyautogui.press("tab")
-        pyautogui.press("tab")
-        pyautogui.press("tab")
-        time.sleep(5)
-        try:
-            fecha = pd.to_datetime(factura_actual["Fecha"])
-            fecha_formateada = fecha.strftime("%d%m%Y")
-            pyautogui.typewrite(fecha_formateada, interval=0.1)
-            pyautogui.typewrite(fecha_formateada, interval=0.1)
-            pyautogui.press("tab")
-            print(f"📅 Fecha ingresada: {fecha_formateada}")
-        except Exception as e:
-            print("⚠️ Error al procesar la fecha:", e)
-            continue
-
-        # Aplicar filtro
-        time.sleep(5)
-        if not (buscar_y_click("aplicar_filtro.png", "aplicar_filtro") or buscar_y_click("aplicar_filtro_en.png", "aplicar_filtro_en.png")):
-            mostrar_toast("No se encontró el botón 'aplicar_filtro'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-
-        # Añadir factura
-        time.sleep(6)
-        if not buscar_y_click("anadir.png", "anadir", confianza=1, intentos=3):
-            mostrar_toast("No se encontró el botón 'anadir.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        time.sleep(6)
-        buscar_y_click("seleccionar_archivo.png", "seleccionar")
-        time.sleep(2)
-
-        # Buscar y seleccionar PDF correspondiente a esta factura
-        try:
-            empresa_limpia = "".join(c for c in empresa if c.isalnum() or c.isspace()).lower()
-            nit_limpio = "".join(c for c in nit if c.isalnum()).lower()
-            carpeta_pdf = r"C:\Users\Maicol Hernandez\Documents\GitHub\PyHealthy\PDF"
-            pdf_encontrado: Optional[str] = None
-            for archivo in os.listdir(carpeta_pdf):
-                nombre_archivo = archivo.lower()
-                if (nit_limpio in nombre_archivo and any(palabra in nombre_archivo for palabra in empresa_limpia.split()) and archivo.endswith(".pdf")):
-                    pdf_encontrado = os.path.join(carpeta_pdf, archivo)
-                    break
-
-            if pdf_encontrado:
-                print(f"📄 PDF encontrado: {pdf_encontrado}")
-                pyautogui.typewrite(pdf_encontrado)
-                time.sleep(1)
-                pyautogui.press("enter")
-                print("✅ PDF seleccionado correctamente.")
-            else:
-                mostrar_toast(f"No se encontró un PDF para '{empresa}' y '{nit}'. Verifica carpeta.", tipo="warning", titulo="PDF no encontrado")
-                print("⚠️ PDF no encontrado. Se continúa con la factura (si corresponde).")
-                # si quieres saltar la factura si no hay PDF, usa: continue
-        except Exception as e:
-            mostrar_toast(f"No se pudo procesar la factura o buscar el PDF:\n{e}", tipo="error", titulo="Error")
-            continue
-
-        # Remitente y número de factura
-        time.sleep(5)
-        if not buscar_y_click("remitente.png", "remitente"):
-            mostrar_toast("No se encontró 'remitente.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        pyautogui.typewrite(nit)
-        pyautogui.sleep(3)
-        pyautogui.press("tab")
-        pyautogui.sleep(7)
-        pyautogui.typewrite(numero_factura)
-        pyautogui.press("tab")
-        pyautogui.sleep(2)
-
-        if not buscar_y_click("serie.png", "serie"):
-            mostrar_toast("No se encontró 'serie.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        x, y = pyautogui.position()
-        pyautogui.moveTo(x, y + 40, duration=0.5)
-        pyautogui.click()
-        if not buscar_y_click("emision.png", "emision"):
-            mostrar_toast("No se encontró 'emision.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        x, y = pyautogui.position()
-        pyautogui.moveTo(x + 50, y + 30, duration=0.5)
-        pyautogui.click()
-        pyautogui.press("backspace", presses=10)
-        pyautogui.typewrite(fecha_formateada)
-
-        if not buscar_y_click("valor.png", "valor", confianza=1, intentos=3):
-            mostrar_toast("No se encontró 'valor.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-
-        pyautogui.typewrite("0")
-        pyautogui.press("tab")
+    cola, veredicto = preparar_cola()
+    if cola is None:
+        return
 
-        if not buscar_y_click("grabar.png", "grabar"):
-            mostrar_toast("No se encontró 'grabar.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
+    if TRABAJADORES_PARALELOS > 1:
+        if DRIVER_TECFOOD == "dom" or XVFB_TRABAJADORES:
+            resultados = coordinador.lanzar(
+                cola,
+                productos_por_factura,
+                TRABAJADORES_PARALELOS,
+                URL_TECFOOD,
+                driver=DRIVER_TECFOOD,
+                modo_productos=MODO_PRODUCTOS,
+                rutas_pdf=veredicto["ruta_pdf"],
+                carpeta_bitacoras=CARPETA_BITACORAS,
+                carpeta_telemetria=CARPETA_TELEMETRIA,
+                carpeta_trazas=CARPETA_TRAZAS,
+                reanudar=reanudar,
+                xvfb=XVFB_TRABAJADORES
+            )
+            fallidas = [numero for r in resultados for numero in r["fallidas"]]
+            errores = [f"Trabajador {r['indice']}: {r['error']}" for r in resultados if r.get("error")]
+            if errores:
+                mostrar_toast("Sesiones que se cortaron:\n" + "\n".join(errores[:3]) +
+                              f"\n{len(fallidas)} facturas no completadas",
+                              tipo="error", titulo="Sesiones paralelas")
+            elif fallidas:
+                mostrar_toast(f"{len(fallidas)} facturas no completadas: {', '.join(fallidas[:5])}",
+                              tipo="warning", titulo="Sesiones paralelas")
+            print("🏁 Proceso completado para todas las facturas.")
+            return
+        print("⚠️ El driver por imágenes usa el único escritorio: se ejecuta en una sola sesión.")
+
+    # Al reanudar, las facturas ya finalizadas salen del plan antes de empezar
+    bitacora_proceso = bitacora.abrir_bitacora(CARPETA_BITACORAS, codigo_clinica, reanudar=reanudar)
+    cola = bitacora.quitar_finalizadas(cola, bitacora_proceso)
+
+    iniciar_grabacion("facturas")
+    telemetria.reiniciar_telemetria()
+    trazas.iniciar_trazas()
+    print(f"🔹 Abriendo TecFood en Edge (driver '{DRIVER_TECFOOD}')...")
+    driver = driver_tecfood.crear_driver(DRIVER_TECFOOD, URL_TECFOOD, modo_productos=MODO_PRODUCTOS)
+    if reanudar and not driver.puede_reabrir:
+        a_medias = bitacora_proceso.resumen()["a_medias"]
+        if a_medias:
+            mostrar_toast(f"{a_medias} facturas quedaron a medias y el driver '{driver.nombre}' no puede "
+                          f"reabrirlas: se marcan como fallidas para completarlas a mano en TecFood.",
+                          tipo="warning", titulo="Reanudar")
+    driver.abrir()
+
+    def notificar(mensaje):
+        mostrar_toast(mensaje, tipo="warning", titulo="Paso no completado")
+
+    resultados = proceso_facturas.ejecutar_cola(
+        driver,
+        cola,
+        productos_por_factura,
+        rutas_pdf=veredicto["ruta_pdf"],
+        notificar=notificar,
+        bitacora=bitacora_proceso
+    )
+    fallidas = proceso_facturas.facturas_fallidas(cola, resultados, bitacora_proceso)
+    for numero, paso in fallidas:
+        print(f"❌ Factura {numero} fallida en el paso '{paso or 'desconocido'}'")
+    if fallidas:
+        mostrar_toast(f"{len(fallidas)} facturas no completadas: "
+                      f"{', '.join(f'{n} ({p})' for n, p in fallidas[:5])}",
+                      tipo="warning", titulo="Facturas fallidas")
+
+    driver.cerrar()
+    bitacora_proceso.cerrar()
+    perfiles_tiempo.guardar_perfiles()
+    detener_grabacion()
+    telemetria.exportar_telemetria(CARPETA_TELEMETRIA, "facturas")
+    trazas.exportar_trazas(CARPETA_TRAZAS, "facturas")
+    print("🏁 Proceso completado para todas las facturas.")
 
-        pyautogui_sleep = getattr(pyautogui, "sleep", None)
-        if pyautogui_sleep:
-            pyautogui_sleep(12)
-        else:
-            time.sleep(12)
+def estimar_proceso():
+    """Dry-run: corre el plan contra el driver simulado y muestra el ETA sin abrir TecFood"""
+    if df_facturas.empty:
+        mostrar_toast("Primero carga datos desde Excel o Supabase.", tipo="error", titulo="Error")
+        return
 
-        if not buscar_y_click("productos.png", "productos"):
-            mostrar_toast("No se encontró 'productos.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
+    cola, _ = preparar_cola()
+    if cola is None:
+        return
 
-        time.sleep(6)
+    latencias = simulador.cargar_latencias_busqueda(CARPETA_TELEMETRIA)
+    estrategia = "aprendido" if driver_tecfood.ESPERA_ADAPTATIVA else "fijo"
+    etas, total = simulador.estimar(cola, productos_por_factura, estrategia, MODO_PRODUCTOS, latencias)
 
-        # Agregar productos
-        for i, producto in enumerate(productos):
-            try:
-                codigo_producto = str(producto["Código Producto"]).strip()
-                cantidad = str(producto["Cantidad"]).strip().replace(",", ".")
-                valor_unitario = str(producto["Precio"]).strip().replace(",", ".")
-
-                print(f"➕ Agregando producto {i+1}/{len(productos)}: {codigo_producto}")
-                if not buscar_y_click("anadir.png", "añadir", confianza=1, intentos=3):
-                    mostrar_toast("No se encontró 'anadir.png'.", tipo="warning", titulo="Botón no encontrado")
-                    raise Exception("boton_anadir_no_encontrado")
-                time.sleep(11)
-
-                if not buscar_y_click("anadir_producto.png", "añadir_producto"):
-                    mostrar_toast("No se encontró 'anadir_producto.png'.", tipo="warning", titulo="Botón no encontrado")
-                    raise Exception("boton_anadir_producto_no_encontrado")
-                time.sleep(11)
-
-                pyautogui.typewrite(codigo_producto)
-                time.sleep(3)
-                x, y = pyautogui.position()
-                pyautogui.moveTo(x, y + 40, duration=0.5)
-                pyautogui.click()
-                time.sleep(3)
-
-                if not buscar_y_click("cantidad.png", "cantidad"):
-                    mostrar_toast("No se encontró 'cantidad.png'.", tipo="warning", titulo="Botón no encontrado")
-                    raise Exception("boton_cantidad_no_encontrado")
-                pyautogui.typewrite(cantidad)
-                pyautogui.press("tab")
-                time.sleep(5)
-
-                pyautogui.typewrite(valor_unitario)
-                pyautogui.press("tab")
-                time.sleep(5)
-
-                if not buscar_y_click("grabar.png", "grabar"):
-                    mostrar_toast("No se encontró 'grabar.png'.", tipo="warning", titulo="Botón no encontrado")
-                    raise Exception("boton_grabar_no_encontrado")
-
-                print(f"✅ Producto {codigo_producto} grabado correctamente.")
-                time.sleep(5)
-                pyautogui.press("esc")
-                pyautogui_sleep = getattr(pyautogui, "sleep", None)
-                if pyautogui_sleep:
-                    pyautogui_sleep(5)
-                else:
-                    time.sleep(5)
-            except Exception as e:
-                print(f"❌ Error al agregar producto {codigo_producto}: {e}")
-                continue
+    print(f"\n⏱️ ETA por factura (estrategia '{estrategia}', productos '{MODO_PRODUCTOS}'):")
+    for _, fila in etas.iterrows():
+        print(f"   {fila['N° Factura']:>15}  {fila['eta_s']:7.1f}s  (acumulado {fila['fin_s'] / 60:.1f} min)")
 
-        # Finalizar esta factura
-        if not buscar_y_click("FinalizarF.png", "FinalizarF"):
-            mostrar_toast("No se encontró 'FinalizarF.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        time.sleep(5)
-        if not buscar_y_click("si.png", "si"):
-            mostrar_toast("No se encontró 'si.png'.", tipo="warning", titulo="Botón no encontrado")
-            continue
-        time.sleep(2)
-        
-        print(f"✅ Factura {numero_factura} procesada correctamente (productos: {len(productos)})")
+    comparacion = simulador.comparar_estrategias(cola, productos_por_factura, latencias)
+    print("\n⏱️ Comparación de estrategias:")
+    for _, fila in comparacion.iterrows():
+        print(f"   {fila['estrategia']:>10} / {fila['modo_productos']:<8} {fila['total_min']:6.1f} min")
 
-        # --- Recargar la página para la siguiente factura ---
-        time.sleep(2)
-        try:
-            pyautogui.hotkey("ctrl", "r")
-            time.sleep(10)
-        except Exception:
-            try:
-                pyautogui.press("f5")
-                time.sleep(10)
-            except Exception:
-                pass
-    print("🏁 Proceso completado para todas las facturas.")
+    root.after(0, lambda: mostrar_toast(
+        f"{len(etas)} facturas ≈ {total / 60:.0f} min\nMejor: {comparacion.at[0, 'estrategia']} / "
+        f"{comparacion.at[0, 'modo_productos']} ≈ {comparacion.at[0, 'total_min']:.0f} min",
+        tipo="info",
+        titulo="Estimación"
+    ))
 
 # INTERFAZ CON CUSTOMTKINTER
 try:
@@ -2895,10 +2818,9 @@ def _on_cargar_excel():
         mostrar_toast(f"Error al ejecutar cargar_datos_desde_excel: {e}", tipo="error", titulo="Error")
 
 def _on_cargar_supabase():
-    mostrar_toast("Cargando desde Supabase...", tipo="info", titulo="Supabase")
     quick_pulse_animation(btn_supabase, "#4FC3F7")
     try:
-        cargar_datos_desde_supabase()
+        pedir_filtros_supabase()
     except Exception as e:
         mostrar_toast(f"Error al ejecutar cargar_datos_desde_supabase: {e}", tipo="error", titulo="Error")
 
@@ -3028,16 +2950,19 @@ style.map("Treeview", background=[("selected", PRIMARY_HOVER)])
 
 # --- BOTÓN INICIAR ---
 
-def _run_iniciar_proceso_thread():
+def _run_iniciar_proceso_thread(reanudar=False):
     try:
         root.after(0, lambda: btn_iniciar.configure(state="disabled"))
         root.after(0, lambda: mostrar_toast("Proceso iniciado en background", tipo="info", titulo="Proceso"))
-        iniciar_proceso()
+        iniciar_proceso(reanudar=reanudar)
         root.after(0, lambda: btn_iniciar.configure(state="normal"))
         root.after(0, lambda: mostrar_toast("Proceso completado ✅", tipo="success", titulo="Completado"))
         # Animación de éxito rápida
         root.after(0, lambda: quick_pulse_animation(btn_iniciar, "#4CAF50"))
     except Exception as e:
+        detener_grabacion()
+        perfiles_tiempo.guardar_perfiles()
+        trazas.exportar_trazas(CARPETA_TRAZAS, "facturas_error")
         root.after(0, lambda: mostrar_toast(f"Error en proceso: {e}", tipo="error", titulo="Error"))
         root.after(0, lambda: btn_iniciar.configure(state="normal"))
         # Animación de error rápida
@@ -3046,7 +2971,7 @@ def _run_iniciar_proceso_thread():
 def _on_iniciar_proceso():
     mostrar_toast("Iniciando proceso...", tipo="info", titulo="Iniciar")
     quick_pulse_animation(btn_iniciar, "#FFD54F")
-    t = threading.Thread(target=_run_iniciar_proceso_thread, daemon=True)
+    t = threading.Thread(target=_run_iniciar_proceso_thread, args=(var_reanudar.get(),), daemon=True)
     t.start()
 
 btn_iniciar = ctk.CTkButton(
@@ -3067,6 +2992,48 @@ btn_iniciar.pack(pady=16)
 btn_iniciar.bind("<Enter>", lambda e: simple_button_hover(btn_iniciar, True))
 btn_iniciar.bind("<Leave>", lambda e: simple_button_hover(btn_iniciar, False))
 
+# Reanudar: parte del avance de las bitácoras anteriores y salta lo ya grabado en TecFood.
+# Retomar una factura a medias requiere reabrirla, y eso solo lo hace el driver DOM
+var_reanudar = ctk.BooleanVar(value=False)
+chk_reanudar = ctk.CTkCheckBox(
+    main_frame,
+    text="Reanudar desde la última ejecución" + (
+        "" if DRIVER_TECFOOD == "dom" else " (las facturas a medias se completan a mano)"
+    ),
+    variable=var_reanudar,
+    font=("Segoe UI", 12),
+    text_color=TEXT_SECOND,
+)
+chk_reanudar.pack(pady=(0, 12))
+
+def _run_estimar_proceso_thread():
+    try:
+        estimar_proceso()
+    except Exception as e:
+        print(f"❌ Error en la estimación: {e}")
+        root.after(0, lambda: mostrar_toast(f"Error en la estimación: {e}", tipo="error", titulo="Error"))
+    finally:
+        root.after(0, lambda: btn_estimar.configure(state="normal"))
+
+def _on_estimar_proceso():
+    # Con colas grandes la simulación tarda: no se bloquea la ventana
+    btn_estimar.configure(state="disabled")
+    threading.Thread(target=_run_estimar_proceso_thread, daemon=True).start()
+
+btn_estimar = ctk.CTkButton(
+    main_frame,
+    text="⏱️ Estimar duración",
+    command=_on_estimar_proceso,
+    fg_color=CARD_BG,
+    hover_color=PRIMARY_HOVER,
+    text_color=TEXT_MAIN,
+    font=("Segoe UI", 13, "bold"),
+    corner_radius=20,
+    width=200,
+    height=36,
+)
+btn_estimar.pack(pady=(0, 12))
+
 # --- FOOTER ---
 footer = ctk.CTkFrame(pantalla_facturas, fg_color=CARD_BG, corner_radius=0)
 footer.pack(fill="x", side="bottom")
@@ -0,0 +1,97 @@
+-- ========================================
+-- RPC: RECLAMAR LOTE DE FACTURAS PENDIENTES
+-- ========================================
+-- Toma de forma atómica el siguiente lote de facturas pendientes para
+-- DataSpectra (procesamiento automático):
+--   1. Selecciona facturas 'pendiente' con intentos < p_max_intentos
+--      (FOR UPDATE SKIP LOCKED: dos equipos nunca toman la misma factura)
+--   2. Las pasa a 'procesando' y suma un intento
+--   3. Las devuelve con los datos del proveedor
+-- Todo en una sola llamada. Reemplaza las consultas de diagnóstico y el
+-- UPDATE por factura que hacía DataSpectra antes de procesar.
+-- Ejecutar en Supabase SQL Editor
+
+-- ========================================
+-- RPC: reclamar_facturas_pendientes
+-- ========================================
+
+CREATE OR REPLACE FUNCTION reclamar_facturas_pendientes(
+  p_limite INTEGER DEFAULT 50,
+  p_max_intentos INTEGER DEFAULT 3
+)
+RETURNS SETOF JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH reclamadas AS (
+    SELECT f.id
+    FROM facturas f
+    WHERE f.estado_procesamiento = 'pendiente'
+      -- NULL cuenta como 0 intentos (antes el filtro .lt() las dejaba fuera)
+      AND COALESCE(f.intentos_procesamiento, 0) < p_max_intentos
+    ORDER BY f.created_at
+    LIMIT p_limite
+    FOR UPDATE SKIP LOCKED
+  ),
+  actualizadas AS (
+    UPDATE facturas f
+    SET estado_procesamiento   = 'procesando',
+        intentos_procesamiento = COALESCE(f.intentos_procesamiento, 0) + 1,
+        updated_at             = now()
+    FROM reclamadas r
+    WHERE f.id = r.id
+    RETURNING f.*
+  )
+  -- Misma forma que el select de PostgREST con proveedores(nombre, nit)
+  SELECT jsonb_build_object(
+    'id', a.id,
+    'numero_factura', a.numero_factura,
+    'pdf_url', a.pdf_url,
+    'codigo_unidad', a.codigo_unidad,
+    'valor_total', a.valor_total,
+    'fecha_factura', a.fecha_factura,
+    'intentos_procesamiento', a.intentos_procesamiento,
+    'proveedores', CASE
+      WHEN p.id IS NULL THEN NULL
+      ELSE jsonb_build_object('nombre', p.nombre, 'nit', p.nit)
+    END
+  )
+  FROM actualizadas a
+  LEFT JOIN proveedores p ON p.id = a.proveedor_id
+  ORDER BY a.created_at;
+END;
+$$;
+
+-- Agregar comentario para documentación
+COMMENT ON FUNCTION reclamar_facturas_pendientes IS
+'Reclama (pasa a procesando y suma un intento) hasta p_limite facturas pendientes.
+Parámetros:
+  - p_limite: Máximo de facturas a reclamar
+  - p_max_intentos: Solo facturas con menos intentos que este valor
+Retorna:
+  - Un JSONB por factura: id, numero_factura, pdf_url, codigo_unidad,
+    valor_total, fecha_factura, intentos_procesamiento, proveedores {nombre, nit}
+Ejemplo:
+  SELECT * FROM reclamar_facturas_pendientes(10, 3);';
+
+-- ========================================
+-- VERIFICACIÓN (no reclama facturas)
+-- ========================================
+
+-- Facturas que reclamaría la próxima llamada
+SELECT COUNT(*) AS reclamables
+FROM facturas
+WHERE estado_procesamiento = 'pendiente'
+  AND COALESCE(intentos_procesamiento, 0) < 3;
+
+-- Facturas tomadas que quedaron en 'procesando' (p. ej. un equipo que se cerró)
+-- Para devolverlas a la cola:
+--   UPDATE facturas SET estado_procesamiento = 'pendiente'
+--   WHERE estado_procesamiento = 'procesando' AND updated_at < now() - interval '1 hour';
+SELECT id, numero_factura, intentos_procesamiento, updated_at
+FROM facturas
+WHERE estado_procesamiento = 'procesando'
+ORDER BY updated_at;
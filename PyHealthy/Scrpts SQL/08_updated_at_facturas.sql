@@ -0,0 +1,65 @@
+-- ========================================
+-- updated_at automático en facturas y factura_items
+-- Base de la sincronización incremental del espejo local de DataSpectra
+-- ========================================
+-- Objetivo: que cualquier UPDATE (robot, frontend, RPC) mueva updated_at,
+-- así espejo_local.py trae los cambios de estado_procesamiento y de las
+-- líneas de factura ya existentes.
+-- Ejecutar en Supabase SQL Editor
+
+-- ========================================
+-- 1. COLUMNAS updated_at
+-- ========================================
+
+ALTER TABLE facturas
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+ALTER TABLE factura_items
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+COMMENT ON COLUMN facturas.updated_at IS 'Último cambio de la fila (trigger); marca de sincronización del espejo local';
+COMMENT ON COLUMN factura_items.updated_at IS 'Último cambio de la fila (trigger); marca de sincronización del espejo local';
+
+-- Índices para las consultas "updated_at >= marca" del espejo
+CREATE INDEX IF NOT EXISTS idx_facturas_updated_at ON facturas (updated_at);
+CREATE INDEX IF NOT EXISTS idx_factura_items_updated_at ON factura_items (updated_at);
+
+-- ========================================
+-- 2. FUNCIÓN: Marcar updated_at
+-- ========================================
+
+CREATE OR REPLACE FUNCTION marcar_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION marcar_updated_at IS 'Trigger: pone updated_at = NOW() en cada UPDATE';
+
+-- ========================================
+-- 3. TRIGGERS
+-- ========================================
+
+DROP TRIGGER IF EXISTS trigger_updated_at_facturas ON facturas;
+
+CREATE TRIGGER trigger_updated_at_facturas
+BEFORE UPDATE ON facturas
+FOR EACH ROW
+EXECUTE FUNCTION marcar_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_updated_at_factura_items ON factura_items;
+
+CREATE TRIGGER trigger_updated_at_factura_items
+BEFORE UPDATE ON factura_items
+FOR EACH ROW
+EXECUTE FUNCTION marcar_updated_at();
+
+-- ========================================
+-- VERIFICACIÓN
+-- ========================================
+
+SELECT tgname, tgrelid::regclass AS tabla
+FROM pg_trigger
+WHERE tgname IN ('trigger_updated_at_facturas', 'trigger_updated_at_factura_items');
@@ -0,0 +1,52 @@
+-- ========================================
+-- updated_at automático en proveedores y catalogo_productos
+-- Sincronización incremental del espejo local de DataSpectra (tablas padre)
+-- ========================================
+-- Objetivo: que un proveedor o un producto corregido (p. ej. un codigo_arbol
+-- que estaba en "SIN CODIGO") llegue al espejo local aunque sus facturas y
+-- líneas no cambien. Usa la función marcar_updated_at() de
+-- 08_updated_at_facturas.sql: ejecutar ese script primero.
+-- Ejecutar en Supabase SQL Editor
+
+-- ========================================
+-- 1. COLUMNAS updated_at
+-- ========================================
+
+ALTER TABLE proveedores
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+ALTER TABLE catalogo_productos
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+COMMENT ON COLUMN proveedores.updated_at IS 'Último cambio de la fila (trigger); marca de sincronización del espejo local';
+COMMENT ON COLUMN catalogo_productos.updated_at IS 'Último cambio de la fila (trigger); marca de sincronización del espejo local';
+
+-- Índices para las consultas "updated_at >= marca" del espejo
+CREATE INDEX IF NOT EXISTS idx_proveedores_updated_at ON proveedores (updated_at);
+CREATE INDEX IF NOT EXISTS idx_catalogo_productos_updated_at ON catalogo_productos (updated_at);
+
+-- ========================================
+-- 2. TRIGGERS
+-- ========================================
+
+DROP TRIGGER IF EXISTS trigger_updated_at_proveedores ON proveedores;
+
+CREATE TRIGGER trigger_updated_at_proveedores
+BEFORE UPDATE ON proveedores
+FOR EACH ROW
+EXECUTE FUNCTION marcar_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_updated_at_catalogo_productos ON catalogo_productos;
+
+CREATE TRIGGER trigger_updated_at_catalogo_productos
+BEFORE UPDATE ON catalogo_productos
+FOR EACH ROW
+EXECUTE FUNCTION marcar_updated_at();
+
+-- ========================================
+-- VERIFICACIÓN
+-- ========================================
+
+SELECT tgname, tgrelid::regclass AS tabla
+FROM pg_trigger
+WHERE tgname IN ('trigger_updated_at_proveedores', 'trigger_updated_at_catalogo_productos');
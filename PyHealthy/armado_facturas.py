@@ -0,0 +1,183 @@
+"""
+Armado de df_facturas y de los productos de cada factura a partir de las
+filas de Supabase (o del espejo local) y de la hoja de Excel, con
+operaciones por columna de pandas en vez de recorrer fila por fila.
+
+Ambos orígenes terminan en lo mismo:
+  - df_facturas: una fila por factura (ID_Factura, N° Factura, Fecha,
+    Empresa, NIT y, desde Supabase, Unidad).
+  - items: un DataFrame ordenado con una fila por producto, indexado por
+    'N° Factura', con las columnas de COLUMNAS_PRODUCTO en texto.
+productos_por_factura(items, df_facturas) da el dict {número: [producto]}
+que usan la automatización, el coordinador y el simulador.
+
+Las funciones de Supabase aceptan cualquier iterable de filas (p. ej. una
+CargaPaginada) y lo consumen por bloques a medida que llega: nunca se junta
+la lista completa de dicts en memoria.
+"""
+from itertools import islice
+
+import pandas as pd
+
+COLUMNAS_FACTURA = ["ID_Factura", "N° Factura", "Fecha", "Empresa", "NIT", "Unidad"]
+COLUMNAS_PRODUCTO = ["Código Producto", "Nombre Producto", "Cantidad", "Precio"]
+COLUMNAS_EXCEL = ["Tipo", "N° Factura", "Fecha", "Empresa", "NIT"] + COLUMNAS_PRODUCTO
+TAM_BLOQUE = 1000           # filas de Supabase que se pasan juntas a json_normalize
+
+
+def _texto(serie, vacio=""):
+    """Serie como texto sin espacios; nulos → `vacio`"""
+    if pd.api.types.is_float_dtype(serie):
+        # json_normalize pasa a float las columnas enteras con nulos: 2.0 vuelve a "2"
+        texto = serie.astype(str)
+        enteros = serie.notna() & (serie % 1 == 0)
+        texto[enteros] = serie[enteros].astype("int64").astype(str)
+    else:
+        texto = serie.astype(str)
+    return texto.where(serie.notna(), vacio).str.strip()
+
+
+def _columna(tabla, nombre):
+    """Columna de json_normalize; si ninguna fila la trajo (embed nulo), una vacía"""
+    if nombre in tabla.columns:
+        return tabla[nombre]
+    return pd.Series(None, index=tabla.index, dtype=object)
+
+
+def _numero(texto):
+    return texto.str.replace(",", ".", regex=False)
+
+
+def _tabla_items(numeros, codigo, nombre, cantidad, precio):
+    items = pd.DataFrame({
+        "N° Factura": numeros,
+        "Código Producto": codigo,
+        "Nombre Producto": nombre,
+        "Cantidad": _numero(cantidad),
+        "Precio": _numero(precio),
+    })
+    return items.set_index("N° Factura")
+
+
+# ---------- Supabase ----------
+
+def _bloques(filas):
+    """Listas de hasta TAM_BLOQUE filas tomadas del iterable a medida que llegan"""
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, TAM_BLOQUE))
+        if not bloque:
+            return
+        yield bloque
+
+
+def _concatenar(partes, vacio):
+    return pd.concat(partes, ignore_index=True) if partes else vacio
+
+
+def facturas_desde_supabase(filas, codigo_clinica="0000"):
+    """df_facturas desde filas de `facturas` con el embed proveedores(nombre, nit)"""
+    return _concatenar(
+        [_facturas_bloque(bloque, codigo_clinica) for bloque in _bloques(filas)],
+        pd.DataFrame(columns=COLUMNAS_FACTURA)
+    )
+
+
+def _facturas_bloque(filas, codigo_clinica):
+    tabla = pd.json_normalize(filas)
+    unidad = _texto(_columna(tabla, "codigo_unidad"))
+    return pd.DataFrame({
+        "ID_Factura": _texto(tabla["id"]),
+        "N° Factura": _texto(tabla["numero_factura"]),
+        "Fecha": _texto(tabla["fecha_factura"]),
+        "Empresa": _texto(_columna(tabla, "proveedores.nombre"), vacio="Sin nombre"),
+        "NIT": _texto(_columna(tabla, "proveedores.nit"), vacio="Sin NIT"),
+        "Unidad": unidad.mask(unidad.isin(("", "None")), str(codigo_clinica).strip()),
+    })[COLUMNAS_FACTURA]
+
+
+def items_desde_supabase(filas, df_facturas):
+    """
+    items desde filas de `factura_items` con el embed catalogo_productos(codigo_arbol, nombre).
+    Devuelve (items, huérfanos): los que no corresponden a ninguna factura de df_facturas se descartan.
+    """
+    numeros_por_id = pd.Series(df_facturas["N° Factura"].values, index=df_facturas["ID_Factura"].values)
+    partes, huerfanos = [], 0
+    for bloque in _bloques(filas):
+        items, descartados = _items_bloque(bloque, numeros_por_id)
+        partes.append(items)
+        huerfanos += descartados
+    if not partes:
+        return _tabla_items(*[pd.Series(dtype=object)] * 5), 0
+    return (pd.concat(partes) if len(partes) > 1 else partes[0]), huerfanos
+
+
+def _items_bloque(filas, numeros_por_id):
+    tabla = pd.json_normalize(filas)
+    numeros = _texto(_columna(tabla, "factura_id")).map(numeros_por_id)
+    validos = numeros.notna()
+    tabla = tabla[validos]
+    items = _tabla_items(
+        numeros[validos],
+        _texto(_columna(tabla, "catalogo_productos.codigo_arbol"), vacio="SIN CODIGO"),
+        _texto(_columna(tabla, "catalogo_productos.nombre"), vacio="SIN NOMBRE"),
+        _texto(_columna(tabla, "cantidad")),
+        _texto(_columna(tabla, "precio_unitario")),
+    )
+    return items, int((~validos).sum())
+
+
+# ---------- Excel ----------
+
+def desde_excel(df):
+    """
+    (df_facturas, items) desde la hoja con filas Tipo = FACTURA seguidas de
+    sus filas Tipo = PRODUCTO. El número de factura se arrastra hacia abajo
+    desde cada fila FACTURA; los productos antes de la primera factura o
+    bajo una factura sin número se descartan.
+    """
+    df = df.fillna("").astype(str)
+    tipo = df["Tipo"].str.strip().str.upper()
+    numero = df["N° Factura"].str.strip()
+    es_factura = tipo == "FACTURA"
+
+    # Número de la factura en curso en cada fila
+    actual = numero.where(es_factura).ffill().fillna("")
+
+    encabezados = df[es_factura & (numero != "")]
+    df_facturas = pd.DataFrame({
+        "ID_Factura": numero[encabezados.index],
+        "N° Factura": numero[encabezados.index],
+        "Fecha": encabezados["Fecha"].str.strip(),
+        "Empresa": encabezados["Empresa"].str.strip(),
+        "NIT": encabezados["NIT"].str.strip(),
+    }).reset_index(drop=True)
+
+    es_producto = (tipo == "PRODUCTO") & (actual != "")
+    productos = df[es_producto]
+    items = _tabla_items(
+        actual[es_producto],
+        productos["Código Producto"].str.strip(),
+        productos["Nombre Producto"].str.strip(),
+        productos["Cantidad"].str.strip(),
+        productos["Precio"].str.strip(),
+    )
+    return df_facturas, items
+
+
+# ---------- salida ----------
+
+def productos_por_factura(items, df_facturas):
+    """{N° Factura: [{Código Producto, Nombre Producto, Cantidad, Precio}]}; facturas sin items → []"""
+    # Un solo to_dict para toda la tabla; groupby solo da las posiciones de cada factura
+    registros = items[COLUMNAS_PRODUCTO].to_dict("records")
+    agrupados = {
+        numero: [registros[i] for i in posiciones]
+        for numero, posiciones in items.groupby(level=0, sort=False).indices.items()
+    }
+    return {numero: agrupados.get(numero, []) for numero in df_facturas["N° Factura"]}
+
+
+def conteo_por_factura(items, df_facturas):
+    """Serie N° Factura → cantidad de productos, en el orden de df_facturas"""
+    return items.groupby(level=0).size().reindex(df_facturas["N° Factura"], fill_value=0)
@@ -0,0 +1,171 @@
+"""
+Bitácora de avance (solo anexar) para la carga de facturas en TecFood.
+
+Cada línea es un JSON con el último paso completado de una factura:
+encabezado grabado, producto N grabado o factura finalizada; o el paso en
+que la factura se dio por fallida. Cada línea se
+escribe con flush + fsync, de modo que un cierre abrupto pierde como mucho la
+línea en curso; al leer, una última línea truncada se ignora.
+
+Cada corrida escribe su propio archivo `facturas_<nombre>_<fecha>.jsonl`
+(una sesión o cada trabajador del coordinador). Con reanudar=True se leen
+además todas las bitácoras de facturas de la carpeta: la clave unidad | NIT |
+número es la misma en ambos modos, así que una corrida de una sesión se puede
+reanudar en paralelo y al revés. procesar_factura salta lo que ya quedó
+grabado en TecFood.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+PASO_ENCABEZADO = "encabezado"
+PASO_PRODUCTO = "producto"
+PASO_FINALIZADA = "finalizada"
+PASO_FALLIDA = "fallida"
+
+PREFIJO_BITACORA = "facturas"
+
+
+def clave_factura(codigo_unidad, factura):
+    """Identifica una factura dentro de la bitácora: unidad | NIT | número"""
+    numero = str(factura["N° Factura"]).strip()
+    nit = str(factura.get("NIT", "")).strip()
+    return f"{str(codigo_unidad).strip()}|{nit}|{numero}"
+
+
+class EstadoFactura:
+    """Avance registrado de una factura"""
+
+    def __init__(self):
+        self.encabezado = False
+        self.productos = {}
+        self.finalizada = False
+        # Último paso que agotó sus reintentos (informativo; no impide reanudar)
+        self.paso_fallido = None
+        # Un paso grabó sin confirmación: hay que revisarla a mano antes de seguir
+        self.revisar = False
+
+    def producto_grabado(self, indice, codigo):
+        return self.productos.get(indice) == codigo
+
+
+class Bitacora:
+    """Bitácora JSONL de solo anexar. `previas`: bitácoras anteriores que solo se leen"""
+
+    def __init__(self, ruta, previas=()):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._estados = {}
+        for previa in previas:
+            self._leer(previa)
+        if os.path.exists(ruta):
+            self._leer(ruta)
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._archivo = open(ruta, "a", encoding="utf8")
+        if self._termina_truncada():
+            # Separa la línea truncada para que el próximo registro no se pegue a ella
+            self._archivo.write("\n")
+            self._archivo.flush()
+
+    def _leer(self, ruta):
+        descartadas = 0
+        with open(ruta, "r", encoding="utf8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    self._aplicar(json.loads(linea))
+                except (ValueError, KeyError):
+                    # Línea a medio escribir por un cierre abrupto
+                    descartadas += 1
+        if descartadas:
+            print(f"⚠️ Bitácora {ruta}: {descartadas} línea(s) incompleta(s) ignoradas")
+
+    def _termina_truncada(self):
+        if not os.path.getsize(self.ruta):
+            return False
+        with open(self.ruta, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _aplicar(self, registro):
+        estado = self._estados.setdefault(registro["factura"], EstadoFactura())
+        paso = registro["paso"]
+        if paso == PASO_ENCABEZADO:
+            estado.encabezado = True
+        elif paso == PASO_PRODUCTO:
+            estado.productos[int(registro["indice"])] = registro["codigo"]
+        elif paso == PASO_FINALIZADA:
+            estado.finalizada = True
+        elif paso == PASO_FALLIDA:
+            estado.paso_fallido = registro.get("paso_fallido")
+            estado.revisar = estado.revisar or bool(registro.get("revisar"))
+
+    def registrar(self, clave, paso, **datos):
+        """Anexa un paso completado y lo lleva a disco antes de devolver"""
+        registro = {"t": round(time.time(), 3), "factura": clave, "paso": paso}
+        registro.update(datos)
+        with self._lock:
+            self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._aplicar(registro)
+
+    def estado(self, clave):
+        with self._lock:
+            return self._estados.get(clave, EstadoFactura())
+
+    def resumen(self):
+        with self._lock:
+            estados = list(self._estados.values())
+        return {
+            "facturas": len(estados),
+            "finalizadas": sum(1 for e in estados if e.finalizada),
+            "a_medias": sum(1 for e in estados if e.encabezado and not e.finalizada),
+            "fallidas": sum(1 for e in estados if e.paso_fallido and not e.finalizada),
+            "revisar": sum(1 for e in estados if e.revisar and not e.finalizada),
+        }
+
+    def cerrar(self):
+        with self._lock:
+            if self._archivo:
+                self._archivo.close()
+                self._archivo = None
+
+
+def abrir_bitacora(carpeta, nombre, reanudar=False):
+    """
+    Nueva bitácora `facturas_<nombre>_<fecha>.jsonl`. Con reanudar=True parte
+    del avance de todas las bitácoras de facturas que ya hay en la carpeta.
+    """
+    previas = []
+    if reanudar:
+        previas = sorted(glob.glob(os.path.join(glob.escape(carpeta), f"{PREFIJO_BITACORA}_*.jsonl")))
+        if not previas:
+            print("📒 No hay bitácora previa para reanudar; se empieza una nueva.")
+    ruta = os.path.join(carpeta, f"{PREFIJO_BITACORA}_{nombre}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl")
+    bitacora = Bitacora(ruta, previas=previas)
+    if previas:
+        r = bitacora.resumen()
+        print(f"📒 Reanudando desde {len(previas)} bitácora(s): {r['finalizadas']} finalizadas, "
+              f"{r['a_medias']} a medias")
+    print(f"📒 Bitácora de avance: {ruta}")
+    return bitacora
+
+
+def quitar_finalizadas(cola, bitacora):
+    """Cola (de planificador.planificar) sin las facturas ya finalizadas en la bitácora"""
+    finalizadas = [
+        bitacora.estado(clave_factura(fila["_unidad"], fila)).finalizada
+        for _, fila in cola.iterrows()
+    ]
+    if any(finalizadas):
+        print(f"⏭️ {sum(finalizadas)} facturas ya finalizadas según la bitácora")
+        cola = cola[[not f for f in finalizadas]]
+    return cola
@@ -0,0 +1,168 @@
+"""
+Lectura paginada de tablas de Supabase (PostgREST) sin truncar resultados.
+
+PostgREST corta cada respuesta en su límite de filas (1000 por defecto) sin
+avisar. CargaPaginada recorre la tabla por clave primaria (keyset): primero
+lee solo las claves, página a página, y por cada página de claves pide en
+paralelo las filas completas de ese rango (clave >= primera y <= última).
+Las consultas comparten el cliente de Supabase y su pool de conexiones; las
+filas se entregan en orden de clave a medida que llegan.
+
+Al terminar compara lo leído con count=exact y reporta cualquier diferencia
+(filas que el servidor no devolvió o que cambiaron durante la lectura).
+
+filtros_facturas() arma los filtros del lado del servidor (unidad, rango de
+fecha_factura, estado_procesamiento) y CargaPorIds trae las filas hijas
+(factura_items) solo de las facturas leídas, en lotes de `in_`.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+TAM_PAGINA = 1000       # no mayor que el max-rows de PostgREST
+CONCURRENCIA = 4        # páginas de filas completas pedidas a la vez
+TAM_LOTE_IN = 150       # ids por filtro in_ (la URL de PostgREST tiene límite de largo)
+
+
+class CargaPaginada:
+    """
+    Iterable de filas (dict) de `tabla`. `filtrar(consulta)` aplica filtros
+    de PostgREST (eq, gte, in_...) a todas las consultas, incluido el conteo.
+    Tras recorrerla quedan `esperadas`, `leidas` y `diferencias`.
+    """
+
+    def __init__(self, cliente, tabla, columnas="*", clave="id", tam_pagina=TAM_PAGINA,
+                 concurrencia=CONCURRENCIA, filtrar=None):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.columnas = columnas
+        self.clave = clave
+        self.tam_pagina = tam_pagina
+        self.concurrencia = concurrencia
+        self.filtrar = filtrar or (lambda consulta: consulta)
+        self.esperadas = None
+        self.leidas = 0
+        self.paginas = 0
+        self.diferencias = []
+
+    # ---------- consultas ----------
+
+    def _consulta(self, columnas, **opciones):
+        return self.filtrar(self.cliente.table(self.tabla).select(columnas, **opciones))
+
+    def contar(self):
+        respuesta = self._consulta(self.clave, count="exact").limit(1).execute()
+        return respuesta.count
+
+    def _pagina_claves(self, despues_de):
+        consulta = self._consulta(self.clave)
+        if despues_de is not None:
+            consulta = consulta.gt(self.clave, despues_de)
+        filas = consulta.order(self.clave).limit(self.tam_pagina).execute().data
+        return [fila[self.clave] for fila in filas]
+
+    def _pagina_filas(self, claves):
+        filas = self._consulta(self.columnas) \
+            .gte(self.clave, claves[0]) \
+            .lte(self.clave, claves[-1]) \
+            .order(self.clave) \
+            .limit(len(claves)) \
+            .execute().data
+        if len(filas) != len(claves):
+            self.diferencias.append(
+                f"rango {claves[0]}..{claves[-1]}: {len(claves)} claves, {len(filas)} filas"
+            )
+        return filas
+
+    # ---------- recorrido ----------
+
+    def __iter__(self):
+        self.esperadas = self.contar()
+        self.leidas = 0
+        self.paginas = 0
+        self.diferencias = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrencia,
+                                thread_name_prefix=f"carga_{self.tabla}") as pool:
+            pendientes = deque()
+            ultima = None
+            fin_claves = False
+            while not fin_claves or pendientes:
+                # Mantiene `concurrencia` páginas en vuelo mientras se leen más claves
+                while not fin_claves and len(pendientes) < self.concurrencia:
+                    claves = self._pagina_claves(ultima)
+                    if not claves:
+                        fin_claves = True
+                        break
+                    ultima = claves[-1]
+                    pendientes.append(pool.submit(self._pagina_filas, claves))
+                if not pendientes:
+                    break
+                filas = pendientes.popleft().result()
+                self.paginas += 1
+                self.leidas += len(filas)
+                yield from filas
+
+        self.reportar()
+
+    def reportar(self):
+        """Imprime y devuelve las diferencias contra count=exact"""
+        if self.esperadas is not None and self.esperadas != self.leidas:
+            self.diferencias.append(f"count=exact {self.esperadas}, leídas {self.leidas}")
+        if self.diferencias:
+            print(f"⚠️ {self.tabla}: la lectura no coincide con el servidor")
+            for diferencia in self.diferencias:
+                print(f"   - {diferencia}")
+        else:
+            print(f"📥 {self.tabla}: {self.leidas} filas en {self.paginas} páginas (count=exact {self.esperadas})")
+        return self.diferencias
+
+
+def filtros_facturas(codigo_unidad=None, fecha_desde=None, fecha_hasta=None, estados=None):
+    """Función `filtrar` para CargaPaginada con los filtros de la carga de facturas"""
+    def filtrar(consulta):
+        if codigo_unidad:
+            consulta = consulta.eq("codigo_unidad", codigo_unidad)
+        if fecha_desde:
+            consulta = consulta.gte("fecha_factura", str(fecha_desde))
+        if fecha_hasta:
+            consulta = consulta.lte("fecha_factura", str(fecha_hasta))
+        if estados:
+            consulta = consulta.in_("estado_procesamiento", list(estados))
+        return consulta
+    return filtrar
+
+
+class CargaPorIds:
+    """
+    Filas de `tabla` cuyo `columna_id` está en `ids`, en lotes de `in_`; cada
+    lote se pagina con CargaPaginada. Tras recorrerla quedan `esperadas`,
+    `leidas` y `diferencias` sumadas de todos los lotes.
+    """
+
+    def __init__(self, cliente, tabla, columnas, columna_id, ids, tam_lote=TAM_LOTE_IN, **opciones):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.columnas = columnas
+        self.columna_id = columna_id
+        self.ids = list(ids)
+        self.tam_lote = tam_lote
+        self.opciones = opciones
+        self.esperadas = 0
+        self.leidas = 0
+        self.diferencias = []
+
+    def __iter__(self):
+        self.esperadas = 0
+        self.leidas = 0
+        self.diferencias = []
+        for inicio in range(0, len(self.ids), self.tam_lote):
+            lote = self.ids[inicio:inicio + self.tam_lote]
+            carga = CargaPaginada(
+                self.cliente, self.tabla, self.columnas,
+                filtrar=lambda consulta, lote=lote: consulta.in_(self.columna_id, lote),
+                **self.opciones
+            )
+            yield from carga
+            self.esperadas += carga.esperadas or 0
+            self.leidas += carga.leidas
+            self.diferencias += carga.diferencias
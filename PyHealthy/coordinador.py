@@ -0,0 +1,334 @@
+"""
+Coordinador de varias sesiones de carga de facturas en paralelo.
+
+Reparte la cola planificada en lotes por unidad (afinidad por clínica: dos
+trabajadores nunca comparten un contexto de TecFood) y lanza un proceso
+trabajador por lote. Cada trabajador tiene su propio perfil de navegador,
+puerto de DevTools, pantalla (DISPLAY en Linux/Xvfb), fuente de captura,
+bitácora, telemetría y trazas, y corre proceso_facturas.ejecutar_cola sobre su lote.
+
+El driver por imágenes necesita una pantalla por trabajador: en Windows solo
+hay un escritorio, así que en paralelo se usa el driver 'dom' o Xvfb.
+
+Prueba en Linux contra el mock (requiere Xvfb y un Chromium/Edge):
+    python coordinador.py prueba --trabajadores 3 --xvfb --navegador chromium
+
+El coordinador lanza a cada trabajador con:
+    python coordinador.py trabajador <lote.pkl>
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import bitacora as bitacora_avance
+import driver_tecfood
+import motor_plantillas
+import perfiles_tiempo
+import proceso_facturas
+import telemetria
+import trazas
+
+_DIR_MODULO = os.path.dirname(os.path.abspath(__file__))
+CARPETA_PERFILES = os.path.join(_DIR_MODULO, "Perfiles")
+CARPETA_LOTES = os.path.join(_DIR_MODULO, "Lotes")
+
+PUERTO_BASE = 9222              # DevTools del trabajador i: PUERTO_BASE + i
+DISPLAY_BASE = 90               # Xvfb del trabajador i: :90 + i
+RESOLUCION_XVFB = "1920x1080x24"
+ESPERA_XVFB = 5.0
+COSTO_ENCABEZADO = 4            # una factura sin productos ≈ 4 líneas de producto
+
+
+# ---------- reparto ----------
+
+def repartir(cola, productos_por_factura, trabajadores):
+    """
+    Divide la cola en hasta `trabajadores` lotes sin partir ninguna unidad.
+    Las unidades más costosas se asignan primero al trabajador menos cargado;
+    dentro de cada lote se conserva el orden del plan.
+    """
+    costo = cola["N° Factura"].astype(str).str.strip().map(
+        lambda numero: COSTO_ENCABEZADO + len(productos_por_factura.get(numero, []))
+    )
+    por_unidad = costo.groupby(cola["_unidad"], sort=False).sum().sort_values(ascending=False, kind="stable")
+
+    cargas = [0] * max(1, trabajadores)
+    unidades = [[] for _ in cargas]
+    for unidad, total in por_unidad.items():
+        i = cargas.index(min(cargas))
+        cargas[i] += total
+        unidades[i].append(unidad)
+
+    lotes = [cola[cola["_unidad"].isin(u)] for u in unidades if u]
+    if len(lotes) < trabajadores:
+        print(f"🧩 Solo {len(lotes)} unidad(es) distintas: se usan {len(lotes)} de {trabajadores} trabajadores")
+    return lotes
+
+
+def configuracion_trabajador(indice, driver, url, modo_productos, ruta_navegador, carpeta_bitacoras,
+                             carpeta_telemetria, carpeta_trazas, reanudar=False, xvfb=False):
+    """Recursos exclusivos del trabajador `indice`"""
+    return {
+        "indice": indice,
+        "driver": driver,
+        "url": url,
+        "modo_productos": modo_productos,
+        "ruta_navegador": ruta_navegador,
+        "puerto": PUERTO_BASE + indice,
+        "perfil": os.path.join(CARPETA_PERFILES, f"trabajador_{indice}"),
+        "display": f":{DISPLAY_BASE + indice}" if xvfb else None,
+        "carpeta_bitacoras": carpeta_bitacoras,
+        "carpeta_telemetria": carpeta_telemetria,
+        "carpeta_trazas": carpeta_trazas,
+        "reanudar": reanudar,
+    }
+
+
+# ---------- Xvfb ----------
+
+def iniciar_xvfb(display):
+    """Levanta un servidor X virtual en `display` (':90') y espera a que acepte conexiones"""
+    if not shutil.which("Xvfb"):
+        raise RuntimeError("Xvfb no está instalado (apt install xvfb)")
+    proceso = subprocess.Popen(
+        ["Xvfb", display, "-screen", "0", RESOLUCION_XVFB, "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    socket_x = f"/tmp/.X11-unix/X{display.lstrip(':')}"
+    limite = time.time() + ESPERA_XVFB
+    while time.time() < limite:
+        if os.path.exists(socket_x):
+            return proceso
+        if proceso.poll() is not None:
+            break
+        time.sleep(0.1)
+    proceso.terminate()
+    raise RuntimeError(f"Xvfb no arrancó en {display}")
+
+
+def fuente_captura_display(display):
+    """Fuente de captura (frame en grises) de un DISPLAY de X concreto"""
+    import cv2
+    import numpy as np
+    from PIL import ImageGrab
+
+    def capturar():
+        captura = ImageGrab.grab(xdisplay=display)
+        return cv2.cvtColor(np.asarray(captura.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    return capturar
+
+
+# ---------- coordinador ----------
+
+def lanzar(cola, productos_por_factura, trabajadores, url, driver="dom", modo_productos=None,
+           rutas_pdf=None, ruta_navegador=driver_tecfood.RUTA_EDGE, carpeta_bitacoras=None,
+           carpeta_telemetria=None, carpeta_trazas=None, reanudar=False, xvfb=False):
+    """
+    Reparte la cola, corre un proceso trabajador por lote y espera a todos.
+    Devuelve la lista de resultados por trabajador (ver ejecutar_trabajador).
+    """
+    if driver != "dom" and not xvfb:
+        raise ValueError("El driver por imágenes solo corre en paralelo con Xvfb (una pantalla por trabajador)")
+
+    carpeta_bitacoras = carpeta_bitacoras or os.path.join(_DIR_MODULO, "Bitacoras")
+    carpeta_telemetria = carpeta_telemetria or os.path.join(_DIR_MODULO, "Telemetria")
+    carpeta_trazas = carpeta_trazas or os.path.join(_DIR_MODULO, "Trazas")
+    carpeta_lote = os.path.join(CARPETA_LOTES, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    os.makedirs(carpeta_lote, exist_ok=True)
+
+    lotes = repartir(cola, productos_por_factura, trabajadores)
+    procesos = []
+    codigos = {}
+    try:
+        for indice, lote in enumerate(lotes):
+            config = configuracion_trabajador(
+                indice, driver, url, modo_productos, ruta_navegador,
+                carpeta_bitacoras, carpeta_telemetria, carpeta_trazas, reanudar=reanudar, xvfb=xvfb
+            )
+            numeros = set(lote["N° Factura"].astype(str).str.strip())
+            ruta_lote = os.path.join(carpeta_lote, f"trabajador_{indice}.pkl")
+            pd.to_pickle({
+                "config": config,
+                "cola": lote,
+                "productos": {n: p for n, p in productos_por_factura.items() if n in numeros},
+                "rutas_pdf": rutas_pdf.reindex(lote.index) if rutas_pdf is not None else None,
+                "resultado": os.path.join(carpeta_lote, f"resultado_{indice}.json"),
+            }, ruta_lote)
+
+            entorno = dict(os.environ, PYTHONIOENCODING="utf-8")
+            servidor_x = None
+            if config["display"]:
+                servidor_x = iniciar_xvfb(config["display"])
+                entorno["DISPLAY"] = config["display"]
+            registro = open(os.path.join(carpeta_lote, f"trabajador_{indice}.log"), "w", encoding="utf8")
+            proceso = subprocess.Popen(
+                [sys.executable, "-u", os.path.abspath(__file__), "trabajador", ruta_lote],
+                cwd=_DIR_MODULO, env=entorno, stdout=registro, stderr=subprocess.STDOUT
+            )
+            procesos.append((indice, proceso, servidor_x, registro))
+            unidades = ", ".join(sorted(lote["_unidad"].astype(str).unique()))
+            print(f"🧩 Trabajador {indice}: {len(lote)} facturas (unidades {unidades}), "
+                  f"puerto {config['puerto']}{', display ' + config['display'] if config['display'] else ''}")
+
+        for indice, proceso, _, _ in procesos:
+            codigos[indice] = proceso.wait()
+            if codigos[indice]:
+                print(f"⚠️ Trabajador {indice} terminó con código {codigos[indice]} (ver trabajador_{indice}.log)")
+    finally:
+        for _, proceso, servidor_x, registro in procesos:
+            if proceso.poll() is None:
+                proceso.terminate()
+            if servidor_x is not None:
+                servidor_x.terminate()
+            registro.close()
+
+    resultados = []
+    for indice, _, _, _ in procesos:
+        ruta = os.path.join(carpeta_lote, f"resultado_{indice}.json")
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf8") as f:
+                resultados.append(json.load(f))
+        else:
+            # Murió sin escribir su resultado: todo su lote cuenta como no procesado
+            resultados.append({
+                "indice": indice,
+                "facturas": len(lotes[indice]),
+                "completadas": 0,
+                "fallidas": [
+                    f"{numero} ({proceso_facturas.SIN_PROCESAR})"
+                    for numero in lotes[indice]["N° Factura"].astype(str).str.strip()
+                ],
+                "error": f"sin resultado (código {codigos.get(indice)}, ver trabajador_{indice}.log)",
+            })
+
+    completadas = sum(r["completadas"] for r in resultados)
+    total = sum(len(l) for l in lotes)
+    print(f"🧩 Lote terminado: {completadas}/{total} facturas completadas en {len(procesos)} trabajadores "
+          f"({carpeta_lote})")
+    for r in resultados:
+        if r.get("error"):
+            print(f"❌ Trabajador {r['indice']}: {r['error']}")
+    return resultados
+
+
+# ---------- trabajador ----------
+
+def ejecutar_trabajador(ruta_lote):
+    """Procesa un lote escrito por lanzar() y deja su resultado en JSON"""
+    lote = pd.read_pickle(ruta_lote)
+    config = lote["config"]
+    indice = config["indice"]
+    cola = lote["cola"]
+
+    if config["display"]:
+        # Cada trabajador captura solo su propia pantalla virtual
+        motor_plantillas.establecer_fuente_captura(fuente_captura_display(config["display"]))
+
+    # Un archivo por trabajador; al reanudar se leen todas las bitácoras de facturas,
+    # así que no importa cómo se repartieron las unidades en la corrida anterior
+    unidades = "-".join(sorted(cola["_unidad"].astype(str).unique()))
+    bitacora = bitacora_avance.abrir_bitacora(
+        config["carpeta_bitacoras"], f"trabajador{indice}_{unidades}", reanudar=config["reanudar"]
+    )
+    cola = bitacora_avance.quitar_finalizadas(cola, bitacora)
+
+    # Los topes aprendidos se leen pero no se guardan: varios trabajadores
+    # escribiendo perfiles_tiempo.json a la vez se pisarían
+    perfiles_tiempo.cargar_perfiles()
+    telemetria.reiniciar_telemetria()
+    trazas.iniciar_trazas()
+    opciones = {"perfil": config["perfil"], "ruta_navegador": config["ruta_navegador"]}
+    if config["driver"] == "dom":
+        opciones["puerto"] = config["puerto"]
+    driver = driver_tecfood.crear_driver(
+        config["driver"], config["url"], modo_productos=config["modo_productos"], **opciones
+    )
+
+    resultados = {}
+    error = None
+    try:
+        print(f"🧩 Trabajador {indice}: abriendo TecFood (driver '{config['driver']}')...")
+        driver.abrir()
+        resultados = proceso_facturas.ejecutar_cola(
+            driver, cola, lote["productos"], rutas_pdf=lote["rutas_pdf"], bitacora=bitacora
+        )
+    except Exception as e:
+        # Las facturas sin resultado salen como fallidas en el JSON; el detalle queda en el log
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        driver.cerrar()
+        bitacora.cerrar()
+        telemetria.exportar_telemetria(config["carpeta_telemetria"], f"facturas_trabajador{indice}")
+        trazas.exportar_trazas(config["carpeta_trazas"], f"facturas_trabajador{indice}")
+        with open(lote["resultado"], "w", encoding="utf8") as f:
+            json.dump({
+                "indice": indice,
+                "unidades": unidades,
+                "facturas": len(cola),
+                "completadas": sum(1 for ok in resultados.values() if ok),
+                "fallidas": [
+                    f"{numero} ({paso})" if paso else numero
+                    for numero, paso in proceso_facturas.facturas_fallidas(cola, resultados, bitacora)
+                ],
+                "error": error,
+            }, f, indent=2, ensure_ascii=False)
+
+
+# ---------- prueba ----------
+
+def cola_de_prueba(facturas, unidades, productos=3):
+    """Cola y productos sintéticos repartidos en `unidades` unidades"""
+    import planificador
+
+    df = pd.DataFrame({
+        "N° Factura": [f"P{n:04d}" for n in range(facturas)],
+        "Fecha": [f"2024-01-{1 + n % 3:02d}" for n in range(facturas)],
+        "NIT": "900123456",
+        "Empresa": "PROVEEDOR DE PRUEBA SAS",
+        "Unidad": [f"U{n % unidades}" for n in range(facturas)],
+    })
+    por_factura = {
+        numero: [{"Código Producto": f"{1000 + j}", "Cantidad": "1", "Precio": "100"} for j in range(productos)]
+        for numero in df["N° Factura"]
+    }
+    return planificador.planificar(df, "U0"), por_factura
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de facturas en varias sesiones paralelas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_trabajador = sub.add_parser("trabajador", help="Procesa un lote (lo usa el coordinador)")
+    p_trabajador.add_argument("lote")
+
+    p_prueba = sub.add_parser("prueba", help="Corre facturas sintéticas contra mock_tecfood")
+    p_prueba.add_argument("--trabajadores", type=int, default=2)
+    p_prueba.add_argument("--facturas", type=int, default=6)
+    p_prueba.add_argument("--unidades", type=int, default=3)
+    p_prueba.add_argument("--driver", default="dom", choices=("dom", "imagenes"))
+    p_prueba.add_argument("--navegador", default=driver_tecfood.RUTA_EDGE)
+    p_prueba.add_argument("--xvfb", action="store_true", help="Una pantalla virtual por trabajador")
+    p_prueba.add_argument("--url", default="file://" + os.path.join(_DIR_MODULO, "mock_tecfood", "index.html"))
+    args = parser.parse_args()
+
+    if args.comando == "trabajador":
+        ejecutar_trabajador(args.lote)
+        return
+
+    cola, productos = cola_de_prueba(args.facturas, args.unidades)
+    lanzar(
+        cola, productos, args.trabajadores, args.url, driver=args.driver,
+        ruta_navegador=args.navegador, xvfb=args.xvfb
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,964 @@
+"""
+Drivers para manejar TecFood desde la automatización de facturas.
+
+Todos los pasos de una factura (unidad, fecha, filtro, añadir factura, PDF,
+remitente, serie, emisión, valor, grabar, productos, finalizar) se exponen
+en la interfaz DriverTecFood, con dos implementaciones:
+
+- DriverImagenes: el método original, con búsqueda de botones por plantilla
+  (motor_plantillas) y pyautogui.
+- DriverEdgeCDP: controla Edge por el protocolo DevTools (CDP) con selectores
+  CSS y espera a que el DOM esté listo en vez de buscar imágenes y dormir.
+  Los selectores por defecto son los de la página simulada mock_tecfood/;
+  para TecFood real se sobreescriben con selectores_tecfood.json.
+"""
+import json
+import os
+import subprocess
+import time
+from abc import ABC, abstractmethod
+
+import requests
+
+import motor_plantillas
+import perfiles_tiempo
+import telemetria
+import trazas
+from proceso_facturas import SIN_CONFIRMAR
+
+try:
+    import pyautogui
+except Exception:
+    # Sin escritorio solo está disponible el driver DOM
+    pyautogui = None
+
+CARPETA_BOTONES = motor_plantillas.CARPETA_BOTONES
+RUTA_EDGE = "C:/Program Files (x86)/Microsoft/Edge/Application/msedge.exe"
+ARCHIVO_SELECTORES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selectores_tecfood.json")
+
+# Esperas adaptativas: en lugar de los sleeps fijos se espera a que la pantalla
+# se estabilice (el valor antiguo queda como tope). False = sleeps fijos.
+ESPERA_ADAPTATIVA = True
+
+# Entrada de productos del driver por imágenes: "imagenes" (cuatro búsquedas
+# por línea) o "teclado" (una búsqueda del botón 'anadir' por factura; el
+# resto por posiciones relativas aprendidas en la primera línea y teclas)
+MODO_PRODUCTOS = "imagenes"
+# Tras escribir el código del producto: elegir la primera opción y recorrer
+# los campos por tabulación. "{...}" se escribe como texto; lo demás son teclas.
+SECUENCIA_PRODUCTO = ["down", "enter", "tab", "{cantidad}", "tab", "{valor_unitario}", "tab"]
+
+# Tope (s) de cada espera con nombre del driver por imágenes: son los sleeps
+# originales. El prefijo es el paso de proceso_facturas al que pertenece.
+TOPES_ESPERA = {
+    "abrir.carga": 20,
+    "unidad.tras_click": 3,
+    "unidad.desplegable": 2,
+    "fecha.campo": 5,
+    "aplicar_filtro.previa": 5,
+    "anadir_factura.previa": 6,
+    "pdf.formulario": 6,
+    "pdf.dialogo": 2,
+    "remitente.previa": 5,
+    "remitente.desplegable": 3,
+    "remitente.numero": 7,
+    "remitente.tras_numero": 2,
+    "grabar.guardado": 12,
+    "productos.pestana": 6,
+    "producto.anadir": 11,
+    "producto.ancla": 3,
+    "producto.dialogo": 11,
+    "producto.desplegable": 3,
+    "producto.seleccion": 3,
+    "producto.cantidad": 5,
+    "producto.valor": 5,
+    "producto.grabado": 5,
+    "producto.cerrar": 5,
+    "finalizar.confirmacion": 5,
+    "finalizar.cierre": 2,
+    "recargar.previa": 2,
+    "recargar.carga": 10,
+    "cancelar.cierre": 2,
+}
+
+
+# ==================== ACCIONES POR IMAGEN ====================
+
+def esperar_pantalla(segundos, requiere_cambio=False, ventana_estable=0.8, paso=None):
+    """
+    Reemplazo de time.sleep: retorna en cuanto TecFood deja de cambiar (máximo `segundos`).
+    Con `paso` el tope es el aprendido para este equipo (perfiles_tiempo) y la
+    espera real se registra como nueva muestra; si se agota el tope se registra
+    como espera agotada, no como latencia.
+    """
+    if not ESPERA_ADAPTATIVA:
+        with trazas.tramo(paso or "espera", trazas.CATEGORIA_ESPERA, tope=segundos, fija=True):
+            time.sleep(segundos)
+        return segundos
+    tope = segundos
+    if paso:
+        tope = perfiles_tiempo.tope_aprendido(paso, segundos, minimo=ventana_estable + 0.3)
+    with trazas.tramo(paso or "espera", trazas.CATEGORIA_ESPERA, tope=round(tope, 2), original=segundos):
+        esperado, agotado = motor_plantillas.esperar_estable_detalle(
+            tope,
+            ventana_estable=ventana_estable,
+            requiere_cambio=requiere_cambio
+        )
+    if paso:
+        perfiles_tiempo.registrar_espera(paso, esperado, agotada=agotado)
+    if agotado:
+        print(f"⏱️ Tope agotado: {esperado:.1f}s sin pantalla estable (tope {tope:.1f}s de {segundos}s)")
+    else:
+        print(f"⏱️ Pantalla estable en {esperado:.1f}s (tope {tope:.1f}s de {segundos}s)")
+    return esperado
+
+
+def esperar_paso(paso, requiere_cambio=False, ventana_estable=0.8):
+    """esperar_pantalla con el tope original de TOPES_ESPERA para ese paso"""
+    return esperar_pantalla(TOPES_ESPERA[paso], requiere_cambio, ventana_estable, paso=paso)
+
+
+def buscar_y_click(imagen, nombre, confianza=0.9, intentos=3, esperar=5):
+    return buscar_y_click_primero([imagen], nombre, confianza, intentos, esperar) is not None
+
+
+def buscar_y_click_primero(imagenes, nombre, confianza=0.9, intentos=3, esperar=5):
+    """
+    Busca varias plantillas a la vez (variantes de idioma, diálogos alternativos)
+    contra la misma captura en cada sondeo y hace clic en la primera que aparezca.
+    Devuelve el nombre de la imagen clickeada o None.
+    """
+    with trazas.tramo(f"buscar {nombre}", "busqueda", imagenes=", ".join(imagenes)) as args:
+        args["clickeada"] = _buscar_y_click_primero(imagenes, nombre, confianza, intentos, esperar)
+        return args["clickeada"]
+
+
+def _buscar_y_click_primero(imagenes, nombre, confianza, intentos, esperar):
+    inicio_total = time.time()
+
+    # Validación temprana (evita 100 warnings inútiles); las plantillas ya están precargadas
+    disponibles = []
+    for imagen in imagenes:
+        if motor_plantillas.obtener_plantilla(imagen, CARPETA_BOTONES) is None:
+            print(f"❌ Imagen no encontrada: {os.path.abspath(os.path.join(CARPETA_BOTONES, imagen))}")
+        else:
+            disponibles.append(imagen)
+    if not disponibles:
+        return None
+
+    pyautogui.FAILSAFE = True
+    pyautogui.PAUSE = 0.1
+
+    frames_sondeados = 0
+    ms_primera = None
+
+    for i in range(intentos):
+        print(f"🔎 Buscando botón '{nombre}' (Intento {i+1}/{intentos})...")
+
+        tiempo_inicio_intento = time.time()
+        imagen_estable = None
+        ubicacion_estable = None
+        frames_estables = 0
+        frame_anterior = None
+
+        while time.time() - tiempo_inicio_intento < esperar:
+            try:
+                # Una sola captura en grises por sondeo para todas las variantes
+                frame = motor_plantillas.capturar_pantalla_gris()
+                frames_sondeados += 1
+                imagen, ubicacion = motor_plantillas.localizar_primera(
+                    frame,
+                    disponibles,
+                    confianza=max(confianza - 0.15, 0.6)
+                )
+
+                if ubicacion:
+                    if ms_primera is None:
+                        ms_primera = (time.time() - inicio_total) * 1000
+                    region_quieta = False
+                    if ubicacion_estable and imagen == imagen_estable:
+                        dx = abs(ubicacion.x - ubicacion_estable.x)
+                        dy = abs(ubicacion.y - ubicacion_estable.y)
+
+                        if dx < 4 and dy < 4:
+                            frames_estables += 1
+                            # Si los píxeles alrededor del botón no cambiaron entre las dos
+                            # capturas, la página no está animando: se confirma ya
+                            region_quieta = motor_plantillas.region_sin_cambios(
+                                frame_anterior, frame, ubicacion, imagen
+                            )
+                        else:
+                            frames_estables = 1
+                            ubicacion_estable = ubicacion
+                    else:
+                        imagen_estable = imagen
+                        ubicacion_estable = ubicacion
+                        frames_estables = 1
+
+                    if region_quieta or frames_estables >= 3:
+                        ms_estable = (time.time() - inicio_total) * 1000
+                        pyautogui.moveTo(ubicacion_estable.x, ubicacion_estable.y, duration=0.25)
+                        pyautogui.click()
+                        telemetria.registrar_busqueda(
+                            imagen_estable, True, i + 1, frames_sondeados,
+                            (time.time() - inicio_total) * 1000,
+                            ms_primera, ms_estable, ubicacion.confianza
+                        )
+                        print(f"✅ Botón '{nombre}' ({imagen_estable}) encontrado y clickeado.")
+                        return imagen_estable
+                else:
+                    frames_estables = 0
+                    imagen_estable = None
+                    ubicacion_estable = None
+                frame_anterior = frame
+
+            except Exception:
+                pass
+
+            # Tras la primera coincidencia se re-captura enseguida para confirmar;
+            # mientras la página sigue animando se vuelve al sondeo normal
+            time.sleep(0.05 if frames_estables == 1 else 0.3)
+
+        print("⚠️ No encontrado en este intento, reintentando...")
+
+    telemetria.registrar_busqueda(
+        "|".join(disponibles), False, intentos, frames_sondeados,
+        (time.time() - inicio_total) * 1000, ms_primera
+    )
+    print(
+        f"❌ No se encontró el botón '{nombre}' tras {intentos} intentos "
+        f"({int(time.time() - inicio_total)}s)."
+    )
+    return None
+
+
+# ==================== INTERFAZ ====================
+
+class DriverTecFood(ABC):
+    """
+    Pasos de TecFood usados por la automatización de facturas. Cada paso
+    devuelve True si se completó y False si no se encontró el elemento.
+    Los que graban (grabar, agregar_producto, finalizar) devuelven False solo
+    si no llegaron al clic de grabar, y SIN_CONFIRMAR si lo hicieron pero no
+    pudieron confirmar el resultado: esos no se repiten.
+
+    Los pasos abstractos son obligatorios; abrir_factura y reanclar son
+    capacidades opcionales con un valor por defecto que no falla.
+    """
+    nombre = "base"
+    # abrir_factura implementado: se puede reanudar una factura con encabezado grabado
+    puede_reabrir = False
+
+    @abstractmethod
+    def abrir(self):
+        ...
+
+    def cerrar(self):
+        pass
+
+    @abstractmethod
+    def seleccionar_unidad(self, codigo_unidad):
+        ...
+
+    @abstractmethod
+    def ingresar_fecha(self, fecha_formateada):
+        ...
+
+    @abstractmethod
+    def aplicar_filtro(self):
+        ...
+
+    @abstractmethod
+    def anadir_factura(self):
+        ...
+
+    @abstractmethod
+    def adjuntar_pdf(self, ruta_pdf):
+        ...
+
+    @abstractmethod
+    def ingresar_remitente(self, nit, numero_factura):
+        ...
+
+    @abstractmethod
+    def ingresar_serie(self):
+        ...
+
+    @abstractmethod
+    def ingresar_emision(self, fecha_formateada):
+        ...
+
+    @abstractmethod
+    def ingresar_valor(self, valor="0"):
+        ...
+
+    @abstractmethod
+    def grabar(self):
+        ...
+
+    def abrir_factura(self, numero_factura):
+        """
+        Abre una factura ya grabada para reanudarla. Los drivers que la
+        implementan ponen `puede_reabrir = True`; por defecto no hay forma de
+        reabrirla y devuelve False (la factura se completa a mano).
+        """
+        print(f"⚠️ El driver '{self.nombre}' no puede reabrir la factura {numero_factura}")
+        return False
+
+    @abstractmethod
+    def abrir_productos(self):
+        ...
+
+    @abstractmethod
+    def agregar_producto(self, codigo_producto, cantidad, valor_unitario):
+        ...
+
+    @abstractmethod
+    def finalizar(self):
+        ...
+
+    @abstractmethod
+    def recargar(self):
+        ...
+
+    @abstractmethod
+    def cancelar(self):
+        """Cierra el diálogo o desplegable abierto (tecla Esc)"""
+
+    def reanclar(self):
+        """
+        Olvida las posiciones aprendidas para que el siguiente intento las
+        busque de nuevo. Sin posiciones aprendidas no hay nada que olvidar.
+        """
+        return True
+
+
+# ==================== DRIVER POR IMÁGENES ====================
+
+class DriverImagenes(DriverTecFood):
+    """Maneja TecFood con plantillas de botones, pyautogui y desplazamientos en píxeles"""
+    nombre = "imagenes"
+
+    def __init__(self, url, modo_productos=None, perfil=None, ruta_navegador=RUTA_EDGE):
+        self.url = url
+        self.modo_productos = modo_productos or MODO_PRODUCTOS
+        # Perfil propio del navegador (sesiones aisladas al correr varios trabajadores)
+        self.perfil = perfil
+        self.ruta_navegador = ruta_navegador
+        # Posición de 'anadir_producto' y 'grabar' relativa al botón 'anadir'
+        self._desplazamientos = None
+        self._ancla = None
+
+    def abrir(self):
+        argumentos = [self.ruta_navegador]
+        if self.perfil:
+            argumentos += [f"--user-data-dir={self.perfil}", "--no-first-run"]
+        subprocess.Popen(argumentos + [self.url])
+        esperar_paso("abrir.carga", ventana_estable=2.0)
+        return True
+
+    def seleccionar_unidad(self, codigo_unidad):
+        if not buscar_y_click("unidad_select.png", "unidad_select", confianza=0.6):
+            return False
+        esperar_paso("unidad.tras_click")
+        pyautogui.typewrite(codigo_unidad)
+        esperar_paso("unidad.desplegable", requiere_cambio=True)
+        x, y = pyautogui.position()
+        pyautogui.moveTo(x, y + 50, duration=0.5)
+        pyautogui.click()
+        print(f"✅ Clínica {codigo_unidad} seleccionada correctamente.")
+        return True
+
+    def ingresar_fecha(self, fecha_formateada):
+        pyautogui.press("tab")
+        pyautogui.press("tab")
+        pyautogui.press("tab")
+        esperar_paso("fecha.campo")
+        pyautogui.typewrite(fecha_formateada, interval=0.1)
+        pyautogui.typewrite(fecha_formateada, interval=0.1)
+        pyautogui.press("tab")
+        print(f"📅 Fecha ingresada: {fecha_formateada}")
+        return True
+
+    def aplicar_filtro(self):
+        esperar_paso("aplicar_filtro.previa")
+        return buscar_y_click_primero(["aplicar_filtro.png", "aplicar_filtro_en.png"], "aplicar_filtro") is not None
+
+    def anadir_factura(self):
+        esperar_paso("anadir_factura.previa", requiere_cambio=True)
+        return buscar_y_click("anadir.png", "anadir", confianza=1, intentos=3)
+
+    def adjuntar_pdf(self, ruta_pdf):
+        esperar_paso("pdf.formulario", requiere_cambio=True)
+        buscar_y_click("seleccionar_archivo.png", "seleccionar")
+        esperar_paso("pdf.dialogo", requiere_cambio=True)
+        if not ruta_pdf:
+            return True
+        pyautogui.typewrite(ruta_pdf)
+        time.sleep(1)
+        pyautogui.press("enter")
+        print("✅ PDF seleccionado correctamente.")
+        return True
+
+    def ingresar_remitente(self, nit, numero_factura):
+        esperar_paso("remitente.previa")
+        if not buscar_y_click("remitente.png", "remitente"):
+            return False
+        pyautogui.typewrite(nit)
+        esperar_paso("remitente.desplegable", requiere_cambio=True)
+        pyautogui.press("tab")
+        esperar_paso("remitente.numero", requiere_cambio=True)
+        pyautogui.typewrite(numero_factura)
+        pyautogui.press("tab")
+        esperar_paso("remitente.tras_numero")
+        return True
+
+    def ingresar_serie(self):
+        if not buscar_y_click("serie.png", "serie"):
+            return False
+        x, y = pyautogui.position()
+        pyautogui.moveTo(x, y + 40, duration=0.5)
+        pyautogui.click()
+        return True
+
+    def ingresar_emision(self, fecha_formateada):
+        if not buscar_y_click("emision.png", "emision"):
+            return False
+        x, y = pyautogui.position()
+        pyautogui.moveTo(x + 50, y + 30, duration=0.5)
+        pyautogui.click()
+        pyautogui.press("backspace", presses=10)
+        pyautogui.typewrite(fecha_formateada)
+        return True
+
+    def ingresar_valor(self, valor="0"):
+        if not buscar_y_click("valor.png", "valor", confianza=1, intentos=3):
+            return False
+        pyautogui.typewrite(valor)
+        pyautogui.press("tab")
+        return True
+
+    def grabar(self):
+        if not buscar_y_click("grabar.png", "grabar"):
+            return False
+        esperar_paso("grabar.guardado", requiere_cambio=True)
+        return True
+
+    def abrir_productos(self):
+        if not buscar_y_click("productos.png", "productos"):
+            return False
+        esperar_paso("productos.pestana", requiere_cambio=True)
+        self._ancla = None
+        return True
+
+    def agregar_producto(self, codigo_producto, cantidad, valor_unitario):
+        if self.modo_productos == "teclado" and self._desplazamientos:
+            resultado = self._agregar_producto_teclado(codigo_producto, cantidad, valor_unitario)
+            if resultado is not False:
+                # Grabado, o clic en grabar sin confirmar: repetirlo podría duplicar la línea
+                return resultado
+            print("⚠️ Entrada por teclado sin llegar a grabar; se repite el producto por imágenes.")
+            self._desplazamientos = None
+        return self._agregar_producto_imagenes(codigo_producto, cantidad, valor_unitario)
+
+    def _agregar_producto_imagenes(self, codigo_producto, cantidad, valor_unitario):
+        if not buscar_y_click("anadir.png", "añadir", confianza=1, intentos=3):
+            return False
+        pos_anadir = pyautogui.position()
+        esperar_paso("producto.anadir", requiere_cambio=True)
+
+        if not buscar_y_click("anadir_producto.png", "añadir_producto"):
+            return False
+        pos_anadir_producto = pyautogui.position()
+        esperar_paso("producto.dialogo", requiere_cambio=True)
+
+        pyautogui.typewrite(codigo_producto)
+        esperar_paso("producto.desplegable", requiere_cambio=True)
+        x, y = pyautogui.position()
+        pyautogui.moveTo(x, y + 40, duration=0.5)
+        pyautogui.click()
+        esperar_paso("producto.seleccion")
+
+        if not buscar_y_click("cantidad.png", "cantidad"):
+            return False
+        pyautogui.typewrite(cantidad)
+        pyautogui.press("tab")
+        esperar_paso("producto.cantidad")
+
+        pyautogui.typewrite(valor_unitario)
+        pyautogui.press("tab")
+        esperar_paso("producto.valor")
+
+        if not buscar_y_click("grabar.png", "grabar"):
+            return False
+        pos_grabar = pyautogui.position()
+
+        esperar_paso("producto.grabado", requiere_cambio=True)
+        pyautogui.press("esc")
+        esperar_paso("producto.cerrar")
+
+        # Las siguientes líneas de la factura pueden ir por teclado
+        self._ancla = (pos_anadir[0], pos_anadir[1])
+        self._desplazamientos = {
+            "anadir_producto": (pos_anadir_producto[0] - pos_anadir[0], pos_anadir_producto[1] - pos_anadir[1]),
+            "grabar": (pos_grabar[0] - pos_anadir[0], pos_grabar[1] - pos_anadir[1]),
+        }
+        return True
+
+    def _punto(self, nombre):
+        dx, dy = self._desplazamientos[nombre]
+        return self._ancla[0] + dx, self._ancla[1] + dy
+
+    def _agregar_producto_teclado(self, codigo_producto, cantidad, valor_unitario):
+        """
+        Una línea sin búsquedas de imagen: clic en posiciones aprendidas, teclas
+        para los campos y una sonda de píxeles que confirma cada transición.
+        Devuelve True si se confirmó el grabado (el botón grabar reaccionó y la
+        lista de productos volvió), False si falló antes del clic en grabar y
+        SIN_CONFIRMAR si se hizo clic en grabar pero no se pudo confirmar.
+        """
+        if self._ancla is None:
+            # Única búsqueda por imagen de la factura
+            ancla = self._esperar_ancla()
+            if not ancla:
+                return False
+            self._ancla = (ancla.x, ancla.y)
+
+        x, y = self._ancla
+        px, py = self._punto("anadir_producto")
+        gx, gy = self._punto("grabar")
+
+        pyautogui.moveTo(x, y)
+        parche_lista = motor_plantillas.capturar_parche(x, y)
+        parche_dialogo = motor_plantillas.capturar_parche(px, py)
+        pyautogui.click()
+        # El diálogo está abierto cuando cambia el punto donde aparece 'anadir_producto'
+        with trazas.tramo("producto.sonda_dialogo", trazas.CATEGORIA_ESPERA):
+            dialogo_abierto = motor_plantillas.esperar_parche(px, py, parche_dialogo, maximo=11)
+        if not dialogo_abierto:
+            pyautogui.press("esc")
+            self._ancla = None
+            return False
+
+        pyautogui.click(px, py)
+        esperar_paso("producto.dialogo", requiere_cambio=True)
+        pyautogui.typewrite(codigo_producto)
+        esperar_paso("producto.desplegable", requiere_cambio=True)
+
+        valores = {"cantidad": cantidad, "valor_unitario": valor_unitario}
+        for paso in SECUENCIA_PRODUCTO:
+            if paso.startswith("{") and paso.endswith("}"):
+                pyautogui.typewrite(valores[paso[1:-1]])
+            else:
+                pyautogui.press(paso)
+
+        # Al grabar, TecFood quita los campos del diálogo: el botón deja de verse
+        pyautogui.moveTo(gx, gy)
+        parche_grabar = motor_plantillas.capturar_parche(gx, gy)
+        pyautogui.click()
+        with trazas.tramo("producto.sonda_grabado", trazas.CATEGORIA_ESPERA):
+            grabado = motor_plantillas.esperar_parche(
+                gx, gy, parche_grabar, maximo=TOPES_ESPERA["producto.grabado"], estable=0.4
+            )
+        pyautogui.press("esc")
+
+        pyautogui.moveTo(x, y)
+        with trazas.tramo("producto.sonda_lista", trazas.CATEGORIA_ESPERA):
+            lista_visible = motor_plantillas.esperar_parche(x, y, parche_lista, igual=True, maximo=5)
+        if not (grabado and lista_visible):
+            print(f"⚠️ Grabado del producto sin confirmar (grabar: {grabado}, lista: {lista_visible}).")
+            self._ancla = None
+            return SIN_CONFIRMAR
+        return True
+
+    def _esperar_ancla(self, intentos=3):
+        """Busca 'anadir.png' dando tiempo a que el formulario termine de cargar"""
+        for intento in range(intentos):
+            frame = motor_plantillas.capturar_pantalla_gris()
+            ancla = motor_plantillas.localizar(frame, "anadir.png", confianza=0.85)
+            if ancla:
+                return ancla
+            if intento < intentos - 1:
+                esperar_paso("producto.ancla")
+        return None
+
+    def finalizar(self):
+        if not buscar_y_click("FinalizarF.png", "FinalizarF"):
+            return False
+        esperar_paso("finalizar.confirmacion", requiere_cambio=True)
+        if not buscar_y_click("si.png", "si"):
+            return False
+        esperar_paso("finalizar.cierre")
+        return True
+
+    def cancelar(self):
+        pyautogui.press("esc")
+        esperar_paso("cancelar.cierre", requiere_cambio=True)
+        return True
+
+    def reanclar(self):
+        # Un diálogo a medio abrir taparía el ancla
+        self.cancelar()
+        self._ancla = None
+        self._desplazamientos = None
+        return True
+
+    def recargar(self):
+        esperar_paso("recargar.previa")
+        try:
+            pyautogui.hotkey("ctrl", "r")
+            esperar_paso("recargar.carga", requiere_cambio=True, ventana_estable=1.5)
+        except Exception:
+            try:
+                pyautogui.press("f5")
+                esperar_paso("recargar.carga", requiere_cambio=True, ventana_estable=1.5)
+            except Exception:
+                pass
+        return True
+
+
+# ==================== DRIVER DOM (EDGE DEVTOOLS) ====================
+
+SELECTORES_POR_DEFECTO = {
+    "cargando": "#cargando",
+    "unidad": "#unidad",
+    "opcion_unidad": "#lista-unidades [data-valor='{valor}']",
+    "fecha": "#fecha",
+    "aplicar_filtro": "#aplicar-filtro",
+    "anadir_factura": "#anadir-factura",
+    "archivo": "#archivo-pdf",
+    "remitente": "#remitente",
+    "opcion_remitente": "#lista-remitentes [data-valor='{valor}']",
+    "numero_factura": "#numero-factura",
+    "serie": "#serie",
+    "emision": "#emision",
+    "valor": "#valor",
+    "grabar": "#grabar-factura",
+    "factura_grabada": "#facturas-grabadas [data-numero='{valor}']",
+    "productos": "#tab-productos",
+    "anadir": "#anadir-item",
+    "anadir_producto": "#anadir-producto",
+    "producto": "#producto",
+    "opcion_producto": "#lista-productos [data-valor='{valor}']",
+    "cantidad": "#cantidad",
+    "valor_unitario": "#valor-unitario",
+    "grabar_producto": "#grabar-producto",
+    "lineas_producto": "#items-grabados li",
+    "cerrar_producto": "#cerrar-producto",
+    "finalizar": "#finalizar",
+    "confirmar": "#confirmar-si",
+}
+
+
+def cargar_selectores(ruta=ARCHIVO_SELECTORES):
+    """Selectores por defecto (página simulada) sobreescritos por selectores_tecfood.json"""
+    selectores = dict(SELECTORES_POR_DEFECTO)
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, "r", encoding="utf8") as f:
+                selectores.update(json.load(f))
+        except Exception as e:
+            print(f"⚠️ No se pudieron leer los selectores de {ruta}: {e}")
+    return selectores
+
+
+class DriverEdgeCDP(DriverTecFood):
+    """
+    Maneja TecFood en Edge por el protocolo DevTools: hace clic y escribe por
+    selector CSS y espera a que el DOM esté listo (readyState + indicador de
+    carga oculto + elemento visible) en lugar de sleeps fijos.
+    Requiere el paquete opcional websocket-client.
+    """
+    nombre = "dom"
+    puede_reabrir = True
+
+    def __init__(self, url, puerto=9222, perfil=None, ruta_navegador=RUTA_EDGE,
+                 selectores=None, timeout=15, lanzar=True):
+        self.url = url
+        self.puerto = puerto
+        self.perfil = perfil or os.path.join(os.path.expanduser("~"), ".dataspectra_edge")
+        self.ruta_navegador = ruta_navegador
+        self.selectores = selectores or cargar_selectores()
+        self.timeout = timeout
+        self.lanzar = lanzar
+        self._ws = None
+        self._id = 0
+        self._proceso = None
+
+    # ---------- conexión ----------
+
+    def abrir(self):
+        try:
+            import websocket
+        except ImportError:
+            raise RuntimeError("El driver DOM requiere 'websocket-client' (pip install websocket-client)")
+
+        if self.lanzar:
+            self._proceso = subprocess.Popen([
+                self.ruta_navegador,
+                f"--remote-debugging-port={self.puerto}",
+                f"--user-data-dir={self.perfil}",
+                "--no-first-run",
+                self.url,
+            ])
+
+        ws_url = self._url_pagina()
+        self._ws = websocket.create_connection(ws_url, timeout=self.timeout, suppress_origin=True)
+        self._enviar("Page.enable")
+        self._enviar("Runtime.enable")
+        self._enviar("Page.navigate", url=self.url)
+        self.esperar_listo()
+        print(f"🌐 TecFood abierto por DevTools en el puerto {self.puerto}")
+        return True
+
+    def cerrar(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+    def _url_pagina(self):
+        """Espera a que DevTools responda y devuelve el websocket de la pestaña"""
+        limite = time.time() + 30
+        while time.time() < limite:
+            try:
+                pestanas = requests.get(f"http://127.0.0.1:{self.puerto}/json", timeout=2).json()
+                paginas = [p for p in pestanas if p.get("type") == "page" and p.get("webSocketDebuggerUrl")]
+                if paginas:
+                    return paginas[0]["webSocketDebuggerUrl"]
+            except Exception:
+                pass
+            time.sleep(0.25)
+        raise RuntimeError(f"Edge no respondió en el puerto DevTools {self.puerto}")
+
+    def _enviar(self, metodo, **params):
+        """Envía un comando CDP y espera su respuesta (los eventos se ignoran)"""
+        self._id += 1
+        id_mensaje = self._id
+        self._ws.send(json.dumps({"id": id_mensaje, "method": metodo, "params": params}))
+        while True:
+            respuesta = json.loads(self._ws.recv())
+            if respuesta.get("id") != id_mensaje:
+                continue
+            if "error" in respuesta:
+                raise RuntimeError(f"CDP {metodo}: {respuesta['error'].get('message')}")
+            return respuesta.get("result", {})
+
+    def _evaluar(self, expresion):
+        resultado = self._enviar(
+            "Runtime.evaluate",
+            expression=expresion,
+            returnByValue=True,
+            awaitPromise=True
+        )
+        if "exceptionDetails" in resultado:
+            raise RuntimeError(f"Error JS: {resultado['exceptionDetails'].get('text')}")
+        return resultado.get("result", {}).get("value")
+
+    # ---------- esperas por DOM ----------
+
+    def _selector(self, clave, valor=None):
+        selector = self.selectores[clave]
+        return selector.format(valor=valor) if valor is not None else selector
+
+    def esperar_listo(self, timeout=None):
+        """Espera document.readyState == complete y el indicador de carga oculto"""
+        cargando = json.dumps(self.selectores.get("cargando", ""))
+        expresion = (
+            "(() => { if (document.readyState !== 'complete') return false;"
+            f" const c = {cargando} ? document.querySelector({cargando}) : null;"
+            " return !c || c.offsetParent === null; })()"
+        )
+        with trazas.tramo("dom.listo", trazas.CATEGORIA_ESPERA):
+            return self._esperar_expresion(expresion, timeout)
+
+    def esperar_visible(self, selector, timeout=None):
+        sel = json.dumps(selector)
+        expresion = (
+            f"(() => {{ const e = document.querySelector({sel});"
+            " return !!e && e.offsetParent !== null && !e.disabled; })()"
+        )
+        with trazas.tramo("dom.visible", trazas.CATEGORIA_ESPERA, selector=selector):
+            return self._esperar_expresion(expresion, timeout)
+
+    def esperar_oculto(self, selector, timeout=None):
+        sel = json.dumps(selector)
+        expresion = (
+            f"(() => {{ const e = document.querySelector({sel});"
+            " return !e || e.offsetParent === null; })()"
+        )
+        with trazas.tramo("dom.oculto", trazas.CATEGORIA_ESPERA, selector=selector):
+            return self._esperar_expresion(expresion, timeout)
+
+    def _contar(self, clave):
+        return self._evaluar(f"document.querySelectorAll({json.dumps(self._selector(clave))}).length")
+
+    def _esperar_expresion(self, expresion, timeout=None):
+        limite = time.time() + (timeout or self.timeout)
+        while time.time() < limite:
+            try:
+                if self._evaluar(expresion):
+                    return True
+            except RuntimeError:
+                pass
+            time.sleep(0.1)
+        return False
+
+    # ---------- acciones ----------
+
+    def _click(self, clave, valor=None):
+        selector = self._selector(clave, valor)
+        if not (self.esperar_listo() and self.esperar_visible(selector)):
+            print(f"❌ Elemento '{clave}' no disponible ({selector})")
+            return False
+        self._evaluar(f"document.querySelector({json.dumps(selector)}).click()")
+        return True
+
+    def _escribir(self, clave, texto):
+        """Enfoca el campo, reemplaza su contenido y escribe como teclado (respeta máscaras)"""
+        selector = self._selector(clave)
+        if not (self.esperar_listo() and self.esperar_visible(selector)):
+            print(f"❌ Campo '{clave}' no disponible ({selector})")
+            return False
+        self._evaluar(
+            f"(() => {{ const e = document.querySelector({json.dumps(selector)});"
+            " e.focus(); e.select && e.select(); })()"
+        )
+        self._enviar("Input.insertText", text=str(texto))
+        self._evaluar(
+            f"(() => {{ const e = document.querySelector({json.dumps(selector)});"
+            " e.dispatchEvent(new Event('change', {bubbles: true}));"
+            " e.dispatchEvent(new Event('blur')); })()"
+        )
+        return True
+
+    def _elegir_opcion(self, clave_campo, clave_opcion, valor):
+        """Escribe en un autocompletado y hace clic en la opción que corresponde al valor"""
+        if not self._escribir(clave_campo, valor):
+            return False
+        return self._click(clave_opcion, valor)
+
+    # ---------- pasos ----------
+
+    def seleccionar_unidad(self, codigo_unidad):
+        return self._elegir_opcion("unidad", "opcion_unidad", codigo_unidad)
+
+    def ingresar_fecha(self, fecha_formateada):
+        return self._escribir("fecha", fecha_formateada)
+
+    def aplicar_filtro(self):
+        return self._click("aplicar_filtro")
+
+    def anadir_factura(self):
+        return self._click("anadir_factura")
+
+    def adjuntar_pdf(self, ruta_pdf):
+        if not ruta_pdf:
+            return True
+        selector = self._selector("archivo")
+        if not self.esperar_listo():
+            return False
+        documento = self._enviar("DOM.getDocument", depth=0)
+        nodo = self._enviar("DOM.querySelector", nodeId=documento["root"]["nodeId"], selector=selector)
+        if not nodo.get("nodeId"):
+            print(f"❌ Campo de archivo no disponible ({selector})")
+            return False
+        self._enviar("DOM.setFileInputFiles", files=[os.path.abspath(ruta_pdf)], nodeId=nodo["nodeId"])
+        self._evaluar(
+            f"document.querySelector({json.dumps(selector)})"
+            ".dispatchEvent(new Event('change', {bubbles: true}))"
+        )
+        return True
+
+    def ingresar_remitente(self, nit, numero_factura):
+        return (self._elegir_opcion("remitente", "opcion_remitente", nit)
+                and self._escribir("numero_factura", numero_factura))
+
+    def ingresar_serie(self):
+        selector = self._selector("serie")
+        if not (self.esperar_listo() and self.esperar_visible(selector)):
+            return False
+        # Misma elección que el driver por imágenes: la primera serie de la lista
+        return bool(self._evaluar(
+            f"(() => {{ const s = document.querySelector({json.dumps(selector)});"
+            " const o = [...s.options].find(o => o.value); if (!o) return false;"
+            " s.value = o.value; s.dispatchEvent(new Event('change', {bubbles: true})); return true; })()"
+        ))
+
+    def ingresar_emision(self, fecha_formateada):
+        return self._escribir("emision", fecha_formateada)
+
+    def ingresar_valor(self, valor="0"):
+        return self._escribir("valor", valor)
+
+    # Los pasos que graban solo devuelven False antes del clic que graba; después
+    # se confirma el estado de la página en lugar de repetir la acción
+
+    def grabar(self):
+        if not self._click("grabar"):
+            return False
+        # Grabado: la pestaña de productos se habilita
+        if self.esperar_listo() and self.esperar_visible(self._selector("productos")):
+            return True
+        print("⚠️ Encabezado sin confirmar tras grabar.")
+        return SIN_CONFIRMAR
+
+    def abrir_factura(self, numero_factura):
+        return self._click("factura_grabada", numero_factura) and self.esperar_listo()
+
+    def abrir_productos(self):
+        return self._click("productos") and self.esperar_listo()
+
+    def agregar_producto(self, codigo_producto, cantidad, valor_unitario):
+        if not (self._click("anadir")
+                and self._click("anadir_producto")
+                and self._elegir_opcion("producto", "opcion_producto", codigo_producto)
+                and self._escribir("cantidad", cantidad)
+                and self._escribir("valor_unitario", valor_unitario)):
+            return False
+        lineas = self._contar("lineas_producto")
+        if not self._click("grabar_producto"):
+            return False
+        # Grabado: la lista de la factura tiene una línea más
+        selector = json.dumps(self._selector("lineas_producto"))
+        if not self._esperar_expresion(f"document.querySelectorAll({selector}).length > {int(lineas)}"):
+            print(f"⚠️ Producto {codigo_producto} sin confirmar tras grabar.")
+            return SIN_CONFIRMAR
+        # La línea ya está grabada: si el diálogo no cierra, el siguiente producto lo recupera
+        if not (self._click("cerrar_producto") and self.esperar_listo()):
+            print("⚠️ El diálogo de producto no se cerró tras grabar.")
+        return True
+
+    def finalizar(self):
+        if not (self._click("finalizar") and self._click("confirmar")):
+            return False
+        # Finalizada: la confirmación se cierra
+        if self.esperar_listo() and self.esperar_oculto(self._selector("confirmar")):
+            return True
+        print("⚠️ Finalización sin confirmar.")
+        return SIN_CONFIRMAR
+
+    def cancelar(self):
+        for tipo in ("keyDown", "keyUp"):
+            self._enviar("Input.dispatchKeyEvent", type=tipo, key="Escape", code="Escape",
+                         windowsVirtualKeyCode=27)
+        return self.esperar_listo()
+
+    def recargar(self):
+        self._enviar("Page.reload", ignoreCache=False)
+        time.sleep(0.2)
+        return self.esperar_listo(timeout=30)
+
+
+def crear_driver(tipo, url, modo_productos=None, **opciones):
+    """Crea el driver configurado: 'imagenes' (por defecto) o 'dom'"""
+    if tipo == "dom":
+        return DriverEdgeCDP(url, **opciones)
+    return DriverImagenes(
+        url,
+        modo_productos=modo_productos,
+        perfil=opciones.get("perfil"),
+        ruta_navegador=opciones.get("ruta_navegador", RUTA_EDGE)
+    )
@@ -0,0 +1,269 @@
+"""
+Espejo local (SQLite) de facturas, factura_items, proveedores y
+catalogo_productos de Supabase.
+
+Cada tabla se guarda como JSON por fila (con los mismos embeds que pide
+cargar_datos_desde_supabase) más unas columnas extraídas para filtrar. El id
+se guarda con el tipo que trae Supabase, así ORDER BY id da el mismo orden
+que la carga remota. La sincronización es incremental: por tabla se guarda
+el updated_at más alto visto y solo se piden las filas con updated_at >= ese,
+con CargaPaginada; las filas que cambiaron se insertan o reemplazan por id.
+Requiere los triggers de updated_at de Scrpts SQL/08_updated_at_facturas.sql
+y 09_updated_at_catalogos.sql: sin ellos, los cambios no llegan al espejo.
+Las filas borradas en Supabase no se detectan (se limpian con reconstruir()).
+
+Al leer, el proveedor y el producto de catálogo de cada fila salen de sus
+tablas espejo (EMBEBIDOS_ESPEJO), no del embed guardado con la fila: un
+producto corregido en el catálogo se ve sin que cambie la línea de factura.
+
+La interfaz abre con lo que ya está en el espejo y sincroniza en un hilo
+aparte; si no hay red, se trabaja con la última copia.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from carga_supabase import CargaPaginada
+
+# tabla → (columnas del select, columna de marca, columnas extraídas para filtrar)
+# Las tablas padre van primero: al leer una factura su proveedor ya está al día
+TABLAS_ESPEJO = {
+    "proveedores": ("id, nombre, nit, updated_at", "updated_at", ()),
+    "catalogo_productos": ("id, codigo_arbol, nombre, updated_at", "updated_at", ()),
+    "facturas": ("*, proveedores(id, nombre, nit)", "updated_at",
+                 ("codigo_unidad", "fecha_factura", "estado_procesamiento")),
+    "factura_items": ("*, catalogo_productos(id, codigo_arbol, nombre)", "updated_at", ("factura_id",)),
+}
+# tabla → (embed que se arma al leer desde su tabla espejo, columnas del embed)
+# El id del embed identifica la fila padre sin depender del nombre de la clave foránea
+EMBEBIDOS_ESPEJO = {
+    "facturas": ("proveedores", ("nombre", "nit")),
+    "factura_items": ("catalogo_productos", ("codigo_arbol", "nombre")),
+}
+# Sube cuando cambia el formato de las tablas: un espejo anterior se descarta y se vuelve a bajar
+ESQUEMA_ESPEJO = 2
+TAM_LOTE_ESCRITURA = 500
+TAM_LOTE_IN_LOCAL = 900     # SQLite admite hasta 999 parámetros por consulta
+
+
+class EspejoLocal:
+    def __init__(self, ruta, tablas=None, embebidos=None):
+        self.ruta = ruta
+        self.tablas = tablas or TABLAS_ESPEJO
+        self.embebidos = EMBEBIDOS_ESPEJO if embebidos is None else embebidos
+        # Una sincronización a la vez; las lecturas no esperan (WAL)
+        self._lock_sync = threading.Lock()
+        self.ultima_sincronizacion = None
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            if conexion.execute("PRAGMA user_version").fetchone()[0] != ESQUEMA_ESPEJO:
+                self._descartar_esquema(conexion)
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS _marcas (tabla TEXT PRIMARY KEY, marca TEXT, sincronizado TEXT)"
+            )
+            for tabla, (_, _, extraidas) in self.tablas.items():
+                columnas = "".join(f', "{c}" TEXT' for c in extraidas)
+                # id y el id del padre sin tipo: enteros y uuid se guardan y ordenan como en Supabase
+                padre = f', "{self._columna_padre(tabla)}"' if tabla in self.embebidos else ""
+                conexion.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{tabla}" (id PRIMARY KEY, marca TEXT, datos TEXT{columnas}{padre})'
+                )
+                for columna in extraidas:
+                    conexion.execute(
+                        f'CREATE INDEX IF NOT EXISTS "idx_{tabla}_{columna}" ON "{tabla}" ("{columna}")'
+                    )
+
+    def _descartar_esquema(self, conexion):
+        """Borra las tablas de un espejo con otro formato; la próxima sincronización lo vuelve a llenar"""
+        existentes = [
+            nombre for (nombre,) in conexion.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            if nombre in self.tablas or nombre == "_marcas"
+        ]
+        if existentes:
+            print("💾 El espejo local tiene un formato anterior: se vuelve a descargar.")
+        for nombre in existentes:
+            conexion.execute(f'DROP TABLE "{nombre}"')
+        conexion.execute(f"PRAGMA user_version = {ESQUEMA_ESPEJO}")
+
+    def _columna_padre(self, tabla):
+        return f"{self.embebidos[tabla][0]}_id"
+
+    @contextmanager
+    def _conectar(self):
+        # Una conexión por llamada: el espejo se usa desde la interfaz y desde el hilo de sincronización
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    # ---------- estado ----------
+
+    def marca(self, tabla):
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT marca FROM _marcas WHERE tabla = ?", (tabla,)).fetchone()
+        return fila[0] if fila else None
+
+    def tiene_datos(self):
+        with self._conectar() as conexion:
+            return conexion.execute('SELECT 1 FROM "facturas" LIMIT 1').fetchone() is not None
+
+    def resumen(self):
+        with self._conectar() as conexion:
+            return {
+                tabla: conexion.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+                for tabla in self.tablas
+            }
+
+    # ---------- sincronización ----------
+
+    def _guardar(self, conexion, tabla, filas, columna_marca, extraidas):
+        """Inserta o reemplaza las filas que cambiaron; devuelve (cuántas cambiaron, marca más alta)"""
+        embebido = self.embebidos.get(tabla)
+        registros = [
+            (f["id"], f.get(columna_marca), json.dumps(f, ensure_ascii=False, default=str))
+            + tuple(None if f.get(c) is None else str(f.get(c)) for c in extraidas)
+            + (((f.get(embebido[0]) or {}).get("id"),) if embebido else ())
+            for f in filas
+        ]
+        # El gte sobre la marca vuelve a traer las filas del borde: solo cuentan las distintas
+        ids = [r[0] for r in registros]
+        anteriores = {}
+        for inicio in range(0, len(ids), TAM_LOTE_IN_LOCAL):
+            lote = ids[inicio:inicio + TAM_LOTE_IN_LOCAL]
+            anteriores.update(
+                (id_, (marca, datos)) for id_, marca, datos in conexion.execute(
+                    f'SELECT id, marca, datos FROM "{tabla}" WHERE id IN ({", ".join("?" * len(lote))})', lote
+                )
+            )
+        cambiadas = [r for r in registros if anteriores.get(r[0]) != (r[1], r[2])]
+        if cambiadas:
+            nombres = ["id", "marca", "datos"] + [f'"{c}"' for c in extraidas]
+            if embebido:
+                nombres.append(f'"{self._columna_padre(tabla)}"')
+            columnas = ", ".join(nombres)
+            marcadores = ", ".join("?" * len(nombres))
+            conexion.executemany(f'INSERT OR REPLACE INTO "{tabla}" ({columnas}) VALUES ({marcadores})', cambiadas)
+        marcas = [r[1] for r in registros if r[1]]
+        return len(cambiadas), (max(marcas) if marcas else None)
+
+    def sincronizar_tabla(self, cliente, tabla):
+        """Trae las filas desde la última marca; devuelve cuántas eran nuevas o cambiaron"""
+        columnas, columna_marca, extraidas = self.tablas[tabla]
+        desde = self.marca(tabla)
+        # gte y no gt: filas con la misma marca que la última vista pueden no haberse leído
+        carga = CargaPaginada(
+            cliente, tabla, columnas,
+            filtrar=(lambda consulta: consulta.gte(columna_marca, desde)) if desde else None
+        )
+        total, marcas, lote = 0, [desde], []
+        with self._conectar() as conexion:
+            for fila in carga:
+                lote.append(fila)
+                if len(lote) >= TAM_LOTE_ESCRITURA:
+                    cambiadas, marca = self._guardar(conexion, tabla, lote, columna_marca, extraidas)
+                    total += cambiadas
+                    marcas.append(marca)
+                    lote = []
+            if lote:
+                cambiadas, marca = self._guardar(conexion, tabla, lote, columna_marca, extraidas)
+                total += cambiadas
+                marcas.append(marca)
+            marca_nueva = max(filter(None, marcas), default=None)
+            conexion.execute(
+                "INSERT OR REPLACE INTO _marcas (tabla, marca, sincronizado) VALUES (?, ?, ?)",
+                (tabla, marca_nueva, datetime.now().isoformat(timespec="seconds"))
+            )
+        return total
+
+    def sincronizar(self, cliente):
+        """Sincroniza todas las tablas; devuelve {tabla: filas nuevas o cambiadas}"""
+        with self._lock_sync:
+            cambios = {tabla: self.sincronizar_tabla(cliente, tabla) for tabla in self.tablas}
+            self.ultima_sincronizacion = datetime.now()
+        print(f"💾 Espejo local sincronizado: {cambios}")
+        return cambios
+
+    def sincronizar_en_segundo_plano(self, cliente, al_terminar=None):
+        """Sincroniza en un hilo; `al_terminar(cambios o None si falló)`"""
+        def _sincronizar():
+            try:
+                cambios = self.sincronizar(cliente)
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar el espejo local (se usa la última copia): {e}")
+                cambios = None
+            if al_terminar:
+                al_terminar(cambios)
+
+        hilo = threading.Thread(target=_sincronizar, daemon=True, name="espejo_local")
+        hilo.start()
+        return hilo
+
+    def reconstruir(self, cliente):
+        """Vacía el espejo y lo vuelve a descargar (limpia filas borradas en Supabase)"""
+        with self._lock_sync:
+            with self._conectar() as conexion:
+                for tabla in self.tablas:
+                    conexion.execute(f'DELETE FROM "{tabla}"')
+                conexion.execute("DELETE FROM _marcas")
+        return self.sincronizar(cliente)
+
+    # ---------- lectura ----------
+
+    def _leer(self, conexion, tabla, donde="", parametros=()):
+        """Filas de `tabla` en orden de id, con el embed armado desde la tabla padre del espejo"""
+        embebido = self.embebidos.get(tabla)
+        if not embebido:
+            consulta = f'SELECT t.datos, NULL FROM "{tabla}" t {donde} ORDER BY t.id'
+        else:
+            consulta = (
+                f'SELECT t.datos, p.datos FROM "{tabla}" t '
+                f'LEFT JOIN "{embebido[0]}" p ON p.id = t."{self._columna_padre(tabla)}" '
+                f'{donde} ORDER BY t.id'
+            )
+        filas = []
+        for datos, datos_padre in conexion.execute(consulta, parametros):
+            fila = json.loads(datos)
+            if datos_padre is not None:
+                padre = json.loads(datos_padre)
+                fila[embebido[0]] = {"id": padre["id"], **{c: padre.get(c) for c in embebido[1]}}
+            filas.append(fila)
+        return filas
+
+    def facturas(self, codigo_unidad=None, fecha_desde=None, fecha_hasta=None, estados=None):
+        """Filas de facturas (como las devuelve Supabase) con los mismos filtros que la carga remota"""
+        condiciones, parametros = [], []
+        if codigo_unidad:
+            condiciones.append('t."codigo_unidad" = ?')
+            parametros.append(str(codigo_unidad))
+        if fecha_desde:
+            condiciones.append('substr(t."fecha_factura", 1, 10) >= ?')
+            parametros.append(str(fecha_desde))
+        if fecha_hasta:
+            condiciones.append('substr(t."fecha_factura", 1, 10) <= ?')
+            parametros.append(str(fecha_hasta))
+        if estados:
+            condiciones.append(f't."estado_procesamiento" IN ({", ".join("?" * len(estados))})')
+            parametros.extend(estados)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self._conectar() as conexion:
+            return self._leer(conexion, "facturas", donde, parametros)
+
+    def items(self, ids_factura):
+        """Filas de factura_items de las facturas dadas"""
+        ids = [str(i) for i in ids_factura]
+        filas = []
+        with self._conectar() as conexion:
+            for inicio in range(0, len(ids), TAM_LOTE_IN_LOCAL):
+                lote = ids[inicio:inicio + TAM_LOTE_IN_LOCAL]
+                filas += self._leer(
+                    conexion, "factura_items", f'WHERE t."factura_id" IN ({", ".join("?" * len(lote))})', lote
+                )
+        return filas
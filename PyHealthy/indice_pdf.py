@@ -0,0 +1,147 @@
+"""
+Índice de los PDF de facturas por NIT y por ID de factura.
+
+Se construye una vez por carpeta con os.scandir y se reconstruye solo cuando
+cambia la fecha de modificación de la carpeta (archivo agregado, borrado o
+renombrado) o cuando el archivo elegido ya no coincide con lo indexado. Cada
+búsqueda cuesta un stat por carpeta más una consulta a un diccionario.
+
+- Carpeta de PDF de proveedores: el NIT aparece como un bloque de dígitos en
+  el nombre del archivo; si hay varios candidatos para el mismo NIT se elige
+  el que comparte más palabras con el nombre del proveedor (y el más reciente
+  en caso de empate).
+- TEMP_PDF_DIR: los PDF descargados de Supabase se llaman factura_<id>.pdf.
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+EntradaPDF = namedtuple("EntradaPDF", "ruta palabras mtime")
+
+# Bloques de dígitos que pueden ser un NIT (con o sin dígito de verificación)
+_RE_DIGITOS = re.compile(r"\d{5,}")
+_RE_PALABRAS = re.compile(r"[a-z0-9]+")
+_RE_ID_DESCARGA = re.compile(r"^factura_(.+)\.pdf$", re.IGNORECASE)
+
+# Palabras del nombre del proveedor que no sirven para desempatar
+PALABRAS_IGNORADAS = {"sas", "s", "a", "sa", "ltda", "y", "de", "del", "la", "el", "los", "las", "cia", "e", "u"}
+LONGITUD_MINIMA_PALABRA = 3
+
+
+def normalizar_texto(texto):
+    """Minúsculas sin tildes"""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def normalizar_nit(nit):
+    return "".join(c for c in str(nit) if c.isdigit())
+
+
+def palabras_proveedor(empresa):
+    return {
+        p for p in _RE_PALABRAS.findall(normalizar_texto(empresa))
+        if len(p) >= LONGITUD_MINIMA_PALABRA and p not in PALABRAS_IGNORADAS
+    }
+
+
+class IndicePDF:
+    def __init__(self, carpetas):
+        self.carpetas = [str(c) for c in carpetas]
+        self._lock = threading.Lock()
+        self._mtime_carpeta = {}
+        self._por_carpeta = {}
+        self._por_nit = {}
+        self._por_id = {}
+
+    # ---------- construcción ----------
+
+    def _escanear(self, carpeta):
+        """Devuelve ({nit: [EntradaPDF]}, {id: ruta}) de una carpeta"""
+        por_nit, por_id = {}, {}
+        with os.scandir(carpeta) as archivos:
+            for archivo in archivos:
+                if not archivo.is_file() or not archivo.name.lower().endswith(".pdf"):
+                    continue
+                nombre = normalizar_texto(archivo.name)
+                entrada = EntradaPDF(archivo.path, set(_RE_PALABRAS.findall(nombre)), archivo.stat().st_mtime)
+                coincidencia_id = _RE_ID_DESCARGA.match(archivo.name)
+                if coincidencia_id:
+                    por_id[coincidencia_id.group(1)] = archivo.path
+                for digitos in set(_RE_DIGITOS.findall(nombre)):
+                    # El NIT puede venir con o sin dígito de verificación pegado
+                    for clave in (digitos, digitos[:-1]):
+                        por_nit.setdefault(clave, []).append(entrada)
+        return por_nit, por_id
+
+    def _reconstruir_union(self):
+        self._por_nit, self._por_id = {}, {}
+        for carpeta in self.carpetas:
+            por_nit, por_id = self._por_carpeta.get(carpeta, ({}, {}))
+            for nit, entradas in por_nit.items():
+                self._por_nit.setdefault(nit, []).extend(entradas)
+            self._por_id.update(por_id)
+
+    def actualizar(self, forzar=False):
+        """Re-escanea solo las carpetas cuya fecha de modificación cambió"""
+        with self._lock:
+            cambio = False
+            for carpeta in self.carpetas:
+                try:
+                    mtime = os.stat(carpeta).st_mtime
+                except OSError:
+                    mtime = None
+                if not forzar and self._mtime_carpeta.get(carpeta, -1) == mtime:
+                    continue
+                self._mtime_carpeta[carpeta] = mtime
+                self._por_carpeta[carpeta] = self._escanear(carpeta) if mtime is not None else ({}, {})
+                cambio = True
+            if cambio:
+                self._reconstruir_union()
+                total = sum(len(ids) + sum(len(e) for e in nits.values())
+                            for nits, ids in self._por_carpeta.values())
+                print(f"🗂️ Índice de PDF actualizado ({total} entradas en {len(self.carpetas)} carpetas)")
+
+    # ---------- búsqueda ----------
+
+    def _elegir(self, candidatos, empresa):
+        palabras = palabras_proveedor(empresa)
+        mejor, mejor_puntaje = None, None
+        for entrada in candidatos:
+            comunes = len(palabras & entrada.palabras)
+            if palabras and not comunes:
+                continue
+            puntaje = (comunes, entrada.mtime)
+            if mejor_puntaje is None or puntaje > mejor_puntaje:
+                mejor, mejor_puntaje = entrada, puntaje
+        return mejor
+
+    def _vigente(self, entrada):
+        try:
+            return os.stat(entrada.ruta).st_mtime == entrada.mtime
+        except OSError:
+            return False
+
+    def buscar(self, empresa, nit, factura_id=None):
+        """Ruta del PDF de la factura o None"""
+        self.actualizar()
+        for _ in range(2):
+            with self._lock:
+                ruta_id = self._por_id.get(str(factura_id).strip()) if factura_id is not None else None
+                nit_limpio = normalizar_nit(nit)
+                candidatos = self._por_nit.get(nit_limpio, []) if nit_limpio else []
+                if not candidatos and "-" in str(nit) and len(nit_limpio) > 5:
+                    # NIT con dígito de verificación y archivo nombrado sin él
+                    candidatos = self._por_nit.get(nit_limpio[:-1], [])
+                elegido = self._elegir(candidatos, empresa)
+            if ruta_id and os.path.exists(ruta_id):
+                return ruta_id
+            if elegido is None:
+                return None
+            if self._vigente(elegido):
+                return elegido.ruta
+            # El archivo cambió sin que cambiara la carpeta: se reconstruye y se reintenta
+            self.actualizar(forzar=True)
+        return None
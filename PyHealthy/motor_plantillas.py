@@ -0,0 +1,590 @@
+"""
+Motor de búsqueda de botones por plantilla para la automatización de TecFood.
+
+Carga una sola vez todas las imágenes de Buttons/ en escala de grises como
+arreglos NumPy y las compara contra una única captura de pantalla compartida,
+en lugar de releer el PNG y capturar la pantalla completa en cada sondeo.
+
+Cada acierto se memoriza por botón (y se guarda en disco entre ejecuciones)
+para buscar primero en una ventana pequeña alrededor de la última posición
+y recurrir a la pantalla completa solo si no aparece allí.
+
+También ofrece una espera por eventos (esperar_pantalla_estable) que compara
+capturas reducidas y retorna en cuanto la pantalla deja de cambiar, usando el
+antiguo sleep fijo solo como tope.
+
+Si el zoom de Edge o el escalado de Windows difieren del equipo donde se
+capturaron los PNG, la primera búsqueda fallida calibra la escala con una
+pirámide de imágenes (gruesa a media resolución, fina a resolución completa)
+y esa escala se reutiliza durante toda la sesión. Después solo se vuelve a
+calibrar cuando un botón que ya se había encontrado falla varias veces
+seguidas (p. ej. cambió el zoom); esperar un botón que aún no aparece no
+dispara calibraciones.
+
+Las búsquedas a pantalla completa en monitores grandes se reparten en franjas
+solapadas que se correlacionan en un pool de hilos creado una sola vez
+(cv2.matchTemplate libera el GIL) y se combinan por mejor puntaje.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    import pyautogui
+except Exception:
+    # Sin escritorio (Linux/Xvfb, replays): la captura se inyecta con establecer_fuente_captura
+    pyautogui = None
+
+_DIR_MODULO = os.path.dirname(os.path.abspath(__file__))
+CARPETA_BOTONES = os.path.join(_DIR_MODULO, "Buttons")
+ARCHIVO_REGIONES = os.path.join(_DIR_MODULO, "regiones_botones.json")
+
+# Margen (px) alrededor de la plantilla para la búsqueda por región
+MARGEN_REGION = 80
+
+# Espera por estabilidad: factor de reducción de la captura y diferencia
+# media (0-255) por debajo de la cual dos capturas se consideran iguales
+ESCALA_ESTABILIDAD = 8
+UMBRAL_CAMBIO = 1.5
+
+# Sonda de píxeles: lado (px) del parche alrededor de un punto y diferencia
+# media por encima de la cual el parche cambió (aparece/desaparece un diálogo)
+LADO_PARCHE = 16
+UMBRAL_PARCHE = 6.0
+
+# Escalas candidatas (zoom de Edge / escalado de Windows) y paso del refinamiento
+ESCALAS_CANDIDATAS = (1.0, 1.25, 1.5, 0.8, 0.9, 1.1, 1.75, 2.0, 0.67, 0.75)
+PASO_REFINAMIENTO = 0.025
+# Fallos seguidos de un botón ya encontrado antes que disparan una recalibración
+FALLOS_PARA_CALIBRAR = 20
+
+# Búsqueda en mosaico: franjas en paralelo a partir de este tamaño de frame
+TRABAJADORES_MOSAICO = min(os.cpu_count() or 1, 8)
+PIXELES_MIN_MOSAICO = 1920 * 1080
+
+Coincidencia = namedtuple("Coincidencia", ["x", "y", "confianza"])
+
+_plantillas = {}
+_lock_plantillas = threading.Lock()
+
+_regiones = {}
+_lock_regiones = threading.Lock()
+
+_fuente_captura = None
+
+_pool_mosaico = None
+_lock_pool = threading.Lock()
+
+_escaladas = {}
+_escala_sesion = None
+_calibrada_en_sesion = False
+_fallos_seguidos = {}
+_lock_escala = threading.Lock()
+
+
+def _leer_gris(ruta):
+    """Lee un PNG en escala de grises (soporta rutas con acentos en Windows)"""
+    datos = np.fromfile(ruta, dtype=np.uint8)
+    if datos.size == 0:
+        return None
+    return cv2.imdecode(datos, cv2.IMREAD_GRAYSCALE)
+
+
+def cargar_plantillas(carpeta=CARPETA_BOTONES):
+    """Carga y preprocesa todas las plantillas PNG de la carpeta de botones"""
+    cargadas = 0
+    if not os.path.isdir(carpeta):
+        print(f"⚠️ Carpeta de botones no encontrada: {carpeta}")
+        return 0
+
+    for archivo in sorted(os.listdir(carpeta)):
+        if not archivo.lower().endswith(".png"):
+            continue
+        plantilla = _leer_gris(os.path.join(carpeta, archivo))
+        if plantilla is None:
+            print(f"⚠️ No se pudo leer la plantilla: {archivo}")
+            continue
+        with _lock_plantillas:
+            _plantillas[archivo.lower()] = plantilla
+        cargadas += 1
+
+    print(f"🖼️ Plantillas de botones precargadas: {cargadas}")
+    return cargadas
+
+
+def obtener_plantilla(imagen, carpeta=CARPETA_BOTONES):
+    """Devuelve la plantilla precargada (la carga bajo demanda si falta) o None"""
+    clave = os.path.basename(imagen).lower()
+    with _lock_plantillas:
+        plantilla = _plantillas.get(clave)
+    if plantilla is not None:
+        return plantilla
+
+    ruta = os.path.join(carpeta, imagen)
+    if not os.path.isfile(ruta):
+        return None
+    plantilla = _leer_gris(ruta)
+    if plantilla is not None:
+        with _lock_plantillas:
+            _plantillas[clave] = plantilla
+    return plantilla
+
+
+def _escalar(plantilla, escala):
+    """Redimensiona una plantilla al factor indicado"""
+    if escala == 1.0:
+        return plantilla
+    alto, ancho = plantilla.shape[:2]
+    interpolacion = cv2.INTER_AREA if escala < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(
+        plantilla,
+        (max(int(round(ancho * escala)), 1), max(int(round(alto * escala)), 1)),
+        interpolation=interpolacion
+    )
+
+
+def escala_sesion():
+    """Escala detectada en esta sesión (None si aún no se ha calibrado)"""
+    return _escala_sesion
+
+
+def reiniciar_escala():
+    """Olvida la escala calibrada (p. ej. tras cambiar el zoom de Edge)"""
+    global _escala_sesion, _calibrada_en_sesion
+    with _lock_escala:
+        _escala_sesion = None
+        _calibrada_en_sesion = False
+        _fallos_seguidos.clear()
+        _escaladas.clear()
+
+
+def plantilla_escalada(imagen):
+    """Devuelve la plantilla ajustada a la escala de la sesión (cacheada)"""
+    plantilla = obtener_plantilla(imagen)
+    escala = _escala_sesion or 1.0
+    if plantilla is None or escala == 1.0:
+        return plantilla
+
+    clave = (os.path.basename(imagen).lower(), escala)
+    with _lock_escala:
+        escalada = _escaladas.get(clave)
+    if escalada is None:
+        escalada = _escalar(plantilla, escala)
+        with _lock_escala:
+            _escaladas[clave] = escalada
+    return escalada
+
+
+def _mejor_puntaje(frame, plantilla):
+    """Puntaje máximo de correlación de la plantilla en el frame (-1 si no cabe)"""
+    if plantilla.shape[0] > frame.shape[0] or plantilla.shape[1] > frame.shape[1]:
+        return -1.0
+    resultado = cv2.matchTemplate(frame, plantilla, cv2.TM_CCOEFF_NORMED)
+    return float(cv2.minMaxLoc(resultado)[1])
+
+
+def calibrar_escala(frame, imagenes, confianza=0.8):
+    """
+    Busca la escala de las plantillas en el frame: primero prueba las escalas
+    candidatas a media resolución (pyrDown) y luego refina alrededor de las dos
+    mejores a resolución completa. Si supera `confianza`, la fija para la sesión.
+    """
+    global _escala_sesion
+    inicio = time.time()
+    reducido = cv2.pyrDown(frame)
+
+    gruesas = []
+    for escala in ESCALAS_CANDIDATAS:
+        puntaje = -1.0
+        for imagen in imagenes:
+            plantilla = obtener_plantilla(imagen)
+            if plantilla is None:
+                continue
+            plantilla_reducida = _escalar(plantilla, escala * 0.5)
+            # Plantillas muy pequeñas pierden detalle a media resolución
+            if min(plantilla_reducida.shape[:2]) < 8:
+                puntaje = max(puntaje, _mejor_puntaje(frame, _escalar(plantilla, escala)))
+            else:
+                puntaje = max(puntaje, _mejor_puntaje(reducido, plantilla_reducida))
+        gruesas.append((puntaje, escala))
+
+    gruesas.sort(reverse=True)
+    mejor_puntaje, mejor_escala = -1.0, None
+    for _, escala_base in gruesas[:2]:
+        pasos = np.arange(-2, 3) * PASO_REFINAMIENTO
+        for delta in pasos:
+            escala = round(escala_base + float(delta), 3)
+            if escala <= 0:
+                continue
+            for imagen in imagenes:
+                plantilla = obtener_plantilla(imagen)
+                if plantilla is None:
+                    continue
+                puntaje = _mejor_puntaje(frame, _escalar(plantilla, escala))
+                if puntaje > mejor_puntaje:
+                    mejor_puntaje, mejor_escala = puntaje, escala
+
+    if mejor_escala is None or mejor_puntaje < confianza:
+        return None
+
+    with _lock_escala:
+        _escala_sesion = mejor_escala
+        _escaladas.clear()
+    print(
+        f"📐 Escala de botones calibrada: {mejor_escala:.3f} "
+        f"(confianza {mejor_puntaje:.2f}, {time.time() - inicio:.2f}s)"
+    )
+    return mejor_escala
+
+
+def establecer_fuente_captura(fuente=None):
+    """
+    Reemplaza la captura de pantalla por otra fuente (función sin argumentos que
+    devuelve un frame en grises), p. ej. un replay grabado. None = pantalla real.
+    """
+    global _fuente_captura
+    _fuente_captura = fuente
+
+
+def capturar_pantalla_gris():
+    """Captura la pantalla completa una vez y la devuelve en escala de grises"""
+    if _fuente_captura is not None:
+        return _fuente_captura()
+    captura = pyautogui.screenshot()
+    return cv2.cvtColor(np.asarray(captura), cv2.COLOR_RGB2GRAY)
+
+
+def _obtener_pool():
+    """Pool de hilos para el mosaico, creado una sola vez y reutilizado"""
+    global _pool_mosaico
+    with _lock_pool:
+        if _pool_mosaico is None:
+            _pool_mosaico = ThreadPoolExecutor(
+                max_workers=TRABAJADORES_MOSAICO,
+                thread_name_prefix="mosaico"
+            )
+        return _pool_mosaico
+
+
+def _correlacionar(frame, plantilla):
+    """Devuelve (puntaje, (x, y)) de la mejor coincidencia; en mosaico si el frame es grande"""
+    alto_frame = frame.shape[0]
+    alto = plantilla.shape[0]
+    franjas = TRABAJADORES_MOSAICO
+    if franjas <= 1 or frame.shape[0] * frame.shape[1] < PIXELES_MIN_MOSAICO or alto_frame < 2 * alto * franjas:
+        resultado = cv2.matchTemplate(frame, plantilla, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(resultado)
+        return max_val, max_loc
+
+    # Franjas horizontales solapadas en (alto - 1) filas para no perder coincidencias en los bordes
+    paso = -(-alto_frame // franjas)
+
+    def _franja(y0):
+        y1 = min(y0 + paso + alto - 1, alto_frame)
+        resultado = cv2.matchTemplate(frame[y0:y1], plantilla, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(resultado)
+        return max_val, (max_loc[0], max_loc[1] + y0)
+
+    return max(_obtener_pool().map(_franja, range(0, alto_frame, paso)), key=lambda r: r[0])
+
+
+def localizar_en_frame(frame, imagen, confianza=0.9, region=None):
+    """
+    Busca la plantilla en un frame ya capturado y devuelve su centro o None.
+    `region` = (x, y, ancho, alto) limita la búsqueda a un recorte del frame.
+    Usa la plantilla ajustada a la escala calibrada en la sesión.
+    """
+    plantilla = plantilla_escalada(imagen)
+    if plantilla is None or frame is None:
+        return None
+
+    offset_x, offset_y = 0, 0
+    if region:
+        x, y, ancho_region, alto_region = region
+        offset_x, offset_y = max(int(x), 0), max(int(y), 0)
+        frame = frame[offset_y:offset_y + int(alto_region), offset_x:offset_x + int(ancho_region)]
+
+    alto, ancho = plantilla.shape[:2]
+    if frame.shape[0] < alto or frame.shape[1] < ancho:
+        return None
+
+    max_val, max_loc = _correlacionar(frame, plantilla)
+    if max_val < confianza:
+        return None
+
+    return Coincidencia(
+        offset_x + max_loc[0] + ancho // 2,
+        offset_y + max_loc[1] + alto // 2,
+        float(max_val)
+    )
+
+
+# ==================== MEMORIA DE REGIONES ====================
+
+def cargar_regiones(ruta=None):
+    """Carga desde disco la última posición conocida de cada botón"""
+    ruta = ruta or ARCHIVO_REGIONES
+    try:
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf8") as f:
+                datos = json.load(f)
+            with _lock_regiones:
+                _regiones.update(datos)
+            print(f"📌 Regiones de botones recuperadas: {len(datos)}")
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer las regiones guardadas: {e}")
+
+
+def guardar_regiones(ruta=None):
+    """Guarda en disco la última posición conocida de cada botón"""
+    ruta = ruta or ARCHIVO_REGIONES
+    try:
+        with _lock_regiones:
+            datos = dict(_regiones)
+        with open(ruta, "w", encoding="utf8") as f:
+            json.dump(datos, f, indent=2)
+    except Exception as e:
+        print(f"⚠️ No se pudieron guardar las regiones: {e}")
+
+
+def region_recordada(imagen, frame):
+    """Devuelve la ventana (x, y, ancho, alto) alrededor del último acierto o None"""
+    clave = os.path.basename(imagen).lower()
+    with _lock_regiones:
+        previa = _regiones.get(clave)
+    plantilla = plantilla_escalada(imagen)
+    if not previa or plantilla is None:
+        return None
+
+    # La memoria solo vale para la misma resolución de pantalla
+    if previa.get("pantalla") != [int(frame.shape[1]), int(frame.shape[0])]:
+        return None
+
+    alto, ancho = plantilla.shape[:2]
+    x = previa["x"] - ancho // 2 - MARGEN_REGION
+    y = previa["y"] - alto // 2 - MARGEN_REGION
+    return (max(x, 0), max(y, 0), ancho + 2 * MARGEN_REGION, alto + 2 * MARGEN_REGION)
+
+
+def registrar_acierto(imagen, coincidencia, frame):
+    """Memoriza la posición del acierto y la persiste si cambió"""
+    clave = os.path.basename(imagen).lower()
+    nueva = {
+        "x": int(coincidencia.x),
+        "y": int(coincidencia.y),
+        "pantalla": [int(frame.shape[1]), int(frame.shape[0])]
+    }
+    with _lock_regiones:
+        previa = _regiones.get(clave)
+        cambio = (
+            not previa
+            or previa.get("pantalla") != nueva["pantalla"]
+            or abs(previa["x"] - nueva["x"]) > 4
+            or abs(previa["y"] - nueva["y"]) > 4
+        )
+        if cambio:
+            _regiones[clave] = nueva
+    if cambio:
+        guardar_regiones()
+
+
+def _debe_calibrar(imagen):
+    """
+    Cuenta un fallo del botón y dice si toca calibrar: el primer fallo de la
+    sesión sin escala, o el fallo número FALLOS_PARA_CALIBRAR seguido de un
+    botón con posición recordada (ya encontrado antes). Un botón que aún no
+    está en pantalla no vuelve a pagar la pirámide en cada sondeo.
+    """
+    global _calibrada_en_sesion
+    clave = os.path.basename(imagen).lower()
+    with _lock_regiones:
+        encontrado_antes = clave in _regiones
+    with _lock_escala:
+        fallos = _fallos_seguidos.get(clave, 0) + 1
+        _fallos_seguidos[clave] = fallos
+        if _escala_sesion is None and not _calibrada_en_sesion:
+            _calibrada_en_sesion = True
+            return True
+        return encontrado_antes and fallos == FALLOS_PARA_CALIBRAR
+
+
+def localizar(frame, imagen, confianza=0.9):
+    """
+    Busca primero en la ventana alrededor del último acierto y, si no aparece,
+    en la pantalla completa. Si no aparece y _debe_calibrar lo indica, calibra
+    la escala con la pirámide y repite la búsqueda una vez; si aparece sin
+    escalar y la sesión aún no tiene escala, queda en 1.0. Memoriza la
+    posición encontrada.
+    """
+    region = region_recordada(imagen, frame)
+    coincidencia = None
+    if region:
+        coincidencia = localizar_en_frame(frame, imagen, confianza, region=region)
+    if coincidencia is None:
+        coincidencia = localizar_en_frame(frame, imagen, confianza)
+    if coincidencia is None:
+        if _debe_calibrar(imagen) and calibrar_escala(frame, [imagen], confianza):
+            coincidencia = localizar_en_frame(frame, imagen, confianza)
+    elif _escala_sesion is None:
+        _fijar_escala_directa()
+    if coincidencia is not None:
+        with _lock_escala:
+            _fallos_seguidos.pop(os.path.basename(imagen).lower(), None)
+        registrar_acierto(imagen, coincidencia, frame)
+    return coincidencia
+
+
+def _fijar_escala_directa():
+    """Las plantillas coinciden sin escalar: la sesión queda en 1.0 y no se vuelve a calibrar"""
+    global _escala_sesion
+    with _lock_escala:
+        if _escala_sesion is None:
+            _escala_sesion = 1.0
+            print("📐 Escala de botones: 1.000 (coincidencia directa, sin calibrar)")
+
+
+def localizar_primera(frame, imagenes, confianza=0.9):
+    """
+    Compara varias plantillas contra el mismo frame y devuelve (imagen, coincidencia)
+    de la que aparece con mayor confianza, o (None, None) si ninguna aparece.
+    """
+    mejor_imagen, mejor = None, None
+    for imagen in imagenes:
+        coincidencia = localizar(frame, imagen, confianza)
+        if coincidencia is not None and (mejor is None or coincidencia.confianza > mejor.confianza):
+            mejor_imagen, mejor = imagen, coincidencia
+    return mejor_imagen, mejor
+
+
+def region_sin_cambios(frame_a, frame_b, coincidencia, imagen, margen=12, umbral=UMBRAL_CAMBIO):
+    """
+    True si los píxeles alrededor de la coincidencia son iguales en ambos frames,
+    es decir, el botón ya no se está animando ni desplazando.
+    """
+    plantilla = plantilla_escalada(imagen)
+    if frame_a is None or frame_b is None or plantilla is None or frame_a.shape != frame_b.shape:
+        return False
+    alto, ancho = plantilla.shape[:2]
+    x0 = max(int(coincidencia.x) - ancho // 2 - margen, 0)
+    y0 = max(int(coincidencia.y) - alto // 2 - margen, 0)
+    x1 = int(coincidencia.x) + ancho // 2 + margen
+    y1 = int(coincidencia.y) + alto // 2 + margen
+    return diferencia_frames(frame_a[y0:y1, x0:x1], frame_b[y0:y1, x0:x1]) <= umbral
+
+
+# ==================== ESPERA POR ESTABILIDAD ====================
+
+def capturar_reducida(escala=ESCALA_ESTABILIDAD):
+    """Captura la pantalla en grises reducida `escala` veces (para comparar rápido)"""
+    frame = capturar_pantalla_gris()
+    alto, ancho = frame.shape[:2]
+    return cv2.resize(
+        frame,
+        (max(ancho // escala, 1), max(alto // escala, 1)),
+        interpolation=cv2.INTER_AREA
+    )
+
+
+def diferencia_frames(frame_a, frame_b):
+    """Diferencia media absoluta entre dos frames del mismo tamaño"""
+    if frame_a is None or frame_b is None or frame_a.shape != frame_b.shape:
+        return float("inf")
+    return float(cv2.absdiff(frame_a, frame_b).mean())
+
+
+def esperar_pantalla_estable(maximo, ventana_estable=0.8, intervalo=0.15,
+                             minimo=0.3, requiere_cambio=False, umbral=UMBRAL_CAMBIO):
+    """
+    Espera hasta que la pantalla no cambie durante `ventana_estable` segundos,
+    sin pasar de `maximo` (el antiguo sleep fijo). Con `requiere_cambio=True`
+    primero espera a que algo cambie (p. ej. el desplegable tras escribir).
+    Devuelve los segundos realmente esperados.
+    """
+    return esperar_estable_detalle(
+        maximo, ventana_estable, intervalo, minimo, requiere_cambio, umbral
+    )[0]
+
+
+def esperar_estable_detalle(maximo, ventana_estable=0.8, intervalo=0.15,
+                            minimo=0.3, requiere_cambio=False, umbral=UMBRAL_CAMBIO):
+    """
+    Como esperar_pantalla_estable, pero devuelve (segundos, agotado):
+    agotado=True si se llegó a `maximo` sin que la pantalla quedara estable.
+    """
+    inicio = time.time()
+    try:
+        referencia = capturar_reducida()
+    except Exception:
+        time.sleep(maximo)
+        return maximo, True
+
+    anterior = referencia
+    hubo_cambio = not requiere_cambio
+    estable_desde = time.time()
+
+    while True:
+        transcurrido = time.time() - inicio
+        if transcurrido >= maximo:
+            return transcurrido, True
+
+        time.sleep(min(intervalo, max(maximo - transcurrido, 0)))
+        try:
+            actual = capturar_reducida()
+        except Exception:
+            continue
+
+        if diferencia_frames(anterior, actual) > umbral:
+            estable_desde = time.time()
+        if not hubo_cambio and diferencia_frames(referencia, actual) > umbral:
+            hubo_cambio = True
+            estable_desde = time.time()
+        anterior = actual
+
+        ahora = time.time()
+        if (hubo_cambio
+                and ahora - inicio >= minimo
+                and ahora - estable_desde >= ventana_estable):
+            return ahora - inicio, False
+
+
+# ==================== SONDA DE PÍXELES ====================
+
+def capturar_parche(x, y, lado=LADO_PARCHE):
+    """Captura solo un cuadrado de `lado` px centrado en (x, y), en grises"""
+    x0, y0 = max(int(x) - lado // 2, 0), max(int(y) - lado // 2, 0)
+    if _fuente_captura is not None:
+        return _fuente_captura()[y0:y0 + lado, x0:x0 + lado]
+    captura = pyautogui.screenshot(region=(x0, y0, lado, lado))
+    return cv2.cvtColor(np.asarray(captura), cv2.COLOR_RGB2GRAY)
+
+
+def esperar_parche(x, y, referencia, igual=False, maximo=5.0, estable=0.2, intervalo=0.05,
+                   umbral=UMBRAL_PARCHE):
+    """
+    Sondea el parche en (x, y) hasta que difiera de `referencia` (igual=False)
+    o vuelva a coincidir con ella (igual=True) y se mantenga quieto `estable`
+    segundos. Devuelve True si ocurrió antes de `maximo` segundos.
+    """
+    inicio = time.time()
+    anterior, quieto_desde = None, None
+    while time.time() - inicio < maximo:
+        try:
+            parche = capturar_parche(x, y, referencia.shape[1])
+        except Exception:
+            parche = None
+        if parche is not None and (diferencia_frames(referencia, parche) <= umbral) == igual:
+            if anterior is None or diferencia_frames(anterior, parche) > umbral:
+                quieto_desde = time.time()
+            elif time.time() - quieto_desde >= estable:
+                return True
+            anterior = parche
+        else:
+            anterior = None
+        time.sleep(intervalo)
+    return False
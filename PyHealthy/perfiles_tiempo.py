@@ -0,0 +1,203 @@
+"""
+Perfiles de tiempo aprendidos por equipo y por paso de la automatización.
+
+Cada espera de pantalla con nombre (p. ej. "grabar.tras_click") guarda cuánto
+tardó realmente TecFood en quedar listo. Con las últimas muestras se calcula
+un percentil móvil y la siguiente ejecución usa como tope percentil + margen
+en lugar de la constante original, que queda como máximo absoluto. Si un paso
+empieza a fallar, su tope se multiplica (retroceso) hasta volver a la
+constante; cada acierto baja un nivel.
+
+Una espera que agota el tope sin que la pantalla se estabilice no es una
+latencia real: no entra en el percentil, solo sube un nivel de retroceso de
+esa espera, y la siguiente espera que sí se estabiliza lo vuelve a cero.
+
+Los perfiles se guardan en perfiles_tiempo.json, agrupados por equipo.
+Para revisarlos:
+    python perfiles_tiempo.py [--maquina NOMBRE]
+"""
+import argparse
+import json
+import os
+import platform
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+ARCHIVO_PERFILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfiles_tiempo.json")
+
+VENTANA_MUESTRAS = 50       # muestras recientes por paso
+MIN_MUESTRAS = 5            # antes de esto se usa la constante original
+PERCENTIL = 90
+MARGEN_RELATIVO = 1.3       # tope = p90 * 1.3 + 0.5 s
+MARGEN_ABSOLUTO = 0.5
+FACTOR_RETROCESO = 1.5      # cada nivel de fallo multiplica el tope aprendido
+NIVEL_MAXIMO = 4
+
+_perfiles = {}
+_retroceso = {}
+_agotadas = {}              # paso → esperas agotadas seguidas
+_lock_perfiles = threading.Lock()
+_suspension = threading.local()
+
+
+def maquina_actual():
+    return platform.node() or "desconocida"
+
+
+def _muestras(paso):
+    return _perfiles.setdefault(paso, deque(maxlen=VENTANA_MUESTRAS))
+
+
+def cargar_perfiles(ruta=None, maquina=None):
+    """Carga las muestras guardadas de este equipo"""
+    ruta = ruta or ARCHIVO_PERFILES
+    maquina = maquina or maquina_actual()
+    if not os.path.exists(ruta):
+        return
+    try:
+        with open(ruta, "r", encoding="utf8") as f:
+            datos = json.load(f).get(maquina, {})
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer los perfiles de tiempo: {e}")
+        return
+    with _lock_perfiles:
+        _perfiles.clear()
+        _retroceso.clear()
+        _agotadas.clear()
+        for paso, perfil in datos.items():
+            _muestras(paso).extend(perfil.get("muestras", []))
+            if perfil.get("agotadas_seguidas"):
+                _agotadas[paso] = min(int(perfil["agotadas_seguidas"]), NIVEL_MAXIMO)
+            if perfil.get("nivel_retroceso"):
+                base = _base_paso(paso)
+                _retroceso[base] = max(_retroceso.get(base, 0), int(perfil["nivel_retroceso"]))
+    print(f"⏱️ Perfiles de tiempo cargados para '{maquina}': {len(datos)} pasos")
+
+
+def guardar_perfiles(ruta=None, maquina=None):
+    """Escribe los perfiles de este equipo sin tocar los de los demás"""
+    ruta = ruta or ARCHIVO_PERFILES
+    maquina = maquina or maquina_actual()
+    todos = {}
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, "r", encoding="utf8") as f:
+                todos = json.load(f)
+        except Exception:
+            todos = {}
+    todos[maquina] = resumen_perfiles()
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf8") as f:
+        json.dump(todos, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def _base_paso(paso):
+    """'grabar.tras_click' → 'grabar' (el retroceso se aplica al paso completo)"""
+    return paso.split(".", 1)[0]
+
+
+def tope_aprendido(paso, defecto, minimo=0.0):
+    """Tope de espera para `paso`: percentil + margen con retroceso, nunca sobre `defecto`"""
+    with _lock_perfiles:
+        muestras = list(_perfiles.get(paso, ()))
+        nivel = _retroceso.get(_base_paso(paso), 0) + _agotadas.get(paso, 0)
+    if len(muestras) < MIN_MUESTRAS:
+        return defecto
+    tope = float(np.percentile(muestras, PERCENTIL)) * MARGEN_RELATIVO + MARGEN_ABSOLUTO
+    tope *= FACTOR_RETROCESO ** min(nivel, NIVEL_MAXIMO)
+    return min(defecto, max(tope, minimo))
+
+
+def muestras_de(paso):
+    """Copia de las muestras registradas de `paso` (lista vacía si no hay)"""
+    with _lock_perfiles:
+        return list(_perfiles.get(paso, ()))
+
+
+@contextmanager
+def suspendidos():
+    """No registra esperas ni resultados en este hilo dentro del bloque (p. ej. simulaciones)"""
+    anterior = getattr(_suspension, "activa", False)
+    _suspension.activa = True
+    try:
+        yield
+    finally:
+        _suspension.activa = anterior
+
+
+def registrar_espera(paso, segundos, agotada=False):
+    """Muestra de latencia de `paso`; una espera agotada solo sube su retroceso"""
+    if getattr(_suspension, "activa", False):
+        return
+    with _lock_perfiles:
+        if agotada:
+            _agotadas[paso] = min(_agotadas.get(paso, 0) + 1, NIVEL_MAXIMO)
+        else:
+            _muestras(paso).append(round(float(segundos), 3))
+            _agotadas.pop(paso, None)
+
+
+def registrar_resultado(paso, exito):
+    """Un paso fallido sube un nivel de retroceso; uno correcto lo baja"""
+    if getattr(_suspension, "activa", False):
+        return
+    base = _base_paso(paso)
+    with _lock_perfiles:
+        nivel = _retroceso.get(base, 0)
+        nivel = max(nivel - 1, 0) if exito else min(nivel + 1, NIVEL_MAXIMO)
+        if nivel:
+            _retroceso[base] = nivel
+        else:
+            _retroceso.pop(base, None)
+    if not exito:
+        print(f"⏱️ Paso '{base}' falló: retroceso nivel {nivel}")
+
+
+def resumen_perfiles():
+    with _lock_perfiles:
+        perfiles = {paso: list(m) for paso, m in _perfiles.items()}
+        retroceso = dict(_retroceso)
+        agotadas = dict(_agotadas)
+    resumen = {}
+    for paso, muestras in sorted(perfiles.items()):
+        resumen[paso] = {
+            "muestras": muestras,
+            "p50": round(float(np.percentile(muestras, 50)), 2) if muestras else None,
+            f"p{PERCENTIL}": round(float(np.percentile(muestras, PERCENTIL)), 2) if muestras else None,
+            "nivel_retroceso": retroceso.get(_base_paso(paso), 0),
+            "agotadas_seguidas": agotadas.get(paso, 0),
+        }
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfiles de tiempo aprendidos por paso")
+    parser.add_argument("--maquina", help="Equipo a mostrar (por defecto todos)")
+    parser.add_argument("--archivo", default=ARCHIVO_PERFILES)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archivo):
+        print(f"No hay perfiles guardados en {args.archivo}")
+        return
+    with open(args.archivo, "r", encoding="utf8") as f:
+        todos = json.load(f)
+
+    for maquina, pasos in sorted(todos.items()):
+        if args.maquina and maquina != args.maquina:
+            continue
+        print(f"\n🖥️ {maquina}")
+        for paso, datos in pasos.items():
+            print(
+                f"   {paso:32s} n={len(datos['muestras']):3d} "
+                f"p50={datos['p50']}s p{PERCENTIL}={datos[f'p{PERCENTIL}']}s "
+                f"retroceso={datos['nivel_retroceso']} "
+                f"agotadas={datos.get('agotadas_seguidas', 0)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
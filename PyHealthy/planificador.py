@@ -0,0 +1,42 @@
+"""
+Planificador de la carga de facturas en TecFood.
+
+Ordena la cola por contexto (unidad, fecha de la factura) para que las
+facturas que comparten contexto queden seguidas. Dentro de un mismo contexto
+no hace falta volver a elegir la unidad, escribir la fecha, aplicar el filtro
+ni recargar la página entre facturas.
+"""
+import pandas as pd
+
+from validacion_facturas import convertir_fechas
+
+PASOS_CONTEXTO = ("unidad", "fecha", "aplicar_filtro")
+
+
+def planificar(df_facturas, unidad_por_defecto):
+    """
+    Devuelve la cola ordenada por (unidad, fecha) conservando el orden original
+    dentro de cada contexto, con las columnas auxiliares `_unidad` y `_contexto`.
+    """
+    cola = df_facturas.copy()
+    if "Unidad" in cola.columns:
+        unidad = cola["Unidad"].astype(str).str.strip()
+        unidad = unidad.where(~unidad.isin(("", "None", "nan")), unidad_por_defecto)
+    else:
+        unidad = pd.Series(str(unidad_por_defecto), index=cola.index)
+    fecha = convertir_fechas(cola["Fecha"])
+
+    cola["_unidad"] = unidad
+    cola["_contexto"] = unidad + "|" + fecha.dt.strftime("%d%m%Y").fillna("")
+    cola["_orden_fecha"] = fecha
+    cola = cola.sort_values(["_unidad", "_orden_fecha"], kind="stable").drop(columns="_orden_fecha")
+
+    contextos = cola["_contexto"].nunique()
+    print(f"🗺️ Plan: {len(cola)} facturas en {contextos} contexto(s) unidad/fecha; "
+          f"{len(cola) - contextos} cambios de contexto evitados")
+    return cola
+
+
+def pasos_sin_contexto(pasos):
+    """Quita de una lista de pasos los de unidad/fecha/filtro (el contexto ya está aplicado)"""
+    return [(nombre, accion) for nombre, accion in pasos if nombre not in PASOS_CONTEXTO]
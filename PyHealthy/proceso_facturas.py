@@ -0,0 +1,347 @@
+"""
+Secuencia de pasos para cargar una factura en TecFood.
+
+No depende de la interfaz: recibe un driver (driver_tecfood) y los datos de
+la factura, y ejecuta unidad → fecha → filtro → añadir → PDF → remitente →
+serie → emisión → valor → grabar → productos → finalizar → recargar.
+Con una bitácora (bitacora.py) cada paso grabado queda registrado y una
+factura a medias se retoma reabriéndola en lugar de crearla de nuevo.
+
+Cada paso tiene su política en POLITICAS_PASO: cuántas veces se reintenta,
+qué recuperación se hace antes de reintentar (Esc, recargar o volver a
+buscar el ancla) y cuántos segundos puede consumir en total. Un paso que
+agota su política deja la factura como fallida con ese paso registrado.
+Un paso que hizo clic en grabar sin poder confirmarlo (SIN_CONFIRMAR) no se
+reintenta: la factura queda para revisión manual y una reanudación la salta.
+"""
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+import bitacora as bitacora_avance
+import perfiles_tiempo
+import planificador
+import trazas
+
+
+PoliticaPaso = namedtuple("PoliticaPaso", "reintentos recuperacion presupuesto")
+
+RECUPERAR_NADA = "ninguna"      # solo volver a buscar el elemento
+RECUPERAR_ESC = "esc"           # cerrar el diálogo o desplegable que lo tapa
+RECUPERAR_RECARGA = "recargar"  # recargar y repetir desde el primer paso (solo antes de grabar)
+RECUPERAR_ANCLA = "reanclar"    # cerrar el diálogo y olvidar las posiciones aprendidas
+
+# Esc en el formulario de la factura lo cerraría sin grabar: esos pasos solo se repiten.
+# grabar, producto y finalizar solo se reintentan si fallaron antes del clic que
+# graba; después devuelven True o SIN_CONFIRMAR, que no se reintenta.
+POLITICAS_PASO = {
+    "unidad": PoliticaPaso(2, RECUPERAR_RECARGA, 90),
+    "fecha": PoliticaPaso(2, RECUPERAR_RECARGA, 60),
+    "aplicar_filtro": PoliticaPaso(2, RECUPERAR_RECARGA, 60),
+    "abrir_factura": PoliticaPaso(2, RECUPERAR_RECARGA, 90),
+    "anadir_factura": PoliticaPaso(2, RECUPERAR_ESC, 60),
+    "pdf": PoliticaPaso(2, RECUPERAR_ESC, 60),
+    "remitente": PoliticaPaso(2, RECUPERAR_NADA, 60),
+    "serie": PoliticaPaso(2, RECUPERAR_NADA, 30),
+    "emision": PoliticaPaso(2, RECUPERAR_NADA, 30),
+    "valor": PoliticaPaso(2, RECUPERAR_NADA, 30),
+    "grabar": PoliticaPaso(2, RECUPERAR_NADA, 60),
+    "productos": PoliticaPaso(2, RECUPERAR_NADA, 40),
+    "producto": PoliticaPaso(2, RECUPERAR_ANCLA, 90),
+    "finalizar": PoliticaPaso(2, RECUPERAR_ESC, 60),
+}
+POLITICA_POR_DEFECTO = PoliticaPaso(1, RECUPERAR_NADA, 30)
+
+# Paso que informa facturas_fallidas para las facturas que nunca se intentaron
+SIN_PROCESAR = "sin procesar"
+
+COMPLETADO, FALLIDO, RECARGADO = "completado", "fallido", "recargado"
+
+# Lo que devuelve un paso que graba en TecFood (grabar, producto, finalizar)
+# cuando ya hizo clic en grabar pero no pudo confirmar el resultado. False
+# sigue queriendo decir "no se llegó a grabar" y se puede repetir.
+SIN_CONFIRMAR = "sin confirmar"
+
+
+def _notificar_consola(mensaje):
+    print(f"⚠️ {mensaje}")
+
+
+def _recuperar(driver, recuperacion):
+    try:
+        if recuperacion == RECUPERAR_ESC:
+            return driver.cancelar()
+        if recuperacion == RECUPERAR_RECARGA:
+            return driver.recargar()
+        if recuperacion == RECUPERAR_ANCLA:
+            return driver.reanclar()
+        return True
+    except Exception as e:
+        print(f"❌ Error en la recuperación '{recuperacion}': {e}")
+        return False
+
+
+def ejecutar_paso(driver, nombre_paso, accion, intentos, etiqueta=None, categoria="paso", **traza):
+    """
+    Corre `accion` con la política de `nombre_paso`. Devuelve COMPLETADO,
+    FALLIDO (política agotada), RECARGADO (la recuperación recargó la página
+    y hay que repetir desde el primer paso) o SIN_CONFIRMAR (la acción grabó
+    sin confirmación; repetirla podría duplicar). `intentos` guarda {etiqueta:
+    [reintentos usados, inicio]} para que el presupuesto cuente también tras
+    una recarga.
+    """
+    politica = POLITICAS_PASO.get(nombre_paso, POLITICA_POR_DEFECTO)
+    etiqueta = etiqueta or nombre_paso
+    registro = intentos.setdefault(etiqueta, [0, time.time()])
+    while True:
+        with trazas.tramo(etiqueta, categoria, intento=registro[0] + 1, **traza) as t:
+            try:
+                completado = accion()
+            except Exception as e:
+                print(f"❌ Error en el paso '{etiqueta}': {e}")
+                completado = False
+            t["completado"] = completado
+        sin_confirmar = completado == SIN_CONFIRMAR
+        perfiles_tiempo.registrar_resultado(nombre_paso, bool(completado) and not sin_confirmar)
+        if sin_confirmar:
+            print(f"⚠️ Paso '{etiqueta}': grabado sin confirmar, no se repite.")
+            return SIN_CONFIRMAR
+        if completado:
+            return COMPLETADO
+
+        if registro[0] >= politica.reintentos:
+            print(f"❌ Paso '{etiqueta}' sin reintentos ({politica.reintentos}).")
+            return FALLIDO
+        if time.time() - registro[1] >= politica.presupuesto:
+            print(f"❌ Paso '{etiqueta}' agotó su presupuesto de {politica.presupuesto}s.")
+            return FALLIDO
+        registro[0] += 1
+        print(f"🔁 Paso '{etiqueta}': recuperación '{politica.recuperacion}', "
+              f"reintento {registro[0]}/{politica.reintentos}")
+        if not _recuperar(driver, politica.recuperacion):
+            return FALLIDO
+        if politica.recuperacion == RECUPERAR_RECARGA:
+            return RECARGADO
+
+
+def _marcar_fallida(bitacora, clave, numero_factura, paso, notificar):
+    notificar(f"Factura {numero_factura} marcada como fallida en el paso '{paso}'.")
+    if bitacora:
+        bitacora.registrar(clave, bitacora_avance.PASO_FALLIDA, paso_fallido=paso)
+    return False
+
+
+def _marcar_revision(bitacora, clave, numero_factura, paso, notificar):
+    notificar(f"Factura {numero_factura}: el paso '{paso}' se grabó sin confirmación; "
+              f"revísala en TecFood (una reanudación la saltará).")
+    if bitacora:
+        bitacora.registrar(clave, bitacora_avance.PASO_FALLIDA, paso_fallido=paso, revisar=True)
+    return False
+
+
+def _cerrar_fallida(bitacora, clave, numero_factura, paso, resultado, notificar):
+    """Registra un paso no completado: para revisión si quedó sin confirmar, si no como fallida"""
+    if resultado == SIN_CONFIRMAR:
+        return _marcar_revision(bitacora, clave, numero_factura, paso, notificar)
+    return _marcar_fallida(bitacora, clave, numero_factura, paso, notificar)
+
+
+def pasos_encabezado(driver, codigo_unidad, factura, fecha_formateada, ruta_pdf):
+    """Lista ordenada de (nombre_paso, acción) hasta abrir la pestaña de productos"""
+    numero_factura = str(factura["N° Factura"]).strip()
+    nit = str(factura.get("NIT", "")).strip()
+    return [
+        ("unidad", lambda: driver.seleccionar_unidad(codigo_unidad)),
+        ("fecha", lambda: driver.ingresar_fecha(fecha_formateada)),
+        ("aplicar_filtro", driver.aplicar_filtro),
+        ("anadir_factura", driver.anadir_factura),
+        ("pdf", lambda: driver.adjuntar_pdf(ruta_pdf)),
+        ("remitente", lambda: driver.ingresar_remitente(nit, numero_factura)),
+        ("serie", driver.ingresar_serie),
+        ("emision", lambda: driver.ingresar_emision(fecha_formateada)),
+        ("valor", lambda: driver.ingresar_valor("0")),
+        ("grabar", driver.grabar),
+        ("productos", driver.abrir_productos),
+    ]
+
+
+def pasos_reapertura(driver, codigo_unidad, numero_factura, fecha_formateada):
+    """Pasos para volver a una factura cuyo encabezado ya se grabó"""
+    return [
+        ("unidad", lambda: driver.seleccionar_unidad(codigo_unidad)),
+        ("fecha", lambda: driver.ingresar_fecha(fecha_formateada)),
+        ("aplicar_filtro", driver.aplicar_filtro),
+        ("abrir_factura", lambda: driver.abrir_factura(numero_factura)),
+        ("productos", driver.abrir_productos),
+    ]
+
+
+def procesar_factura(driver, codigo_unidad, factura, productos, ruta_pdf=None, notificar=None,
+                     bitacora=None, contexto_listo=False, recargar=True):
+    """
+    Carga una factura completa con el driver dado. Devuelve True si quedó
+    finalizada. Cada paso se reintenta según POLITICAS_PASO; el que agota su
+    política deja la factura como fallida (sin finalizar) con el paso anotado.
+    Con `bitacora` se saltan el encabezado y los productos ya grabados.
+    `contexto_listo` omite unidad/fecha/filtro (ya aplicados por la factura
+    anterior) y `recargar=False` deja la página sin recargar al terminar.
+    """
+    notificar = notificar or _notificar_consola
+    numero_factura = str(factura["N° Factura"]).strip()
+    clave = bitacora_avance.clave_factura(codigo_unidad, factura)
+    avance = bitacora.estado(clave) if bitacora else bitacora_avance.EstadoFactura()
+
+    if avance.finalizada:
+        print(f"⏭️ Factura {numero_factura} ya finalizada según la bitácora, se salta.")
+        return True
+    if avance.revisar:
+        notificar(f"La factura {numero_factura} quedó pendiente de revisión manual "
+                  f"('{avance.paso_fallido}'); se salta.")
+        return False
+
+    try:
+        fecha_formateada = pd.to_datetime(factura["Fecha"]).strftime("%d%m%Y")
+    except Exception as e:
+        print("⚠️ Error al procesar la fecha:", e)
+        return _marcar_fallida(bitacora, clave, numero_factura, "fecha", notificar)
+
+    if avance.encabezado:
+        if not driver.puede_reabrir:
+            # Sin abrir_factura solo se podría gastar recargas: se deja para completar a mano
+            notificar(f"La factura {numero_factura} ya tiene el encabezado grabado y el driver "
+                      f"'{driver.nombre}' no puede reabrirla; complétala en TecFood.")
+            return _marcar_fallida(bitacora, clave, numero_factura, "abrir_factura", notificar)
+        print(f"↩️ Reanudando factura {numero_factura}: encabezado ya grabado, "
+              f"{len(avance.productos)} producto(s) en bitácora")
+        pasos_completos = pasos_reapertura(driver, codigo_unidad, numero_factura, fecha_formateada)
+    else:
+        pasos_completos = pasos_encabezado(driver, codigo_unidad, factura, fecha_formateada, ruta_pdf)
+    pasos = planificador.pasos_sin_contexto(pasos_completos) if contexto_listo else pasos_completos
+
+    intentos = {}
+    i = 0
+    while i < len(pasos):
+        nombre_paso, accion = pasos[i]
+        resultado = ejecutar_paso(driver, nombre_paso, accion, intentos)
+        if resultado in (FALLIDO, SIN_CONFIRMAR):
+            return _cerrar_fallida(bitacora, clave, numero_factura, nombre_paso, resultado, notificar)
+        if resultado == RECARGADO:
+            # La recarga vuelve al listado: se repite desde la unidad
+            pasos = pasos_completos
+            i = 0
+            continue
+        if nombre_paso == "grabar" and bitacora:
+            bitacora.registrar(clave, bitacora_avance.PASO_ENCABEZADO, numero=numero_factura)
+        i += 1
+
+    # Agregar productos
+    for i, producto in enumerate(productos):
+        codigo_producto = str(producto["Código Producto"]).strip()
+        if avance.producto_grabado(i, codigo_producto):
+            print(f"⏭️ Producto {i+1}/{len(productos)} ({codigo_producto}) ya grabado.")
+            continue
+        cantidad = str(producto["Cantidad"]).strip().replace(",", ".")
+        valor_unitario = str(producto["Precio"]).strip().replace(",", ".")
+
+        print(f"➕ Agregando producto {i+1}/{len(productos)}: {codigo_producto}")
+        resultado = ejecutar_paso(
+            driver, "producto",
+            lambda: driver.agregar_producto(codigo_producto, cantidad, valor_unitario),
+            intentos, etiqueta=f"producto {i+1}", categoria="producto", codigo=codigo_producto
+        )
+        if resultado != COMPLETADO:
+            notificar(f"No se pudo agregar el producto {codigo_producto}.")
+            return _cerrar_fallida(bitacora, clave, numero_factura, f"producto {i+1}", resultado, notificar)
+
+        if bitacora:
+            bitacora.registrar(clave, bitacora_avance.PASO_PRODUCTO, indice=i, codigo=codigo_producto)
+        print(f"✅ Producto {codigo_producto} grabado correctamente.")
+
+    # Finalizar esta factura
+    resultado = ejecutar_paso(driver, "finalizar", driver.finalizar, intentos)
+    if resultado != COMPLETADO:
+        return _cerrar_fallida(bitacora, clave, numero_factura, "finalizar", resultado, notificar)
+    if bitacora:
+        bitacora.registrar(clave, bitacora_avance.PASO_FINALIZADA, productos=len(productos))
+
+    print(f"✅ Factura {numero_factura} procesada correctamente (productos: {len(productos)})")
+
+    # --- Recargar la página para la siguiente factura (solo si cambia el contexto) ---
+    if recargar:
+        with trazas.tramo("recargar", "paso"):
+            driver.recargar()
+    return True
+
+
+def ejecutar_cola(driver, cola, productos_por_factura, rutas_pdf=None, notificar=None, bitacora=None,
+                  al_terminar_factura=None):
+    """
+    Procesa una cola de planificador.planificar en orden. Reutiliza el contexto
+    unidad/fecha entre facturas seguidas y recarga solo al cambiar de contexto
+    o tras un fallo. `al_terminar_factura(posicion, index, completada)` se
+    llama después de cada factura. Devuelve {index: completada}.
+    """
+    contextos = cola["_contexto"].tolist()
+    resultados = {}
+    contexto_actual = None
+    for posicion, (index, factura_actual) in enumerate(cola.iterrows()):
+        numero_factura = str(factura_actual["N° Factura"]).strip()
+        empresa = str(factura_actual.get("Empresa", "")).strip()
+        nit = str(factura_actual.get("NIT", "")).strip()
+        productos = productos_por_factura.get(numero_factura, [])
+        pdf_encontrado = rutas_pdf.get(index) if rutas_pdf is not None else None
+
+        print(f"\n\n🔁 Procesando factura {posicion+1}/{len(cola)} → {numero_factura}")
+        print(f"   Empresa: {empresa}  NIT: {nit}  Productos: {len(productos)}")
+        if pdf_encontrado:
+            print(f"📄 PDF encontrado: {pdf_encontrado}")
+        else:
+            print("⚠️ PDF no encontrado. Se continúa con la factura (si corresponde).")
+
+        contexto = contextos[posicion]
+        siguiente = contextos[posicion + 1] if posicion + 1 < len(contextos) else None
+        with trazas.tramo(f"factura {numero_factura}", "factura", contexto=contexto,
+                          productos=len(productos)) as traza:
+            completada = procesar_factura(
+                driver,
+                factura_actual["_unidad"],
+                factura_actual,
+                productos,
+                ruta_pdf=pdf_encontrado,
+                notificar=notificar,
+                bitacora=bitacora,
+                contexto_listo=(contexto == contexto_actual),
+                recargar=(siguiente != contexto)
+            )
+            traza["completada"] = completada
+            if completada:
+                contexto_actual = contexto
+            else:
+                # Estado de la página desconocido: la siguiente factura parte de cero
+                contexto_actual = None
+                with trazas.tramo("recargar", "paso", tras_fallo=True):
+                    driver.recargar()
+
+        resultados[index] = completada
+        if al_terminar_factura:
+            al_terminar_factura(posicion, index, completada)
+    return resultados
+
+
+def facturas_fallidas(cola, resultados, bitacora=None):
+    """
+    [(N° Factura, paso fallido o None)] de las facturas de la cola no
+    completadas por ejecutar_cola. Las que no llegaron a procesarse (la cola
+    se cortó antes) cuentan como fallidas en el paso SIN_PROCESAR.
+    """
+    fallidas = []
+    for index, factura in cola.iterrows():
+        if index not in resultados:
+            fallidas.append((str(factura["N° Factura"]).strip(), SIN_PROCESAR))
+            continue
+        if resultados[index]:
+            continue
+        paso = bitacora.estado(bitacora_avance.clave_factura(factura["_unidad"], factura)).paso_fallido if bitacora else None
+        fallidas.append((str(factura["N° Factura"]).strip(), paso))
+    return fallidas
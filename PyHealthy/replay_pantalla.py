@@ -0,0 +1,291 @@
+"""
+Grabación y reproducción de sesiones de pantalla para medir la automatización
+de TecFood sin escritorio Windows.
+
+Grabar (en el equipo Windows, durante una ejecución real):
+    grabador = GrabadorSesion("Grabaciones/2026-10-18_0800")
+    grabador.iniciar()
+    ...
+    grabador.detener()
+
+Reproducir en Linux sin GUI:
+    motor_plantillas.establecer_fuente_captura(FuenteReplay("Grabaciones/..."))
+
+Medir la latencia de búsqueda contra una grabación:
+    python replay_pantalla.py benchmark Grabaciones/2026-10-18_0800
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import motor_plantillas
+
+ARCHIVO_EVENTOS = "eventos.jsonl"
+CARPETA_FRAMES = "frames"
+
+# Funciones de pyautogui cuyas llamadas se registran como eventos
+FUNCIONES_REGISTRADAS = ("click", "typewrite", "press", "hotkey")
+
+
+# ==================== GRABACIÓN ====================
+
+class GrabadorSesion:
+    """Guarda capturas con marca de tiempo y los clics/teclas de una ejecución real"""
+
+    def __init__(self, carpeta, intervalo=0.25, umbral=motor_plantillas.UMBRAL_CAMBIO):
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self.umbral = umbral
+        self._inicio = None
+        self._activo = False
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._archivo_eventos = None
+        self._originales = {}
+        self._frames = 0
+
+    def iniciar(self):
+        os.makedirs(os.path.join(self.carpeta, CARPETA_FRAMES), exist_ok=True)
+        self._archivo_eventos = open(os.path.join(self.carpeta, ARCHIVO_EVENTOS), "a", encoding="utf8")
+        self._inicio = time.time()
+        self._activo = True
+        self._envolver_pyautogui()
+        self.registrar_evento("inicio", epoch=self._inicio)
+        self._hilo = threading.Thread(target=self._bucle_capturas, daemon=True)
+        self._hilo.start()
+        print(f"🎥 Grabando sesión en: {self.carpeta}")
+
+    def detener(self):
+        if not self._activo:
+            return
+        self._activo = False
+        if self._hilo:
+            self._hilo.join(timeout=2)
+        self._restaurar_pyautogui()
+        self.registrar_evento("fin", frames=self._frames)
+        with self._lock:
+            self._archivo_eventos.close()
+            self._archivo_eventos = None
+        print(f"🎥 Grabación finalizada: {self._frames} frames")
+
+    def registrar_evento(self, tipo, **datos):
+        if self._archivo_eventos is None:
+            return
+        evento = {"t": round(time.time() - self._inicio, 3), "tipo": tipo}
+        evento.update(datos)
+        with self._lock:
+            self._archivo_eventos.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            self._archivo_eventos.flush()
+
+    def _bucle_capturas(self):
+        anterior = None
+        while self._activo:
+            try:
+                frame = motor_plantillas.capturar_pantalla_gris()
+                # Solo se guarda un frame nuevo cuando la pantalla cambió
+                if anterior is None or motor_plantillas.diferencia_frames(anterior, frame) > self.umbral:
+                    self._guardar_frame(frame)
+                    anterior = frame
+            except Exception as e:
+                print(f"⚠️ Error capturando frame: {e}")
+            time.sleep(self.intervalo)
+
+    def _guardar_frame(self, frame):
+        nombre = f"{self._frames:06d}.png"
+        ok, datos = cv2.imencode(".png", frame)
+        if not ok:
+            return
+        datos.tofile(os.path.join(self.carpeta, CARPETA_FRAMES, nombre))
+        self._frames += 1
+        self.registrar_evento("frame", archivo=nombre)
+
+    def _envolver_pyautogui(self):
+        pyautogui = motor_plantillas.pyautogui
+        if pyautogui is None:
+            return
+        for nombre in FUNCIONES_REGISTRADAS:
+            original = getattr(pyautogui, nombre)
+            self._originales[nombre] = original
+            setattr(pyautogui, nombre, self._envoltura(nombre, original))
+
+    def _envoltura(self, nombre, original):
+        def _registrada(*args, **kwargs):
+            datos = {"args": [str(a) for a in args]}
+            if nombre == "click":
+                x, y = _destino_click(args, kwargs)
+                datos.update(x=int(x), y=int(y))
+            self.registrar_evento(nombre, **datos)
+            return original(*args, **kwargs)
+        return _registrada
+
+    def _restaurar_pyautogui(self):
+        pyautogui = motor_plantillas.pyautogui
+        for nombre, original in self._originales.items():
+            setattr(pyautogui, nombre, original)
+        self._originales.clear()
+
+
+def _destino_click(args, kwargs):
+    """
+    Punto del clic según los argumentos de pyautogui.click: (x, y), una tupla
+    (x, y) o, en un click() sin coordenadas, la posición actual del cursor.
+    """
+    x = kwargs.get("x", args[0] if args else None)
+    y = kwargs.get("y", args[1] if len(args) > 1 else None)
+    if isinstance(x, (tuple, list)) and len(x) >= 2:
+        x, y = x[0], x[1]
+    if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+        return x, y
+    return motor_plantillas.pyautogui.position()
+
+
+# ==================== REPRODUCCIÓN ====================
+
+def cargar_sesion(carpeta):
+    """Devuelve (frames, eventos): frames = [(t, ruta)], eventos = [dict] sin los frames"""
+    frames, eventos = [], []
+    with open(os.path.join(carpeta, ARCHIVO_EVENTOS), "r", encoding="utf8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            evento = json.loads(linea)
+            if evento["tipo"] == "frame":
+                frames.append((evento["t"], os.path.join(carpeta, CARPETA_FRAMES, evento["archivo"])))
+            else:
+                eventos.append(evento)
+    return frames, eventos
+
+
+class FuenteReplay:
+    """
+    Fuente de captura para motor_plantillas que reproduce una sesión grabada.
+    modo="tiempo": entrega el frame vigente según el reloj (acelerado por `velocidad`).
+    modo="secuencial": cada llamada avanza un frame (el último se repite).
+    """
+
+    def __init__(self, carpeta, velocidad=1.0, modo="tiempo"):
+        self.frames, self.eventos = cargar_sesion(carpeta)
+        if not self.frames:
+            raise ValueError(f"La grabación no tiene frames: {carpeta}")
+        self.velocidad = velocidad
+        self.modo = modo
+        self._cache = {}
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._inicio = time.time()
+        self._indice = 0
+
+    def frame(self, indice):
+        if indice not in self._cache:
+            self._cache[indice] = motor_plantillas._leer_gris(self.frames[indice][1])
+        return self._cache[indice]
+
+    def indice_en(self, t):
+        """Índice del último frame grabado en o antes del instante t"""
+        tiempos = [tf for tf, _ in self.frames]
+        return max(int(np.searchsorted(tiempos, t, side="right")) - 1, 0)
+
+    def __call__(self):
+        if self.modo == "secuencial":
+            indice = min(self._indice, len(self.frames) - 1)
+            self._indice += 1
+            return self.frame(indice)
+        t = (time.time() - self._inicio) * self.velocidad
+        return self.frame(self.indice_en(t))
+
+
+# ==================== BENCHMARK ====================
+
+def medir_busquedas(carpeta, confianza=0.8, tolerancia=15):
+    """
+    Para cada clic grabado identifica qué botón estaba bajo el cursor y mide
+    la búsqueda a pantalla completa y con memoria de regiones sobre ese frame.
+    """
+    fuente = FuenteReplay(carpeta)
+    motor_plantillas.cargar_plantillas()
+    plantillas = sorted(motor_plantillas._plantillas)
+
+    # La memoria de regiones del benchmark no debe tocar la del equipo
+    motor_plantillas.ARCHIVO_REGIONES = os.path.join(tempfile.mkdtemp(), "regiones_botones.json")
+
+    resultados = {}
+    sin_plantilla = 0
+    for evento in fuente.eventos:
+        if evento["tipo"] != "click" or "x" not in evento:
+            continue
+        frame = fuente.frame(fuente.indice_en(evento["t"]))
+
+        boton, coincidencia, ms_completa = None, None, 0.0
+        for imagen in plantillas:
+            inicio = time.perf_counter()
+            encontrada = motor_plantillas.localizar_en_frame(frame, imagen, confianza)
+            duracion = (time.perf_counter() - inicio) * 1000
+            if (encontrada
+                    and abs(encontrada.x - evento["x"]) <= tolerancia
+                    and abs(encontrada.y - evento["y"]) <= tolerancia
+                    and (coincidencia is None or encontrada.confianza > coincidencia.confianza)):
+                boton, coincidencia, ms_completa = imagen, encontrada, duracion
+
+        if boton is None:
+            sin_plantilla += 1
+            continue
+
+        inicio = time.perf_counter()
+        motor_plantillas.localizar(frame, boton, confianza)
+        ms_region = (time.perf_counter() - inicio) * 1000
+
+        datos = resultados.setdefault(boton, {"clics": 0, "ms_completa": [], "ms_region": [], "confianza": []})
+        datos["clics"] += 1
+        datos["ms_completa"].append(ms_completa)
+        datos["ms_region"].append(ms_region)
+        datos["confianza"].append(coincidencia.confianza)
+
+    resumen = {}
+    for boton, datos in sorted(resultados.items()):
+        resumen[boton] = {
+            "clics": datos["clics"],
+            "ms_completa_media": round(statistics.mean(datos["ms_completa"]), 2),
+            "ms_region_media": round(statistics.mean(datos["ms_region"]), 2),
+            "confianza_min": round(min(datos["confianza"]), 3),
+            "confianza_media": round(statistics.mean(datos["confianza"]), 3),
+        }
+    return {"botones": resumen, "clics_sin_plantilla": sin_plantilla, "frames": len(fuente.frames)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de sesiones de pantalla de TecFood")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    bench = sub.add_parser("benchmark", help="Mide la búsqueda de botones sobre una grabación")
+    bench.add_argument("carpeta")
+    bench.add_argument("--confianza", type=float, default=0.8)
+    bench.add_argument("--tolerancia", type=int, default=15)
+    bench.add_argument("--json", dest="salida_json", help="Guardar el resumen en este archivo")
+
+    args = parser.parse_args()
+    if args.comando == "benchmark":
+        resumen = medir_busquedas(args.carpeta, args.confianza, args.tolerancia)
+        print(f"\n📊 Frames: {resumen['frames']} | Clics sin plantilla: {resumen['clics_sin_plantilla']}")
+        for boton, datos in resumen["botones"].items():
+            print(
+                f"   {boton:28s} clics={datos['clics']:4d} "
+                f"completa={datos['ms_completa_media']:7.2f}ms "
+                f"region={datos['ms_region_media']:7.2f}ms "
+                f"conf_min={datos['confianza_min']:.3f}"
+            )
+        if args.salida_json:
+            with open(args.salida_json, "w", encoding="utf8") as f:
+                json.dump(resumen, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Simulación (dry-run) de la carga de facturas en TecFood.
+
+Ejecuta el mismo plan que iniciar_proceso (planificador + proceso_facturas)
+contra un driver simulado que no toca la pantalla: cada paso avanza un reloj
+virtual con las latencias registradas en este equipo (perfiles_tiempo para
+las esperas y la última telemetría para las búsquedas de botones).
+
+Estrategias de espera:
+- "fijo": los sleeps originales (TOPES_ESPERA).
+- "adaptativo": la latencia mediana registrada, con el sleep original de tope.
+- "aprendido": como adaptativo, con el tope aprendido de perfiles_tiempo.
+"""
+import contextlib
+import glob
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import perfiles_tiempo
+import proceso_facturas
+import trazas
+from driver_tecfood import TOPES_ESPERA, DriverTecFood
+
+ESTRATEGIAS = ("fijo", "adaptativo", "aprendido")
+
+# Botones que busca cada paso del driver por imágenes
+BOTONES_POR_PASO = {
+    "unidad": ["unidad_select.png"],
+    "aplicar_filtro": ["aplicar_filtro.png"],
+    "anadir_factura": ["anadir.png"],
+    "pdf": ["seleccionar_archivo.png"],
+    "remitente": ["remitente.png"],
+    "serie": ["serie.png"],
+    "emision": ["emision.png"],
+    "valor": ["valor.png"],
+    "grabar": ["grabar.png"],
+    "productos": ["productos.png"],
+    "producto": ["anadir.png", "anadir_producto.png", "cantidad.png", "grabar.png"],
+    "finalizar": ["FinalizarF.png", "si.png"],
+}
+# Esperas de una línea de producto en modo teclado (las sondas de píxeles
+# duran lo mismo que las esperas de apertura y cierre que reemplazan)
+ESPERAS_TECLADO = ("producto.anadir", "producto.dialogo", "producto.desplegable",
+                   "producto.grabado", "producto.cerrar")
+
+SEGUNDOS_BUSQUEDA_POR_DEFECTO = 1.5   # botón sin telemetría
+SEGUNDOS_ACCION = 0.5                 # movimientos de ratón y tecleo de cada paso
+
+
+def cargar_latencias_busqueda(carpeta_telemetria):
+    """Segundos medios por botón según la telemetría más reciente de facturas"""
+    archivos = sorted(glob.glob(os.path.join(glob.escape(carpeta_telemetria), "facturas_*.json")))
+    if not archivos:
+        return {}
+    with open(archivos[-1], "r", encoding="utf8") as f:
+        botones = json.load(f).get("botones", {})
+    return {
+        boton: datos["ms_total_suma"] / max(datos["busquedas"], 1) / 1000
+        for boton, datos in botones.items()
+    }
+
+
+class DriverSimulado(DriverTecFood):
+    """Driver que no toca la pantalla: cada paso suma su costo estimado a `reloj`"""
+    nombre = "simulado"
+    puede_reabrir = True
+
+    def __init__(self, estrategia="adaptativo", modo_productos="imagenes", latencias_busqueda=None):
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estrategia desconocida: {estrategia}")
+        self.estrategia = estrategia
+        self.modo_productos = modo_productos
+        self.latencias_busqueda = latencias_busqueda or {}
+        self.reloj = 0.0
+        self._posiciones_aprendidas = False
+        self._ancla = False
+
+    def _espera(self, paso):
+        tope = TOPES_ESPERA[paso]
+        if self.estrategia == "fijo":
+            return tope
+        muestras = perfiles_tiempo.muestras_de(paso)
+        if not muestras:
+            return tope
+        mediana = float(np.median(muestras))
+        if self.estrategia == "aprendido":
+            tope = perfiles_tiempo.tope_aprendido(paso, tope)
+        return min(mediana, tope)
+
+    def _busqueda(self, boton):
+        return self.latencias_busqueda.get(boton, SEGUNDOS_BUSQUEDA_POR_DEFECTO)
+
+    def _paso(self, nombre, esperas=None, botones=None):
+        if esperas is None:
+            esperas = [p for p in TOPES_ESPERA if p.split(".", 1)[0] == nombre]
+        if botones is None:
+            botones = BOTONES_POR_PASO.get(nombre, [])
+        self.reloj += sum(self._espera(p) for p in esperas)
+        self.reloj += sum(self._busqueda(b) for b in botones)
+        self.reloj += SEGUNDOS_ACCION
+        return True
+
+    def abrir(self):
+        return self._paso("abrir")
+
+    def seleccionar_unidad(self, codigo_unidad):
+        return self._paso("unidad")
+
+    def ingresar_fecha(self, fecha_formateada):
+        return self._paso("fecha")
+
+    def aplicar_filtro(self):
+        return self._paso("aplicar_filtro")
+
+    def anadir_factura(self):
+        return self._paso("anadir_factura")
+
+    def adjuntar_pdf(self, ruta_pdf):
+        # Incluye el time.sleep(1) fijo tras escribir la ruta
+        self.reloj += 1.0
+        return self._paso("pdf")
+
+    def ingresar_remitente(self, nit, numero_factura):
+        return self._paso("remitente")
+
+    def ingresar_serie(self):
+        return self._paso("serie")
+
+    def ingresar_emision(self, fecha_formateada):
+        return self._paso("emision")
+
+    def ingresar_valor(self, valor="0"):
+        return self._paso("valor")
+
+    def grabar(self):
+        return self._paso("grabar")
+
+    def abrir_factura(self, numero_factura):
+        return self._paso("anadir_factura")
+
+    def abrir_productos(self):
+        self._ancla = False
+        return self._paso("productos")
+
+    def agregar_producto(self, codigo_producto, cantidad, valor_unitario):
+        if self.modo_productos == "teclado" and self._posiciones_aprendidas:
+            # Una búsqueda del ancla por factura y ninguna por línea
+            botones = [] if self._ancla else ["anadir.png"]
+            self._ancla = True
+            return self._paso("producto", esperas=ESPERAS_TECLADO, botones=botones)
+        self._posiciones_aprendidas = True
+        self._ancla = True
+        return self._paso("producto")
+
+    def finalizar(self):
+        return self._paso("finalizar")
+
+    def recargar(self):
+        return self._paso("recargar")
+
+    def cancelar(self):
+        return self._paso("cancelar")
+
+    def reanclar(self):
+        self._ancla = False
+        self._posiciones_aprendidas = False
+        return self.cancelar()
+
+
+class _SalidaFiltrada:
+    """sys.stdout que descarta lo que imprimen los hilos en silencio y deja pasar el resto"""
+
+    def __init__(self, destino):
+        self.destino = destino
+
+    def write(self, texto):
+        if getattr(_silencio, "activo", False):
+            return len(texto)
+        return self.destino.write(texto)
+
+    def __getattr__(self, nombre):
+        return getattr(self.destino, nombre)
+
+
+_silencio = threading.local()
+_lock_salida = threading.Lock()
+# sys.stdout previo al filtro y cuántos hilos están en silencio
+_salida = {"original": None, "en_silencio": 0}
+
+
+@contextlib.contextmanager
+def _en_silencio():
+    """
+    Calla los print de este hilo (la simulación repite todo el proceso); los
+    demás siguen imprimiendo. Al salir el último hilo se restaura sys.stdout.
+    """
+    with _lock_salida:
+        if not _salida["en_silencio"]:
+            _salida["original"] = sys.stdout
+            sys.stdout = _SalidaFiltrada(sys.stdout)
+        _salida["en_silencio"] += 1
+    anterior = getattr(_silencio, "activo", False)
+    _silencio.activo = True
+    try:
+        yield
+    finally:
+        _silencio.activo = anterior
+        with _lock_salida:
+            _salida["en_silencio"] -= 1
+            # Si otro código cambió sys.stdout mientras tanto, se respeta su cambio
+            if not _salida["en_silencio"] and isinstance(sys.stdout, _SalidaFiltrada):
+                sys.stdout = _salida["original"]
+
+
+def estimar(cola, productos_por_factura, estrategia="adaptativo", modo_productos="imagenes",
+            latencias_busqueda=None):
+    """
+    Corre la cola planificada contra DriverSimulado. Devuelve (DataFrame con
+    el ETA por factura en segundos, total en segundos incluida la apertura).
+    """
+    driver = DriverSimulado(estrategia, modo_productos, latencias_busqueda)
+    filas = []
+
+    def _al_terminar(posicion, index, completada):
+        inicio = filas[-1]["fin_s"] if filas else apertura
+        filas.append({
+            "N° Factura": cola.at[index, "N° Factura"],
+            "contexto": cola.at[index, "_contexto"],
+            "eta_s": round(driver.reloj - inicio, 1),
+            "fin_s": round(driver.reloj, 1),
+        })
+
+    # El aprendizaje (muestras y retrocesos) no cambia por una simulación, ni
+    # siquiera con una carga real corriendo a la vez en otro hilo
+    with _en_silencio(), trazas.suspendidas(), perfiles_tiempo.suspendidos():
+        driver.abrir()
+        apertura = driver.reloj
+        proceso_facturas.ejecutar_cola(
+            driver, cola, productos_por_factura, al_terminar_factura=_al_terminar
+        )
+
+    return pd.DataFrame(filas, columns=["N° Factura", "contexto", "eta_s", "fin_s"]), round(driver.reloj, 1)
+
+
+def comparar_estrategias(cola, productos_por_factura, latencias_busqueda=None,
+                         modos_productos=("imagenes", "teclado")):
+    """Total estimado (s) para cada combinación de estrategia de espera y modo de productos"""
+    filas = []
+    for estrategia in ESTRATEGIAS:
+        for modo in modos_productos:
+            _, total = estimar(cola, productos_por_factura, estrategia, modo, latencias_busqueda)
+            filas.append({"estrategia": estrategia, "modo_productos": modo, "total_s": total})
+    comparacion = pd.DataFrame(filas)
+    comparacion["total_min"] = (comparacion["total_s"] / 60).round(1)
+    return comparacion.sort_values("total_s").reset_index(drop=True)
@@ -0,0 +1,126 @@
+"""
+Telemetría de la automatización de TecFood.
+
+Registra cada búsqueda de botón (intentos, frames sondeados, tiempo hasta la
+primera coincidencia y hasta la coincidencia estable, confianza final) y al
+terminar una ejecución exporta histogramas por botón en JSON y CSV.
+"""
+import csv
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# Límites superiores (ms) de las cubetas de los histogramas de latencia
+BORDES_HISTOGRAMA_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 20000)
+
+_busquedas = []
+_lock_busquedas = threading.Lock()
+
+
+def registrar_busqueda(boton, encontrado, intentos, frames, ms_total,
+                       ms_primera=None, ms_estable=None, confianza=None):
+    """Guarda el resultado de una búsqueda de botón"""
+    with _lock_busquedas:
+        _busquedas.append({
+            "boton": boton,
+            "encontrado": bool(encontrado),
+            "intentos": int(intentos),
+            "frames": int(frames),
+            "ms_total": round(float(ms_total), 1),
+            "ms_primera": None if ms_primera is None else round(float(ms_primera), 1),
+            "ms_estable": None if ms_estable is None else round(float(ms_estable), 1),
+            "confianza": None if confianza is None else round(float(confianza), 4),
+        })
+
+
+def reiniciar_telemetria():
+    with _lock_busquedas:
+        _busquedas.clear()
+
+
+def _histograma(valores):
+    """Cuenta los valores por cubeta; la última cubeta ('inf') recoge el resto"""
+    etiquetas = [f"<={b}" for b in BORDES_HISTOGRAMA_MS] + [f">{BORDES_HISTOGRAMA_MS[-1]}"]
+    if not valores:
+        return dict.fromkeys(etiquetas, 0)
+    indices = np.searchsorted(BORDES_HISTOGRAMA_MS, valores, side="left")
+    conteos = np.bincount(indices, minlength=len(etiquetas))
+    return {etiqueta: int(c) for etiqueta, c in zip(etiquetas, conteos)}
+
+
+def _percentil(valores, p):
+    return round(float(np.percentile(valores, p)), 1) if valores else None
+
+
+def resumen_por_boton():
+    """Agrupa las búsquedas registradas por botón con percentiles e histogramas"""
+    with _lock_busquedas:
+        busquedas = list(_busquedas)
+
+    por_boton = {}
+    for b in busquedas:
+        por_boton.setdefault(b["boton"], []).append(b)
+
+    resumen = {}
+    for boton, registros in sorted(por_boton.items()):
+        encontrados = [r for r in registros if r["encontrado"]]
+        total = [r["ms_total"] for r in registros]
+        primera = [r["ms_primera"] for r in registros if r["ms_primera"] is not None]
+        estable = [r["ms_estable"] for r in encontrados if r["ms_estable"] is not None]
+        confianzas = [r["confianza"] for r in encontrados if r["confianza"] is not None]
+        resumen[boton] = {
+            "busquedas": len(registros),
+            "fallidas": len(registros) - len(encontrados),
+            "intentos_medios": round(float(np.mean([r["intentos"] for r in registros])), 2),
+            "frames_medios": round(float(np.mean([r["frames"] for r in registros])), 2),
+            "ms_total_suma": round(float(np.sum(total)), 1),
+            "ms_primera_p50": _percentil(primera, 50),
+            "ms_primera_p95": _percentil(primera, 95),
+            "ms_estable_p50": _percentil(estable, 50),
+            "ms_estable_p95": _percentil(estable, 95),
+            "confianza_min": min(confianzas) if confianzas else None,
+            "histograma_primera_ms": _histograma(primera),
+            "histograma_estable_ms": _histograma(estable),
+            "histograma_total_ms": _histograma(total),
+        }
+    return resumen
+
+
+def exportar_telemetria(carpeta, nombre_proceso):
+    """Escribe el resumen por botón en JSON y CSV; devuelve las rutas creadas"""
+    resumen = resumen_por_boton()
+    if not resumen:
+        return None
+
+    os.makedirs(carpeta, exist_ok=True)
+    base = os.path.join(carpeta, f"{nombre_proceso}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+
+    with _lock_busquedas:
+        busquedas = list(_busquedas)
+    with open(base + ".json", "w", encoding="utf8") as f:
+        json.dump({"botones": resumen, "busquedas": busquedas}, f, indent=2, ensure_ascii=False)
+
+    columnas = [
+        "boton", "busquedas", "fallidas", "intentos_medios", "frames_medios", "ms_total_suma",
+        "ms_primera_p50", "ms_primera_p95", "ms_estable_p50", "ms_estable_p95", "confianza_min"
+    ]
+    cubetas = list(next(iter(resumen.values()))["histograma_total_ms"])
+    with open(base + ".csv", "w", encoding="utf8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columnas + [f"total_{c}" for c in cubetas])
+        for boton, datos in resumen.items():
+            fila = [boton] + [datos[c] for c in columnas[1:]]
+            fila += [datos["histograma_total_ms"][c] for c in cubetas]
+            writer.writerow(fila)
+
+    # Los botones más costosos primero
+    costosos = sorted(resumen.items(), key=lambda kv: kv[1]["ms_total_suma"], reverse=True)[:5]
+    print("📊 Botones que más tiempo consumen:")
+    for boton, datos in costosos:
+        print(f"   {boton}: {datos['ms_total_suma'] / 1000:.1f}s en {datos['busquedas']} búsquedas "
+              f"({datos['fallidas']} fallidas)")
+    print(f"📊 Telemetría guardada en: {base}.json / .csv")
+    return base + ".json", base + ".csv"
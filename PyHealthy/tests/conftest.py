@@ -0,0 +1,15 @@
+"""Las pruebas importan los módulos de PyHealthy como lo hace DataSpectra.py"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def perfiles_vacios(monkeypatch):
+    """Perfiles de tiempo vacíos durante la prueba, sin tocar los cargados del equipo"""
+    import perfiles_tiempo
+    for nombre in ("_perfiles", "_retroceso", "_agotadas"):
+        monkeypatch.setattr(perfiles_tiempo, nombre, {})
@@ -0,0 +1,72 @@
+"""
+Cliente PostgREST en memoria con la parte de la API de supabase-py que usan
+carga_supabase y espejo_local: select (con count), eq, gt, gte, lte, in_,
+order, limit y execute. Como el servidor real, corta cada respuesta en
+`max_filas` y compara los filtros in_ como texto.
+"""
+
+
+class Respuesta:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class Consulta:
+    def __init__(self, cliente, tabla, contar):
+        self.cliente = cliente
+        self.filas = [dict(f) for f in cliente.tablas[tabla]]
+        self.contar = contar
+        self.limite = None
+
+    def _filtrar(self, condicion):
+        self.filas = [f for f in self.filas if condicion(f)]
+        return self
+
+    def eq(self, columna, valor):
+        return self._filtrar(lambda f: f.get(columna) == valor)
+
+    def gt(self, columna, valor):
+        return self._filtrar(lambda f: f[columna] > valor)
+
+    def gte(self, columna, valor):
+        return self._filtrar(lambda f: f[columna] >= valor)
+
+    def lte(self, columna, valor):
+        return self._filtrar(lambda f: f[columna] <= valor)
+
+    def in_(self, columna, valores):
+        valores = {str(v) for v in valores}
+        return self._filtrar(lambda f: str(f.get(columna)) in valores)
+
+    def order(self, columna):
+        self.filas.sort(key=lambda f: f[columna])
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def execute(self):
+        self.cliente.consultas += 1
+        tope = min(self.limite or self.cliente.max_filas, self.cliente.max_filas)
+        return Respuesta(self.filas[:tope], len(self.filas) if self.contar else None)
+
+
+class _Tabla:
+    def __init__(self, cliente, nombre):
+        self.cliente = cliente
+        self.nombre = nombre
+
+    def select(self, columnas, count=None):
+        return Consulta(self.cliente, self.nombre, count == "exact")
+
+
+class ClienteFalso:
+    def __init__(self, tablas, max_filas=1000):
+        self.tablas = tablas
+        self.max_filas = max_filas
+        self.consultas = 0
+
+    def table(self, nombre):
+        return _Tabla(self, nombre)
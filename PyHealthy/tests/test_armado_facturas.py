@@ -0,0 +1,139 @@
+import pandas as pd
+
+import armado_facturas
+
+
+def _hoja(filas):
+    return pd.DataFrame(
+        [dict(zip(armado_facturas.COLUMNAS_EXCEL, fila)) for fila in filas],
+        columns=armado_facturas.COLUMNAS_EXCEL,
+    ).fillna("")
+
+
+# ---------- Excel ----------
+
+def test_desde_excel_arrastra_el_numero_de_factura():
+    df_facturas, items = armado_facturas.desde_excel(_hoja([
+        ("FACTURA", " F-1 ", "2025-01-10", " Proveedor A ", "900", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", "P1", "Arroz", "2", "1000"),
+        ("producto", "", "", "", "", "P2", "Frijol", "1", "500"),
+        ("FACTURA", "F-2", "2025-01-11", "Proveedor B", "800", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", "P3", "Sal", "4", "200"),
+    ]))
+    assert list(df_facturas["N° Factura"]) == ["F-1", "F-2"]
+    assert list(df_facturas["ID_Factura"]) == ["F-1", "F-2"]
+    assert df_facturas.loc[0, "Empresa"] == "Proveedor A"
+    assert list(items.index) == ["F-1", "F-1", "F-2"]
+    assert list(items["Código Producto"]) == ["P1", "P2", "P3"]
+
+
+def test_desde_excel_descarta_productos_huerfanos():
+    df_facturas, items = armado_facturas.desde_excel(_hoja([
+        ("PRODUCTO", "", "", "", "", "P0", "Antes de toda factura", "1", "1"),
+        ("FACTURA", "F-1", "2025-01-10", "A", "900", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", "P1", "Arroz", "1", "1"),
+        ("FACTURA", "", "2025-01-11", "B", "800", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", "P2", "Bajo factura sin número", "1", "1"),
+    ]))
+    assert list(df_facturas["N° Factura"]) == ["F-1"]
+    assert list(items["Código Producto"]) == ["P1"]
+
+
+def test_desde_excel_normaliza_decimales():
+    _, items = armado_facturas.desde_excel(_hoja([
+        ("FACTURA", "F-1", "2025-01-10", "A", "900", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", " P1 ", "Arroz", " 2,5 ", "1200,75"),
+    ]))
+    fila = items.iloc[0]
+    assert fila["Código Producto"] == "P1"
+    assert fila["Cantidad"] == "2.5"
+    assert fila["Precio"] == "1200.75"
+
+
+# ---------- Supabase ----------
+
+def test_facturas_desde_supabase():
+    df = armado_facturas.facturas_desde_supabase([
+        {"id": 1, "numero_factura": "F-1", "fecha_factura": "2025-01-10",
+         "codigo_unidad": "0020", "proveedores": {"nombre": "A", "nit": "900"}},
+        {"id": 2, "numero_factura": "F-2", "fecha_factura": "2025-01-11",
+         "codigo_unidad": None, "proveedores": None},
+    ], codigo_clinica="0007")
+    assert list(df.columns) == armado_facturas.COLUMNAS_FACTURA
+    assert list(df["ID_Factura"]) == ["1", "2"]
+    assert list(df["Unidad"]) == ["0020", "0007"]
+    assert list(df["Empresa"]) == ["A", "Sin nombre"]
+    assert list(df["NIT"]) == ["900", "Sin NIT"]
+
+
+def test_facturas_desde_supabase_sin_filas():
+    df = armado_facturas.facturas_desde_supabase([])
+    assert df.empty
+    assert list(df.columns) == armado_facturas.COLUMNAS_FACTURA
+
+
+def test_items_desde_supabase():
+    df_facturas = armado_facturas.facturas_desde_supabase([
+        {"id": 1, "numero_factura": "F-1", "fecha_factura": "2025-01-10",
+         "proveedores": {"nombre": "A", "nit": "900"}},
+    ])
+    items, huerfanos = armado_facturas.items_desde_supabase([
+        {"factura_id": 1, "cantidad": 2.0, "precio_unitario": "1500,5",
+         "catalogo_productos": {"codigo_arbol": "P1", "nombre": "Arroz"}},
+        {"factura_id": 1, "cantidad": 1.5, "precio_unitario": None, "catalogo_productos": None},
+        {"factura_id": 99, "cantidad": 1, "precio_unitario": 1,
+         "catalogo_productos": {"codigo_arbol": "P9", "nombre": "Huérfano"}},
+    ], df_facturas)
+    assert huerfanos == 1
+    assert list(items.index) == ["F-1", "F-1"]
+    assert list(items["Código Producto"]) == ["P1", "SIN CODIGO"]
+    assert list(items["Nombre Producto"]) == ["Arroz", "SIN NOMBRE"]
+    # Cantidades enteras que json_normalize pasa a float vuelven sin ".0"
+    assert list(items["Cantidad"]) == ["2", "1.5"]
+    assert list(items["Precio"]) == ["1500.5", ""]
+
+
+def test_items_desde_supabase_sin_filas():
+    items, huerfanos = armado_facturas.items_desde_supabase([], pd.DataFrame(columns=armado_facturas.COLUMNAS_FACTURA))
+    assert items.empty
+    assert huerfanos == 0
+
+
+def test_supabase_por_bloques_consume_el_iterable_a_medida(monkeypatch):
+    monkeypatch.setattr(armado_facturas, "TAM_BLOQUE", 2)
+    entregadas = []
+
+    def filas(cantidad, fila):
+        for i in range(1, cantidad + 1):
+            entregadas.append(i)
+            yield fila(i)
+
+    bloques = armado_facturas._bloques(filas(5, lambda i: {"id": i}))
+    assert len(next(bloques)) == 2
+    assert entregadas == [1, 2]
+
+    df_facturas = armado_facturas.facturas_desde_supabase(filas(5, lambda i: {
+        "id": i, "numero_factura": f"F-{i}", "fecha_factura": "2025-01-10",
+        "proveedores": {"nombre": "A", "nit": "900"}}))
+    assert list(df_facturas["N° Factura"]) == [f"F-{i}" for i in range(1, 6)]
+    assert list(df_facturas.index) == list(range(5))
+
+    items, huerfanos = armado_facturas.items_desde_supabase(filas(7, lambda i: {
+        "factura_id": i, "cantidad": 1, "precio_unitario": 1,
+        "catalogo_productos": {"codigo_arbol": f"P{i}", "nombre": "X"}}), df_facturas)
+    assert huerfanos == 2
+    assert list(items.index) == [f"F-{i}" for i in range(1, 6)]
+
+
+def test_productos_por_factura_incluye_facturas_sin_items():
+    df_facturas, items = armado_facturas.desde_excel(_hoja([
+        ("FACTURA", "F-1", "2025-01-10", "A", "900", "", "", "", ""),
+        ("PRODUCTO", "", "", "", "", "P1", "Arroz", "2", "1000"),
+        ("FACTURA", "F-2", "2025-01-11", "B", "800", "", "", "", ""),
+    ]))
+    productos = armado_facturas.productos_por_factura(items, df_facturas)
+    assert productos == {
+        "F-1": [{"Código Producto": "P1", "Nombre Producto": "Arroz", "Cantidad": "2", "Precio": "1000"}],
+        "F-2": [],
+    }
+    assert list(armado_facturas.conteo_por_factura(items, df_facturas)) == [1, 0]
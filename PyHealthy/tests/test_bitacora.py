@@ -0,0 +1,68 @@
+import json
+
+import pandas as pd
+
+import bitacora
+
+
+def _factura(numero, nit="900", unidad="0020"):
+    return {"N° Factura": numero, "NIT": nit, "_unidad": unidad}
+
+
+def test_registrar_y_releer(tmp_path):
+    ruta = str(tmp_path / "facturas_prueba.jsonl")
+    clave = bitacora.clave_factura("0020", _factura("F-1"))
+    b = bitacora.Bitacora(ruta)
+    b.registrar(clave, bitacora.PASO_ENCABEZADO)
+    b.registrar(clave, bitacora.PASO_PRODUCTO, indice=0, codigo="P1")
+    b.cerrar()
+
+    estado = bitacora.Bitacora(ruta).estado(clave)
+    assert estado.encabezado
+    assert estado.producto_grabado(0, "P1")
+    assert not estado.producto_grabado(1, "P2")
+    assert not estado.finalizada
+
+
+def test_ultima_linea_truncada_se_ignora(tmp_path):
+    ruta = tmp_path / "facturas_prueba.jsonl"
+    clave = "0020|900|F-1"
+    ruta.write_text(
+        json.dumps({"t": 1, "factura": clave, "paso": bitacora.PASO_ENCABEZADO}) + "\n"
+        + '{"t": 2, "factura": "0020|900|F-1", "paso": "prod',
+        encoding="utf8",
+    )
+    b = bitacora.Bitacora(str(ruta))
+    assert b.estado(clave).encabezado
+    assert b.estado(clave).productos == {}
+
+    # El siguiente registro queda en su propia línea, no pegado a la truncada
+    b.registrar(clave, bitacora.PASO_FINALIZADA)
+    b.cerrar()
+    assert bitacora.Bitacora(str(ruta)).estado(clave).finalizada
+
+
+def test_previas_se_leen_sin_escribirlas(tmp_path):
+    previa = str(tmp_path / "facturas_a.jsonl")
+    b = bitacora.Bitacora(previa)
+    b.registrar("0020|900|F-1", bitacora.PASO_FINALIZADA)
+    b.cerrar()
+    contenido = open(previa, encoding="utf8").read()
+
+    nueva = bitacora.Bitacora(str(tmp_path / "facturas_b.jsonl"), previas=[previa])
+    nueva.registrar("0020|900|F-2", bitacora.PASO_ENCABEZADO)
+    nueva.cerrar()
+    assert nueva.estado("0020|900|F-1").finalizada
+    assert open(previa, encoding="utf8").read() == contenido
+
+
+def test_quitar_finalizadas(tmp_path):
+    b = bitacora.Bitacora(str(tmp_path / "facturas_prueba.jsonl"))
+    b.registrar(bitacora.clave_factura("0020", _factura("F-1")), bitacora.PASO_FINALIZADA)
+    b.registrar(bitacora.clave_factura("0020", _factura("F-2")), bitacora.PASO_ENCABEZADO)
+    # Mismo número en otra unidad: es otra factura
+    cola = pd.DataFrame([_factura("F-1"), _factura("F-2"), _factura("F-1", unidad="0010")])
+
+    restante = bitacora.quitar_finalizadas(cola, b)
+    b.cerrar()
+    assert list(zip(restante["N° Factura"], restante["_unidad"])) == [("F-2", "0020"), ("F-1", "0010")]
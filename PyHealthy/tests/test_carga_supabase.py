@@ -0,0 +1,86 @@
+from carga_supabase import CargaPaginada, CargaPorIds
+from postgrest_falso import ClienteFalso
+
+
+def _tabla(ids):
+    return [{"id": i, "factura_id": i % 3, "valor": f"v{i}"} for i in ids]
+
+
+def test_keyset_continua_despues_del_corte_de_postgrest():
+    # Ids desordenados y con huecos; el servidor corta en 4 filas por respuesta
+    ids = [250, 3, 17, 1000, 42, 8, 99, 5, 640, 12, 71]
+    cliente = ClienteFalso({"t": _tabla(ids)}, max_filas=4)
+    carga = CargaPaginada(cliente, "t", tam_pagina=4, concurrencia=2)
+
+    filas = list(carga)
+
+    assert [f["id"] for f in filas] == sorted(ids)
+    assert carga.esperadas == carga.leidas == len(ids)
+    assert carga.paginas == 3
+    assert carga.diferencias == []
+
+
+def test_entrega_filas_antes_de_leer_toda_la_tabla():
+    cliente = ClienteFalso({"t": _tabla(range(1, 101))}, max_filas=10)
+    carga = iter(CargaPaginada(cliente, "t", tam_pagina=10, concurrencia=1))
+
+    assert next(carga)["id"] == 1
+    # Conteo, primera página de claves y su página de filas
+    assert cliente.consultas <= 3
+
+
+def test_aplica_el_filtro_a_conteo_y_paginas():
+    cliente = ClienteFalso({"t": _tabla(range(1, 21))}, max_filas=3)
+    carga = CargaPaginada(cliente, "t", tam_pagina=3,
+                          filtrar=lambda consulta: consulta.eq("factura_id", 1))
+
+    assert [f["id"] for f in carga] == [i for i in range(1, 21) if i % 3 == 1]
+    assert carga.esperadas == carga.leidas
+    assert carga.diferencias == []
+
+
+def test_reporta_filas_que_desaparecen_durante_la_lectura():
+    tablas = {"t": _tabla(range(1, 11))}
+    cliente = ClienteFalso(tablas, max_filas=5)
+    carga = CargaPaginada(cliente, "t", tam_pagina=5, concurrencia=1)
+
+    leidas = []
+    for fila in carga:
+        leidas.append(fila["id"])
+        if fila["id"] == 1:
+            # Borrada después del conteo y antes de pedir la segunda página
+            tablas["t"] = [f for f in tablas["t"] if f["id"] != 8]
+
+    assert leidas == [1, 2, 3, 4, 5, 6, 7, 9, 10]
+    assert carga.esperadas == 10
+    assert carga.leidas == 9
+    assert "count=exact 10, leídas 9" in carga.diferencias
+
+
+def test_reporta_rango_con_menos_filas_que_claves():
+    tablas = {"t": _tabla(range(1, 7))}
+    cliente = ClienteFalso(tablas, max_filas=10)
+    carga = CargaPaginada(cliente, "t", tam_pagina=3, concurrencia=1)
+    pagina_claves = carga._pagina_claves
+
+    def y_borra_la_fila_2(despues_de):
+        claves = pagina_claves(despues_de)
+        tablas["t"] = [f for f in tablas["t"] if f["id"] != 2]
+        return claves
+
+    carga._pagina_claves = y_borra_la_fila_2
+    filas = list(carga)
+
+    assert [f["id"] for f in filas] == [1, 3, 4, 5, 6]
+    assert carga.diferencias == ["rango 1..3: 3 claves, 2 filas", "count=exact 6, leídas 5"]
+
+
+def test_carga_por_ids_en_lotes():
+    cliente = ClienteFalso({"items": _tabla(range(1, 31))}, max_filas=4)
+    carga = CargaPorIds(cliente, "items", "*", "factura_id", ["1", "2"], tam_lote=1, tam_pagina=4)
+
+    filas = list(carga)
+
+    assert sorted(f["id"] for f in filas) == [i for i in range(1, 31) if i % 3 in (1, 2)]
+    assert carga.esperadas == carga.leidas == 20
+    assert carga.diferencias == []
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import coordinador
+
+
+def _cola(unidades):
+    return pd.DataFrame({
+        "N° Factura": [f"F{i}" for i in range(len(unidades))],
+        "_unidad": unidades,
+    })
+
+
+def test_repartir_no_parte_unidades_y_equilibra_el_costo():
+    cola = _cola(["A", "A", "B", "C", "C", "C", "D"])
+    productos = {"F0": [{}] * 10, "F1": [{}] * 10, "F2": [{}] * 2}
+
+    lotes = coordinador.repartir(cola, productos, 2)
+
+    unidades = [set(lote["_unidad"]) for lote in lotes]
+    assert sorted(map(sorted, unidades)) == [["A"], ["B", "C", "D"]]
+    # A = 2 encabezados + 20 productos; B + C + D = 5 encabezados + 2 productos
+    costos = [sum(coordinador.COSTO_ENCABEZADO + len(productos.get(n, [])) for n in lote["N° Factura"])
+              for lote in lotes]
+    assert sorted(costos) == [22, 28]
+
+
+def test_repartir_conserva_el_orden_del_plan():
+    cola = _cola(["B", "A", "B", "A"])
+    lotes = coordinador.repartir(cola, {}, 1)
+    assert len(lotes) == 1
+    assert list(lotes[0]["N° Factura"]) == ["F0", "F1", "F2", "F3"]
+
+
+def test_repartir_con_menos_unidades_que_trabajadores():
+    lotes = coordinador.repartir(_cola(["A", "A"]), {}, 3)
+    assert len(lotes) == 1
@@ -0,0 +1,61 @@
+"""Resultados de los pasos que graban del driver DOM, con la página simulada por métodos"""
+import pytest
+
+from driver_tecfood import SELECTORES_POR_DEFECTO, DriverEdgeCDP
+from proceso_facturas import SIN_CONFIRMAR
+
+
+class PaginaFalsa(DriverEdgeCDP):
+    def __init__(self, clics_fallidos=(), confirma=True, lineas=2):
+        super().__init__("http://tecfood", selectores=dict(SELECTORES_POR_DEFECTO), lanzar=False)
+        self.clics = []
+        self.clics_fallidos = set(clics_fallidos)
+        self.confirma = confirma
+        self.lineas = lineas
+
+    def _click(self, clave, valor=None):
+        if clave in self.clics_fallidos:
+            return False
+        self.clics.append(clave)
+        if clave == "grabar_producto" and self.confirma:
+            self.lineas += 1
+        return True
+
+    def _escribir(self, clave, texto):
+        return True
+
+    def esperar_listo(self, timeout=None):
+        return True
+
+    def esperar_visible(self, selector, timeout=None):
+        return self.confirma
+
+    def esperar_oculto(self, selector, timeout=None):
+        return self.confirma
+
+    def _contar(self, clave):
+        return self.lineas
+
+    def _esperar_expresion(self, expresion, timeout=None):
+        return self.lineas > int(expresion.rsplit(">", 1)[1])
+
+
+@pytest.mark.parametrize("paso, argumentos, clic_que_graba", [
+    ("grabar", (), "grabar"),
+    ("agregar_producto", ("P1", "1", "10"), "grabar_producto"),
+    ("finalizar", (), "confirmar"),
+])
+def test_pasos_que_graban(paso, argumentos, clic_que_graba):
+    assert getattr(PaginaFalsa(), paso)(*argumentos) is True
+
+    # Antes del clic que graba: False, se puede reintentar
+    assert getattr(PaginaFalsa(clics_fallidos={clic_que_graba}), paso)(*argumentos) is False
+
+    # Clic hecho pero sin confirmación: no se reintenta
+    pagina = PaginaFalsa(confirma=False)
+    assert getattr(pagina, paso)(*argumentos) == SIN_CONFIRMAR
+    assert pagina.clics.count(clic_que_graba) == 1
+
+
+def test_producto_grabado_aunque_no_cierre_el_dialogo():
+    assert PaginaFalsa(clics_fallidos={"cerrar_producto"}).agregar_producto("P1", "1", "10") is True
@@ -0,0 +1,27 @@
+"""Contrato de la interfaz DriverTecFood"""
+import pytest
+
+from driver_tecfood import DriverEdgeCDP, DriverImagenes, DriverTecFood
+from simulador import DriverSimulado
+
+
+@pytest.mark.parametrize("clase", [DriverImagenes, DriverEdgeCDP, DriverSimulado])
+def test_los_drivers_implementan_todos_los_pasos(clase):
+    assert not clase.__abstractmethods__
+
+
+def test_un_driver_incompleto_no_se_puede_crear():
+    class Incompleto(DriverTecFood):
+        def abrir(self):
+            return True
+
+    with pytest.raises(TypeError, match="grabar"):
+        Incompleto()
+
+
+def test_capacidades_opcionales_no_fallan():
+    driver = DriverImagenes("http://tecfood")
+    assert driver.puede_reabrir is False
+    assert driver.abrir_factura("F-1") is False
+    assert DriverEdgeCDP.puede_reabrir is True
+    assert DriverEdgeCDP.abrir_factura is not DriverTecFood.abrir_factura
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import armado_facturas
+from carga_supabase import CargaPaginada, CargaPorIds
+from espejo_local import EspejoLocal
+from postgrest_falso import ClienteFalso
+
+MARCA = "2025-01-01T00:00:00"
+
+
+@pytest.fixture
+def datos():
+    proveedores = [{"id": 1, "nombre": "Proveedor A", "nit": "900", "updated_at": MARCA}]
+    catalogo = [
+        {"id": 10, "codigo_arbol": "P10", "nombre": "Arroz", "updated_at": MARCA},
+        {"id": 11, "codigo_arbol": "SIN CODIGO", "nombre": "Sal", "updated_at": MARCA},
+    ]
+    # Ids de distinta cantidad de dígitos: como texto "100" < "98"
+    facturas = [
+        {"id": i, "numero_factura": f"F-{i}", "fecha_factura": "2025-01-10", "codigo_unidad": "0020",
+         "estado_procesamiento": "pendiente", "updated_at": MARCA,
+         "proveedores": {"id": 1, "nombre": "Proveedor A", "nit": "900"}}
+        for i in (7, 98, 100, 1001)
+    ]
+    items = [
+        {"id": i, "factura_id": factura, "cantidad": 1, "precio_unitario": 5, "updated_at": MARCA,
+         "catalogo_productos": {c: p[c] for c in ("id", "codigo_arbol", "nombre")}}
+        for i, factura, p in (
+            (9, 98, catalogo[0]), (10, 98, catalogo[1]), (99, 100, catalogo[0]),
+            (100, 98, catalogo[0]), (1000, 7, catalogo[1]),
+        )
+    ]
+    return {"proveedores": proveedores, "catalogo_productos": catalogo,
+            "facturas": facturas, "factura_items": items}
+
+
+def _remoto(cliente):
+    facturas = list(CargaPaginada(cliente, "facturas", "*, proveedores(nombre, nit)", tam_pagina=2))
+    tabla = armado_facturas.facturas_desde_supabase(facturas)
+    items = list(CargaPorIds(cliente, "factura_items", "*, catalogo_productos(codigo_arbol, nombre)",
+                             "factura_id", tabla["ID_Factura"], tam_pagina=2))
+    return facturas, items
+
+
+def _armar(facturas, items):
+    tabla = armado_facturas.facturas_desde_supabase(facturas)
+    return armado_facturas.productos_por_factura(armado_facturas.items_desde_supabase(items, tabla)[0], tabla)
+
+
+def test_el_espejo_da_el_mismo_orden_que_la_carga_remota(tmp_path, datos):
+    cliente = ClienteFalso(datos)
+    espejo = EspejoLocal(str(tmp_path / "espejo.sqlite"))
+    espejo.sincronizar(cliente)
+
+    facturas_remotas, items_remotos = _remoto(cliente)
+    facturas_locales = espejo.facturas()
+    items_locales = espejo.items(armado_facturas.facturas_desde_supabase(facturas_locales)["ID_Factura"])
+
+    assert [f["id"] for f in facturas_locales] == [f["id"] for f in facturas_remotas] == [7, 98, 100, 1001]
+    assert _armar(facturas_locales, items_locales) == _armar(facturas_remotas, items_remotos)
+
+
+def test_sincronizar_de_nuevo_no_cuenta_cambios(tmp_path, datos):
+    cliente = ClienteFalso(datos)
+    espejo = EspejoLocal(str(tmp_path / "espejo.sqlite"))
+    primera = espejo.sincronizar(cliente)
+    assert primera == {"proveedores": 1, "catalogo_productos": 2, "facturas": 4, "factura_items": 5}
+
+    assert sum(espejo.sincronizar(cliente).values()) == 0
+
+    datos["facturas"][1].update(estado_procesamiento="procesado", updated_at="2025-01-02T00:00:00")
+    assert espejo.sincronizar(cliente)["facturas"] == 1
+    assert [f["estado_procesamiento"] for f in espejo.facturas(estados=["procesado"])] == ["procesado"]
+
+
+def test_producto_corregido_en_el_catalogo_llega_a_las_lineas(tmp_path, datos):
+    cliente = ClienteFalso(datos)
+    espejo = EspejoLocal(str(tmp_path / "espejo.sqlite"))
+    espejo.sincronizar(cliente)
+
+    # Solo cambia la fila del catálogo; las líneas que la usan conservan su updated_at
+    datos["catalogo_productos"][1].update(codigo_arbol="P11", updated_at="2025-01-02T00:00:00")
+    assert espejo.sincronizar(cliente) == {
+        "proveedores": 0, "catalogo_productos": 1, "facturas": 0, "factura_items": 0
+    }
+
+    codigos = {i["id"]: i["catalogo_productos"]["codigo_arbol"] for i in espejo.items(["7", "98"])}
+    assert codigos == {9: "P10", 10: "P11", 100: "P10", 1000: "P11"}
+
+
+def test_espejo_con_formato_anterior_se_vuelve_a_bajar(tmp_path, datos):
+    ruta = str(tmp_path / "espejo.sqlite")
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE facturas (id TEXT PRIMARY KEY, marca TEXT, datos TEXT)")
+    conexion.execute("INSERT INTO facturas VALUES ('98', ?, '{}')", (MARCA,))
+    conexion.commit()
+    conexion.close()
+
+    espejo = EspejoLocal(ruta)
+    assert not espejo.tiene_datos()
+    espejo.sincronizar(ClienteFalso(datos))
+    assert [f["id"] for f in espejo.facturas()] == [7, 98, 100, 1001]
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from indice_pdf import IndicePDF, palabras_proveedor
+
+
+def _pdf(carpeta, nombre, mtime=None):
+    ruta = carpeta / nombre
+    ruta.write_bytes(b"%PDF")
+    if mtime is not None:
+        os.utime(ruta, (mtime, mtime))
+    return str(ruta)
+
+
+@pytest.fixture
+def carpetas(tmp_path):
+    proveedores, descargas = tmp_path / "proveedores", tmp_path / "descargas"
+    proveedores.mkdir()
+    descargas.mkdir()
+    return proveedores, descargas
+
+
+def test_palabras_proveedor_sin_tildes_ni_sociedad():
+    assert palabras_proveedor("Lácteos del Valle S.A.S.") == {"lacteos", "valle"}
+
+
+def test_busca_por_nit_con_y_sin_digito_de_verificacion(carpetas):
+    proveedores, _ = carpetas
+    ruta = _pdf(proveedores, "Factura 900123456 Lacteos.pdf")
+    indice = IndicePDF([proveedores])
+
+    assert indice.buscar("Lácteos del Valle", "900123456") == ruta
+    assert indice.buscar("Lácteos del Valle", "900.123.456-7") == ruta
+    assert indice.buscar("Lácteos del Valle", "800999999") is None
+
+
+def test_desempata_por_nombre_y_luego_por_fecha(carpetas):
+    proveedores, _ = carpetas
+    _pdf(proveedores, "900123456 carnes.pdf", mtime=2_000)
+    viejo = _pdf(proveedores, "900123456 lacteos enero.pdf", mtime=1_000)
+    nuevo = _pdf(proveedores, "900123456 lacteos febrero.pdf", mtime=1_500)
+    indice = IndicePDF([proveedores])
+
+    assert indice.buscar("LACTEOS SAS", "900123456") == nuevo
+    os.remove(nuevo)
+    assert indice.buscar("LACTEOS SAS", "900123456") == viejo
+
+
+def test_el_id_de_descarga_tiene_prioridad(carpetas):
+    proveedores, descargas = carpetas
+    _pdf(proveedores, "900123456 lacteos.pdf")
+    descargada = _pdf(descargas, "factura_42.pdf")
+    indice = IndicePDF([proveedores, descargas])
+
+    assert indice.buscar("Lacteos", "900123456", factura_id=42) == descargada
+
+
+def test_reconstruye_si_el_archivo_cambio_sin_cambiar_la_carpeta(carpetas):
+    proveedores, _ = carpetas
+    ruta = _pdf(proveedores, "900123456 lacteos.pdf", mtime=1_000)
+    indice = IndicePDF([proveedores])
+    assert indice.buscar("Lacteos", "900123456") == ruta
+
+    os.utime(ruta, (3_000, 3_000))
+    escaneos = []
+    escanear = indice._escanear
+    indice._escanear = lambda carpeta: escaneos.append(carpeta) or escanear(carpeta)
+
+    assert indice.buscar("Lacteos", "900123456") == ruta
+    assert escaneos == [str(proveedores)]
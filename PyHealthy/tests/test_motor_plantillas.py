@@ -0,0 +1,141 @@
+import cv2
+import numpy as np
+import pytest
+
+import motor_plantillas
+
+
+def _plantilla():
+    plantilla = np.full((40, 120), 200, np.uint8)
+    cv2.rectangle(plantilla, (5, 5), (114, 34), 40, 2)
+    cv2.putText(plantilla, "Grabar", (15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 0, 2)
+    return plantilla
+
+
+def _frame(x, y, escala=1.0, alto=1080, ancho=1920):
+    """Ruido oscuro con la plantilla (a `escala`) pegada en (x, y); devuelve (frame, centro)"""
+    frame = np.random.default_rng(0).integers(0, 60, (alto, ancho)).astype(np.uint8)
+    boton = motor_plantillas._escalar(_plantilla(), escala)
+    frame[y:y + boton.shape[0], x:x + boton.shape[1]] = boton
+    return frame, (x + boton.shape[1] // 2, y + boton.shape[0] // 2)
+
+
+@pytest.fixture(autouse=True)
+def motor(monkeypatch, tmp_path):
+    monkeypatch.setattr(motor_plantillas, "_plantillas", {"grabar.png": _plantilla()})
+    monkeypatch.setattr(motor_plantillas, "_regiones", {})
+    monkeypatch.setattr(motor_plantillas, "_escaladas", {})
+    monkeypatch.setattr(motor_plantillas, "_escala_sesion", None)
+    monkeypatch.setattr(motor_plantillas, "_calibrada_en_sesion", False)
+    monkeypatch.setattr(motor_plantillas, "_fallos_seguidos", {})
+    monkeypatch.setattr(motor_plantillas, "ARCHIVO_REGIONES", str(tmp_path / "regiones.json"))
+
+
+def test_mosaico_coincide_con_la_busqueda_directa(monkeypatch):
+    # Con 4 franjas de 270 filas el botón cruza el borde entre la primera y la segunda
+    frame, centro = _frame(700, 250)
+    plantilla = _plantilla()
+
+    monkeypatch.setattr(motor_plantillas, "TRABAJADORES_MOSAICO", 4)
+    en_mosaico = motor_plantillas._correlacionar(frame, plantilla)
+    monkeypatch.setattr(motor_plantillas, "TRABAJADORES_MOSAICO", 1)
+    directo = motor_plantillas._correlacionar(frame, plantilla)
+
+    assert en_mosaico[1] == directo[1]
+    assert en_mosaico[0] == pytest.approx(directo[0])
+    coincidencia = motor_plantillas.localizar_en_frame(frame, "grabar.png")
+    assert (coincidencia.x, coincidencia.y) == centro
+
+
+def test_calibra_la_escala_y_la_reutiliza():
+    frame, centro = _frame(900, 500, escala=1.25)
+    assert motor_plantillas.localizar_en_frame(frame, "grabar.png") is None
+
+    coincidencia = motor_plantillas.localizar(frame, "grabar.png")
+
+    assert motor_plantillas.escala_sesion() == pytest.approx(1.25)
+    assert (coincidencia.x, coincidencia.y) == centro
+    assert motor_plantillas.plantilla_escalada("grabar.png").shape == (50, 150)
+
+
+def test_coincidencia_directa_fija_la_escala_sin_calibrar(monkeypatch):
+    frame, _ = _frame(100, 100)
+    monkeypatch.setattr(motor_plantillas, "calibrar_escala", lambda *a, **k: pytest.fail("calibró"))
+
+    assert motor_plantillas.localizar(frame, "grabar.png") is not None
+    assert motor_plantillas.escala_sesion() == 1.0
+
+
+def test_memoriza_la_region_del_ultimo_acierto():
+    frame, centro = _frame(1500, 900)
+    motor_plantillas.localizar(frame, "grabar.png")
+
+    x, y, ancho, alto = motor_plantillas.region_recordada("grabar.png", frame)
+    assert x <= centro[0] - 60 and x + ancho >= centro[0] + 60
+    assert y <= centro[1] - 20 and y + alto >= centro[1] + 20
+    assert ancho < 400 and alto < 300
+
+    # Persistida en disco y recuperada en otra sesión
+    motor_plantillas._regiones.clear()
+    motor_plantillas.cargar_regiones()
+    assert motor_plantillas.region_recordada("grabar.png", frame) == (x, y, ancho, alto)
+
+    # Otra resolución de pantalla invalida la memoria
+    otro, _ = _frame(10, 10, alto=900, ancho=1600)
+    assert motor_plantillas.region_recordada("grabar.png", otro) is None
+
+
+def test_busca_en_pantalla_completa_si_el_boton_se_movio():
+    frame, _ = _frame(1500, 900)
+    motor_plantillas.localizar(frame, "grabar.png")
+
+    movido, centro = _frame(50, 50)
+    coincidencia = motor_plantillas.localizar(movido, "grabar.png")
+
+    assert (coincidencia.x, coincidencia.y) == centro
+    assert motor_plantillas._regiones["grabar.png"]["x"] == centro[0]
+
+
+@pytest.fixture
+def calibraciones(monkeypatch):
+    llamadas = []
+    calibrar = motor_plantillas.calibrar_escala
+    monkeypatch.setattr(motor_plantillas, "calibrar_escala",
+                        lambda *a, **k: llamadas.append(1) or calibrar(*a, **k))
+    return llamadas
+
+
+def test_esperar_un_boton_ausente_calibra_una_sola_vez(calibraciones):
+    vacio, _ = _frame(0, 0, alto=600, ancho=800)
+    vacio[:] = 30
+
+    for _ in range(3 * motor_plantillas.FALLOS_PARA_CALIBRAR):
+        assert motor_plantillas.localizar(vacio, "grabar.png") is None
+
+    assert len(calibraciones) == 1
+    assert motor_plantillas.escala_sesion() is None
+
+    # Cuando por fin aparece, sin escalar, la sesión queda en 1.0 sin calibrar de nuevo
+    frame, _ = _frame(100, 100, alto=600, ancho=800)
+    assert motor_plantillas.localizar(frame, "grabar.png") is not None
+    assert motor_plantillas.escala_sesion() == 1.0
+    assert len(calibraciones) == 1
+
+
+def test_recalibra_tras_fallos_seguidos_de_un_boton_ya_encontrado(calibraciones):
+    frame, _ = _frame(100, 100)
+    motor_plantillas.localizar(frame, "grabar.png")
+    assert motor_plantillas.escala_sesion() == 1.0
+
+    # Cambió el zoom: los primeros fallos no calibran, el N-ésimo seguido sí
+    ampliado, centro = _frame(900, 500, escala=1.25)
+    for _ in range(motor_plantillas.FALLOS_PARA_CALIBRAR - 1):
+        assert motor_plantillas.localizar(ampliado, "grabar.png") is None
+    assert calibraciones == []
+
+    coincidencia = motor_plantillas.localizar(ampliado, "grabar.png")
+
+    assert len(calibraciones) == 1
+    assert (coincidencia.x, coincidencia.y) == centro
+    assert motor_plantillas.escala_sesion() == pytest.approx(1.25)
+    assert motor_plantillas._fallos_seguidos == {}
@@ -0,0 +1,89 @@
+import pytest
+
+import perfiles_tiempo as pt
+
+
+pytestmark = pytest.mark.usefixtures("perfiles_vacios")
+
+
+def _cargar(paso, segundos, n=10):
+    for _ in range(n):
+        pt.registrar_espera(paso, segundos)
+
+
+def test_sin_muestras_suficientes_usa_defecto():
+    _cargar("grabar.tras_click", 1.0, n=pt.MIN_MUESTRAS - 1)
+    assert pt.tope_aprendido("grabar.tras_click", 5) == 5
+
+
+def test_tope_es_percentil_con_margen():
+    _cargar("grabar.tras_click", 1.0)
+    esperado = 1.0 * pt.MARGEN_RELATIVO + pt.MARGEN_ABSOLUTO
+    assert pt.tope_aprendido("grabar.tras_click", 5) == pytest.approx(esperado)
+
+
+def test_tope_respeta_minimo_y_defecto():
+    _cargar("rapido", 0.1)
+    assert pt.tope_aprendido("rapido", 5, minimo=1.1) == pytest.approx(1.1)
+    _cargar("lento", 10.0)
+    assert pt.tope_aprendido("lento", 5) == 5
+
+
+def test_retroceso_multiplica_y_baja_con_aciertos():
+    _cargar("grabar.tras_click", 1.0)
+    base = pt.tope_aprendido("grabar.tras_click", 60)
+
+    pt.registrar_resultado("grabar.tras_click", False)
+    pt.registrar_resultado("grabar", False)
+    assert pt.tope_aprendido("grabar.tras_click", 60) == pytest.approx(base * pt.FACTOR_RETROCESO ** 2)
+
+    pt.registrar_resultado("grabar", True)
+    assert pt.tope_aprendido("grabar.tras_click", 60) == pytest.approx(base * pt.FACTOR_RETROCESO)
+    pt.registrar_resultado("grabar", True)
+    pt.registrar_resultado("grabar", True)
+    assert pt.tope_aprendido("grabar.tras_click", 60) == pytest.approx(base)
+
+
+def test_retroceso_no_pasa_del_nivel_maximo():
+    _cargar("grabar.tras_click", 1.0)
+    base = pt.tope_aprendido("grabar.tras_click", 60)
+    for _ in range(pt.NIVEL_MAXIMO + 3):
+        pt.registrar_resultado("grabar", False)
+    assert pt.tope_aprendido("grabar.tras_click", 60) == pytest.approx(
+        base * pt.FACTOR_RETROCESO ** pt.NIVEL_MAXIMO
+    )
+
+
+def test_espera_agotada_no_entra_en_el_percentil():
+    _cargar("producto.grabado", 1.0)
+    base = pt.tope_aprendido("producto.grabado", 60)
+
+    pt.registrar_espera("producto.grabado", base, agotada=True)
+    assert pt.muestras_de("producto.grabado") == [1.0] * 10
+    assert pt.tope_aprendido("producto.grabado", 60) == pytest.approx(base * pt.FACTOR_RETROCESO)
+
+
+def test_espera_estable_devuelve_el_tope_tras_agotadas():
+    _cargar("producto.grabado", 1.0)
+    base = pt.tope_aprendido("producto.grabado", 60)
+    for _ in range(pt.NIVEL_MAXIMO + 2):
+        pt.registrar_espera("producto.grabado", 60, agotada=True)
+    assert pt.tope_aprendido("producto.grabado", 60) == pytest.approx(
+        base * pt.FACTOR_RETROCESO ** pt.NIVEL_MAXIMO
+    )
+
+    pt.registrar_espera("producto.grabado", 1.0)
+    assert pt.tope_aprendido("producto.grabado", 60) == pytest.approx(base)
+
+
+def test_guardar_y_cargar_conserva_agotadas(tmp_path):
+    ruta = str(tmp_path / "perfiles.json")
+    _cargar("producto.grabado", 1.0)
+    pt.registrar_espera("producto.grabado", 5, agotada=True)
+    pt.registrar_resultado("producto", False)
+    tope = pt.tope_aprendido("producto.grabado", 60)
+
+    pt.guardar_perfiles(ruta, maquina="equipo")
+    pt.registrar_espera("producto.grabado", 30.0)
+    pt.cargar_perfiles(ruta, maquina="equipo")
+    assert pt.tope_aprendido("producto.grabado", 60) == pytest.approx(tope)
@@ -0,0 +1,29 @@
+import pandas as pd
+
+import planificador
+
+
+def test_planificar_ordena_por_unidad_y_fecha_estable():
+    df = pd.DataFrame({
+        "N° Factura": ["A", "B", "C", "D", "E"],
+        "Fecha": ["2025-01-12", "2025-01-10", "2025-01-12", "2025-01-10", "2025-01-11"],
+        "Unidad": ["0020", "0010", "0020", "", "0020"],
+    })
+    cola = planificador.planificar(df, "0010")
+    assert list(cola["N° Factura"]) == ["B", "D", "E", "A", "C"]
+    assert list(cola["_unidad"]) == ["0010", "0010", "0020", "0020", "0020"]
+    assert cola["_contexto"].tolist() == [
+        "0010|10012025", "0010|10012025", "0020|11012025", "0020|12012025", "0020|12012025",
+    ]
+
+
+def test_planificar_sin_columna_unidad_usa_la_de_la_sesion():
+    df = pd.DataFrame({"N° Factura": ["A", "B"], "Fecha": ["2025-01-12", "2025-01-10"]})
+    cola = planificador.planificar(df, "0007")
+    assert list(cola["N° Factura"]) == ["B", "A"]
+    assert set(cola["_unidad"]) == {"0007"}
+
+
+def test_pasos_sin_contexto():
+    pasos = [("unidad", 1), ("fecha", 2), ("aplicar_filtro", 3), ("nuevo", 4)]
+    assert planificador.pasos_sin_contexto(pasos) == [("nuevo", 4)]
@@ -0,0 +1,162 @@
+import pytest
+
+import bitacora
+import proceso_facturas
+import trazas
+from proceso_facturas import SIN_CONFIRMAR
+
+
+@pytest.fixture(autouse=True)
+def sin_efectos_globales(perfiles_vacios):
+    with trazas.suspendidas():
+        yield
+
+
+class DriverPrueba:
+    """Driver que devuelve los resultados programados por paso y anota cada llamada"""
+    nombre = "prueba"
+    puede_reabrir = True
+
+    def __init__(self, **resultados):
+        self.resultados = {paso: list(r) for paso, r in resultados.items()}
+        self.llamadas = []
+
+    def _paso(self, nombre):
+        self.llamadas.append(nombre)
+        programados = self.resultados.get(nombre)
+        return programados.pop(0) if programados else True
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return lambda *args: self._paso(nombre)
+
+
+FACTURA = {"N° Factura": "F-1", "NIT": "900", "Fecha": "2025-01-10"}
+PRODUCTOS = [
+    {"Código Producto": "P1", "Cantidad": "1", "Precio": "10"},
+    {"Código Producto": "P2", "Cantidad": "2", "Precio": "20"},
+]
+
+
+def test_producto_sin_confirmar_no_se_repite_y_queda_para_revision(tmp_path):
+    b = bitacora.Bitacora(str(tmp_path / "facturas_prueba.jsonl"))
+    driver = DriverPrueba(agregar_producto=[True, SIN_CONFIRMAR])
+
+    assert proceso_facturas.procesar_factura(driver, "0020", FACTURA, PRODUCTOS, bitacora=b) is False
+    assert driver.llamadas.count("agregar_producto") == 2
+    assert "reanclar" not in driver.llamadas
+    assert "finalizar" not in driver.llamadas
+
+    estado = b.estado(bitacora.clave_factura("0020", FACTURA))
+    assert estado.producto_grabado(0, "P1")
+    assert not estado.producto_grabado(1, "P2")
+    assert estado.revisar
+    assert estado.paso_fallido == "producto 2"
+
+    # Al reanudar no se vuelve a tocar: queda para revisión manual
+    reanudado = DriverPrueba()
+    assert proceso_facturas.procesar_factura(reanudado, "0020", FACTURA, PRODUCTOS, bitacora=b) is False
+    assert reanudado.llamadas == []
+    b.cerrar()
+
+
+def test_producto_que_no_llego_a_grabar_se_reintenta():
+    driver = DriverPrueba(agregar_producto=[True, False, True])
+    assert proceso_facturas.procesar_factura(driver, "0020", FACTURA, PRODUCTOS) is True
+    assert driver.llamadas.count("agregar_producto") == 3
+    assert driver.llamadas.count("reanclar") == 1
+
+
+# ---------- políticas de reintento ----------
+
+def test_paso_reintenta_con_su_recuperacion():
+    driver = DriverPrueba()
+    resultados = iter([False, True])
+    resultado = proceso_facturas.ejecutar_paso(driver, "pdf", lambda: next(resultados), {})
+    assert resultado == proceso_facturas.COMPLETADO
+    assert driver.llamadas == ["cancelar"]
+
+
+def test_paso_agota_sus_reintentos():
+    driver = DriverPrueba()
+    llamadas = []
+    politica = proceso_facturas.POLITICAS_PASO["remitente"]
+
+    resultado = proceso_facturas.ejecutar_paso(driver, "remitente", lambda: llamadas.append(1), {})
+    assert resultado == proceso_facturas.FALLIDO
+    assert len(llamadas) == politica.reintentos + 1
+    assert driver.llamadas == []
+
+
+def test_error_en_la_accion_cuenta_como_fallo():
+    def falla():
+        raise RuntimeError("sin pantalla")
+
+    assert proceso_facturas.ejecutar_paso(DriverPrueba(), "desconocido", falla, {}) == proceso_facturas.FALLIDO
+
+
+def test_recarga_devuelve_recargado_y_conserva_el_conteo():
+    driver = DriverPrueba()
+    intentos = {}
+    assert proceso_facturas.ejecutar_paso(driver, "unidad", lambda: False, intentos) == proceso_facturas.RECARGADO
+    assert driver.llamadas == ["recargar"]
+    assert intentos["unidad"][0] == 1
+
+
+def test_presupuesto_agotado_no_reintenta():
+    intentos = {"grabar": [0, 0.0]}   # empezó hace mucho
+    llamadas = []
+    resultado = proceso_facturas.ejecutar_paso(
+        DriverPrueba(), "grabar", lambda: llamadas.append(1), intentos
+    )
+    assert resultado == proceso_facturas.FALLIDO
+    assert len(llamadas) == 1
+
+
+def test_sin_confirmar_no_se_reintenta():
+    llamadas = []
+
+    def grabar():
+        llamadas.append(1)
+        return SIN_CONFIRMAR
+
+    assert proceso_facturas.ejecutar_paso(DriverPrueba(), "grabar", grabar, {}) == SIN_CONFIRMAR
+    assert len(llamadas) == 1
+
+
+def test_encabezado_sin_confirmar_no_se_anota_como_grabado(tmp_path):
+    b = bitacora.Bitacora(str(tmp_path / "facturas_prueba.jsonl"))
+    driver = DriverPrueba(grabar=[SIN_CONFIRMAR])
+
+    assert proceso_facturas.procesar_factura(driver, "0020", FACTURA, PRODUCTOS, bitacora=b) is False
+    assert driver.llamadas.count("grabar") == 1
+    assert "abrir_productos" not in driver.llamadas
+    estado = b.estado(bitacora.clave_factura("0020", FACTURA))
+    assert not estado.encabezado
+    assert estado.revisar and estado.paso_fallido == "grabar"
+    b.cerrar()
+
+
+def test_fecha_invalida_queda_en_la_bitacora(tmp_path):
+    b = bitacora.Bitacora(str(tmp_path / "facturas_prueba.jsonl"))
+    factura = dict(FACTURA, Fecha="no es fecha")
+    driver = DriverPrueba()
+
+    assert proceso_facturas.procesar_factura(driver, "0020", factura, PRODUCTOS, bitacora=b) is False
+    assert driver.llamadas == []
+    assert b.estado(bitacora.clave_factura("0020", factura)).paso_fallido == "fecha"
+    b.cerrar()
+
+
+def test_driver_sin_reapertura_deja_la_factura_a_medias_como_fallida(tmp_path):
+    b = bitacora.Bitacora(str(tmp_path / "facturas_prueba.jsonl"))
+    clave = bitacora.clave_factura("0020", FACTURA)
+    b.registrar(clave, bitacora.PASO_ENCABEZADO)
+    driver = DriverPrueba()
+    driver.puede_reabrir = False
+
+    assert proceso_facturas.procesar_factura(driver, "0020", FACTURA, PRODUCTOS, bitacora=b) is False
+    assert driver.llamadas == []
+    assert b.estado(clave).paso_fallido == "abrir_factura"
+    b.cerrar()
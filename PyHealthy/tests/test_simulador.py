@@ -0,0 +1,82 @@
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+import perfiles_tiempo
+import planificador
+import simulador
+
+pytestmark = pytest.mark.usefixtures("perfiles_vacios")
+
+
+def _cola():
+    df = pd.DataFrame({
+        "N° Factura": ["F-1", "F-2", "F-3"],
+        "NIT": ["900", "900", "800"],
+        "Fecha": ["2025-01-10", "2025-01-10", "2025-01-11"],
+        "Unidad": ["0020", "0020", "0020"],
+    })
+    productos = {"F-1": [{"Código Producto": "P1", "Cantidad": "1", "Precio": "1"}] * 2,
+                 "F-2": [{"Código Producto": "P2", "Cantidad": "1", "Precio": "1"}],
+                 "F-3": []}
+    return planificador.planificar(df, "0020"), productos
+
+
+def test_estimar_da_un_eta_por_factura_y_reutiliza_el_contexto():
+    cola, productos = _cola()
+    etas, total = simulador.estimar(cola, productos, estrategia="fijo")
+    assert etas["N° Factura"].tolist() == ["F-1", "F-2", "F-3"]
+    assert total == etas["fin_s"].iloc[-1]
+    # F-2 comparte unidad y fecha con F-1: no repite unidad/fecha/filtro
+    assert etas["eta_s"].iloc[1] < etas["eta_s"].iloc[0]
+
+
+def test_estimar_no_cambia_los_perfiles():
+    for _ in range(10):
+        perfiles_tiempo.registrar_espera("grabar.guardado", 2.0)
+    perfiles_tiempo.registrar_resultado("grabar", False)
+    antes = perfiles_tiempo.resumen_perfiles()
+
+    simulador.estimar(*_cola(), estrategia="aprendido")
+    assert perfiles_tiempo.resumen_perfiles() == antes
+
+
+def test_carga_real_en_otro_hilo_sigue_registrando_durante_la_estimacion(monkeypatch):
+    cola, productos = _cola()
+    en_estimacion, listo = threading.Event(), threading.Event()
+
+    def carga_real():
+        en_estimacion.wait(5)
+        perfiles_tiempo.registrar_espera("grabar.guardado", 3.0)
+        perfiles_tiempo.registrar_resultado("grabar", False)
+        listo.set()
+
+    original = simulador.DriverSimulado.abrir
+
+    def abrir_y_esperar(driver):
+        en_estimacion.set()
+        listo.wait(5)
+        return original(driver)
+
+    monkeypatch.setattr(simulador.DriverSimulado, "abrir", abrir_y_esperar)
+    hilo = threading.Thread(target=carga_real)
+    hilo.start()
+    simulador.estimar(cola, productos)
+    hilo.join()
+
+    resumen = perfiles_tiempo.resumen_perfiles()
+    assert resumen["grabar.guardado"]["muestras"] == [3.0]
+    assert resumen["grabar.guardado"]["nivel_retroceso"] == 1
+
+
+def test_silencio_solo_en_el_hilo_y_restaura_stdout(capsys):
+    original = sys.stdout
+    with simulador._en_silencio():
+        print("callado")
+        hilo = threading.Thread(target=lambda: print("otro hilo"))
+        hilo.start()
+        hilo.join()
+    assert sys.stdout is original
+    assert capsys.readouterr().out == "otro hilo\n"
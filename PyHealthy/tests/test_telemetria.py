@@ -0,0 +1,51 @@
+import csv
+
+import pytest
+
+import telemetria
+
+
+@pytest.fixture(autouse=True)
+def limpia():
+    telemetria.reiniciar_telemetria()
+    yield
+    telemetria.reiniciar_telemetria()
+
+
+def test_histograma_por_cubetas():
+    histograma = telemetria._histograma([50, 100, 101, 20000, 25000])
+    assert histograma["<=100"] == 2
+    assert histograma["<=250"] == 1
+    assert histograma["<=20000"] == 1
+    assert histograma[">20000"] == 1
+    assert sum(histograma.values()) == 5
+    assert set(telemetria._histograma([]).values()) == {0}
+
+
+def test_resumen_por_boton():
+    telemetria.registrar_busqueda("grabar.png", True, 2, 5, 300, ms_primera=120, ms_estable=250, confianza=0.97)
+    telemetria.registrar_busqueda("grabar.png", True, 1, 2, 100, ms_primera=80, ms_estable=90, confianza=0.93)
+    telemetria.registrar_busqueda("grabar.png", False, 10, 40, 5000)
+
+    resumen = telemetria.resumen_por_boton()["grabar.png"]
+
+    assert resumen["busquedas"] == 3
+    assert resumen["fallidas"] == 1
+    assert resumen["ms_total_suma"] == 5400
+    assert resumen["ms_primera_p50"] == 100
+    assert resumen["confianza_min"] == 0.93
+    # Las búsquedas fallidas no cuentan para la estabilidad
+    assert sum(resumen["histograma_estable_ms"].values()) == 2
+    assert resumen["histograma_total_ms"]["<=5000"] == 1
+
+
+def test_exporta_json_y_csv(tmp_path):
+    assert telemetria.exportar_telemetria(str(tmp_path), "vacio") is None
+    telemetria.registrar_busqueda("finalizar.png", True, 1, 1, 40, ms_primera=40, ms_estable=40, confianza=1)
+
+    _, ruta_csv = telemetria.exportar_telemetria(str(tmp_path), "prueba")
+
+    with open(ruta_csv, encoding="utf8") as f:
+        filas = list(csv.DictReader(f))
+    assert filas[0]["boton"] == "finalizar.png"
+    assert filas[0]["total_<=100"] == "1"
@@ -0,0 +1,70 @@
+import json
+import threading
+
+import pytest
+
+import trazas
+
+
+@pytest.fixture(autouse=True)
+def limpias():
+    trazas.iniciar_trazas()
+    yield
+    trazas.iniciar_trazas()
+
+
+def test_tramos_anidados_y_exportacion(tmp_path):
+    with trazas.tramo("factura 1", "factura", numero="1"):
+        with trazas.tramo("grabar", "paso") as args:
+            args["resultado"] = True
+        espera = trazas.abrir("esperar grabar", trazas.CATEGORIA_ESPERA)
+        trazas.cerrar(espera, agotada=False)
+
+    ruta = trazas.exportar_trazas(str(tmp_path), "prueba")
+    with open(ruta, encoding="utf8") as f:
+        eventos = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+
+    por_nombre = {e["name"]: e for e in eventos}
+    factura, grabar = por_nombre["factura 1"], por_nombre["grabar"]
+    assert grabar["args"] == {"resultado": True}
+    assert por_nombre["esperar grabar"]["args"] == {"agotada": False}
+    # El paso queda contenido en la factura y en el mismo carril
+    assert factura["ts"] <= grabar["ts"]
+    assert grabar["ts"] + grabar["dur"] <= factura["ts"] + factura["dur"]
+    assert factura["tid"] == grabar["tid"]
+
+
+def test_excepcion_queda_anotada_y_se_propaga():
+    with pytest.raises(ValueError):
+        with trazas.tramo("finalizar", "paso"):
+            raise ValueError("sin confirmar")
+    assert trazas._eventos[0]["args"]["error"] == "ValueError('sin confirmar')"
+
+
+def test_suspendidas_solo_en_el_hilo_que_las_pide():
+    listo = threading.Event()
+
+    def otro_hilo():
+        with trazas.tramo("real", "paso"):
+            pass
+        listo.set()
+
+    with trazas.suspendidas():
+        with trazas.tramo("simulado", "paso"):
+            hilo = threading.Thread(target=otro_hilo)
+            hilo.start()
+            hilo.join()
+    assert listo.is_set()
+    assert [e["name"] for e in trazas._eventos] == ["real"]
+
+
+def test_resumen_esperas_ordenado_por_tiempo():
+    for nombre, dur in (("corta", 1e5), ("larga", 2e6), ("corta", 2e5)):
+        trazas._eventos.append({"name": nombre, "cat": trazas.CATEGORIA_ESPERA, "ph": "X", "dur": dur})
+    trazas._eventos.append({"name": "grabar", "cat": "paso", "ph": "X", "dur": 9e6})
+
+    assert trazas.resumen_esperas() == [("larga", 1, 2.0), ("corta", 2, 0.3)]
+
+
+def test_sin_tramos_no_exporta(tmp_path):
+    assert trazas.exportar_trazas(str(tmp_path), "vacio") is None
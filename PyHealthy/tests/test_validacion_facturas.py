@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+import armado_facturas
+import validacion_facturas
+
+
+def _factura(numero="F-1", fecha="2025-01-10", nit="900", empresa="Proveedor A"):
+    return {"ID_Factura": numero, "N° Factura": numero, "Fecha": fecha, "Empresa": empresa, "NIT": nit}
+
+
+def _producto(codigo="P1", cantidad="2", precio="1000"):
+    return {"Código Producto": codigo, "Nombre Producto": "X", "Cantidad": cantidad, "Precio": precio}
+
+
+def _validar(facturas, productos, **kwargs):
+    return validacion_facturas.validar_facturas(pd.DataFrame(facturas), productos, **kwargs)
+
+
+def test_factura_correcta_es_ejecutable():
+    veredicto = _validar([_factura()], {"F-1": [_producto()]})
+    assert veredicto["ejecutable"].tolist() == [True]
+    assert veredicto["motivos"].tolist() == [""]
+    assert veredicto["productos"].tolist() == [1]
+
+
+@pytest.mark.parametrize("factura, productos, motivo", [
+    (_factura(numero=""), {"": [_producto()]}, "sin número de factura"),
+    (_factura(fecha="no es fecha"), {"F-1": [_producto()]}, "fecha inválida"),
+    (_factura(nit="Sin NIT"), {"F-1": [_producto()]}, "sin NIT"),
+    (_factura(), {"F-1": []}, "sin productos"),
+    (_factura(), {"F-1": [_producto(codigo="SIN CODIGO"), _producto(codigo=" ")]}, "2 producto(s) sin código"),
+    (_factura(), {"F-1": [_producto(cantidad="0"), _producto(cantidad="abc")]}, "2 cantidad(es) inválida(s)"),
+    (_factura(), {"F-1": [_producto(precio="-1")]}, "1 precio(s) inválido(s)"),
+])
+def test_cada_regla(factura, productos, motivo):
+    veredicto = _validar([factura], productos)
+    assert veredicto["ejecutable"].tolist() == [False]
+    assert veredicto["motivos"].tolist() == [motivo]
+
+
+def test_numero_repetido_marca_ambas_facturas():
+    veredicto = _validar([_factura(), _factura()], {"F-1": [_producto()]})
+    assert veredicto["motivos"].tolist() == ["número de factura repetido"] * 2
+
+
+def test_decimales_con_coma_y_precio_cero_son_validos():
+    veredicto = _validar([_factura()], {"F-1": [_producto(cantidad="2,5", precio="0")]})
+    assert veredicto["ejecutable"].tolist() == [True]
+
+
+def test_varios_motivos_se_unen():
+    veredicto = _validar([_factura(fecha="", nit="")], {"F-1": []})
+    assert veredicto["motivos"].tolist() == ["fecha inválida; sin NIT; sin productos"]
+
+
+def test_pdf_no_encontrado():
+    rutas = {"F-1": "/pdf/f1.pdf"}
+
+    def buscar_pdf(empresa, nit, factura_id):
+        if factura_id == "F-3":
+            raise OSError("disco no disponible")
+        return rutas.get(factura_id)
+
+    facturas = [_factura("F-1"), _factura("F-2"), _factura("F-3")]
+    productos = {n: [_producto()] for n in ("F-1", "F-2", "F-3")}
+    veredicto = _validar(facturas, productos, buscar_pdf=buscar_pdf)
+    assert veredicto["ruta_pdf"].tolist()[0] == "/pdf/f1.pdf"
+    assert veredicto["motivos"].tolist() == ["", "PDF no encontrado", "PDF no encontrado"]
+
+    opcional = _validar(facturas, productos, buscar_pdf=buscar_pdf, pdf_obligatorio=False)
+    assert opcional["ejecutable"].all()
+
+
+def test_acepta_la_tabla_de_items():
+    df_facturas = pd.DataFrame([_factura("F-1"), _factura("F-2")])
+    items = pd.DataFrame(
+        [_producto(), _producto(cantidad="x")], index=pd.Index(["F-1", "F-2"], name="N° Factura")
+    )[armado_facturas.COLUMNAS_PRODUCTO]
+    veredicto = validacion_facturas.validar_facturas(df_facturas, items)
+    assert veredicto["motivos"].tolist() == ["", "1 cantidad(es) inválida(s)"]
+
+
+def test_exportar_reporte(tmp_path):
+    veredicto = _validar([_factura("F-1"), _factura("F-2", nit="")], {"F-1": [_producto()], "F-2": [_producto()]})
+    ruta = validacion_facturas.exportar_reporte(veredicto, str(tmp_path), "prueba")
+    reporte = pd.read_csv(ruta, encoding="utf-8-sig", dtype=str)
+    assert reporte["N° Factura"].tolist() == ["F-2"]
+    assert reporte["motivos"].tolist() == ["sin NIT"]
+
+    assert validacion_facturas.exportar_reporte(veredicto.iloc[:1], str(tmp_path), "prueba") is None
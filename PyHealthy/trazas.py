@@ -0,0 +1,156 @@
+"""
+Trazas por tramos (factura, paso, producto, espera, búsqueda de botón).
+
+Cada tramo se guarda como un evento completo ("ph": "X") del formato Trace
+Event de Chrome; exportar_trazas escribe un JSON que se abre directamente en
+https://ui.perfetto.dev o chrome://tracing, con un carril por hilo y los
+tramos anidados según se abrieron. Al exportar también se imprime qué
+esperas dominaron la ejecución.
+
+Uso:
+    with trazas.tramo("grabar", "paso", factura="123"):
+        ...
+o, cuando el bloque es un cuerpo de bucle largo con `continue`:
+    t = trazas.abrir("informe 001", "informe")
+    ...
+    trazas.cerrar(t)
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+CATEGORIA_ESPERA = "espera"
+ESPERAS_EN_RESUMEN = 8
+
+_eventos = []
+_hilos = {}
+_lock_trazas = threading.Lock()
+_origen = time.perf_counter()
+_suspension = threading.local()
+
+
+def _us(instante):
+    return round((instante - _origen) * 1e6, 1)
+
+
+def _id_hilo():
+    ident = threading.get_ident()
+    with _lock_trazas:
+        if ident not in _hilos:
+            _hilos[ident] = (len(_hilos) + 1, threading.current_thread().name)
+        return _hilos[ident][0]
+
+
+def iniciar_trazas():
+    """Descarta las trazas anteriores y reinicia el reloj"""
+    global _origen
+    with _lock_trazas:
+        _eventos.clear()
+        _hilos.clear()
+        _origen = time.perf_counter()
+
+
+@contextmanager
+def suspendidas():
+    """No registra tramos en este hilo dentro del bloque (p. ej. simulaciones)"""
+    anterior = getattr(_suspension, "activa", False)
+    _suspension.activa = True
+    try:
+        yield
+    finally:
+        _suspension.activa = anterior
+
+
+def abrir(nombre, categoria, **args):
+    """Empieza un tramo; devuelve el token que recibe cerrar()"""
+    if getattr(_suspension, "activa", False):
+        return None
+    return {"name": nombre, "cat": categoria, "tid": _id_hilo(), "inicio": time.perf_counter(), "args": args}
+
+
+def cerrar(token, **args):
+    """Termina un tramo (None se ignora); `args` se agregan a los del tramo"""
+    if token is None:
+        return
+    fin = time.perf_counter()
+    token["args"].update(args)
+    evento = {
+        "name": token["name"],
+        "cat": token["cat"],
+        "ph": "X",
+        "ts": _us(token["inicio"]),
+        "dur": round((fin - token["inicio"]) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": token["tid"],
+        "args": {k: _serializable(v) for k, v in token["args"].items()},
+    }
+    with _lock_trazas:
+        _eventos.append(evento)
+
+
+@contextmanager
+def tramo(nombre, categoria, **args):
+    """
+    Tramo como bloque `with`. Devuelve el dict de argumentos, que se puede
+    completar dentro del bloque (p. ej. resultado=True). Una excepción queda
+    anotada como error y se propaga.
+    """
+    token = abrir(nombre, categoria, **args)
+    argumentos = token["args"] if token else {}
+    try:
+        yield argumentos
+    except BaseException as e:
+        argumentos["error"] = repr(e)
+        raise
+    finally:
+        cerrar(token)
+
+
+def _serializable(valor):
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
+
+def resumen_esperas():
+    """[(nombre, veces, segundos totales)] de las esperas, de mayor a menor"""
+    totales = {}
+    with _lock_trazas:
+        for evento in _eventos:
+            if evento["cat"] == CATEGORIA_ESPERA and evento["ph"] == "X":
+                veces, us = totales.get(evento["name"], (0, 0.0))
+                totales[evento["name"]] = (veces + 1, us + evento["dur"])
+    return sorted(
+        ((nombre, veces, round(us / 1e6, 2)) for nombre, (veces, us) in totales.items()),
+        key=lambda fila: fila[2], reverse=True
+    )
+
+
+def exportar_trazas(carpeta, nombre_proceso):
+    """Escribe el JSON de Trace Event de Chrome; devuelve la ruta o None si no hay tramos"""
+    with _lock_trazas:
+        eventos = list(_eventos)
+        hilos = list(_hilos.values())
+    if not eventos:
+        return None
+
+    metadatos = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0,
+                  "args": {"name": f"DataSpectra {nombre_proceso}"}}]
+    metadatos += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                   "args": {"name": nombre}} for tid, nombre in hilos]
+
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{nombre_proceso}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.trace.json")
+    with open(ruta, "w", encoding="utf8") as f:
+        json.dump({"traceEvents": metadatos + eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    esperas = resumen_esperas()
+    if esperas:
+        print("🧵 Esperas que más pesaron:")
+        for nombre, veces, segundos in esperas[:ESPERAS_EN_RESUMEN]:
+            print(f"   {nombre:32s} {veces:4d}x  {segundos:8.1f}s")
+    print(f"🧵 Trazas exportadas: {ruta} (abrir en https://ui.perfetto.dev)")
+    return ruta
@@ -0,0 +1,141 @@
+"""
+Validación previa de las facturas cargadas (Excel o Supabase) antes de abrir
+TecFood.
+
+Revisa df_facturas y productos_por_factura en una sola pasada vectorizada
+con pandas y devuelve un veredicto por factura: las ejecutables pasan a la
+automatización y el resto vuelve en un reporte con sus motivos.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CODIGOS_INVALIDOS = ("", "SIN CODIGO", "NONE", "NAN")
+NITS_INVALIDOS = ("", "SIN NIT", "NONE", "NAN")
+
+
+def convertir_fechas(serie):
+    """Convierte como procesar_factura (pd.to_datetime por valor); inválidas → NaT"""
+    try:
+        return pd.to_datetime(serie, errors="coerce", format="mixed")
+    except (TypeError, ValueError):
+        # pandas < 2 no tiene format="mixed" y ya interpreta valor por valor
+        return pd.to_datetime(serie, errors="coerce")
+
+
+def _tabla_productos(productos_por_factura):
+    """
+    DataFrame con la columna 'N° Factura' desde productos_por_factura, o
+    desde la tabla de items de armado_facturas (indexada por N° Factura).
+    """
+    if isinstance(productos_por_factura, pd.DataFrame):
+        productos = productos_por_factura.rename_axis("N° Factura").reset_index()
+        productos["linea"] = productos.groupby("N° Factura").cumcount()
+        return productos[["N° Factura", "linea", "Código Producto", "Cantidad", "Precio"]]
+    filas = [
+        (numero, i, p.get("Código Producto", ""), p.get("Cantidad", ""), p.get("Precio", ""))
+        for numero, productos in productos_por_factura.items()
+        for i, p in enumerate(productos)
+    ]
+    return pd.DataFrame(filas, columns=["N° Factura", "linea", "Código Producto", "Cantidad", "Precio"])
+
+
+def _pdf_o_none(buscar_pdf, empresa, nit, factura_id):
+    try:
+        return buscar_pdf(empresa, nit, factura_id)
+    except Exception as e:
+        print(f"⚠️ No se pudo buscar el PDF de '{empresa}' ({nit}): {e}")
+        return None
+
+
+def _unir_motivos(indice, reglas):
+    """reglas = [(máscara booleana, texto)] → Serie con los motivos separados por '; '"""
+    motivos = np.full(len(indice), "", dtype=object)
+    for mascara, texto in reglas:
+        # El texto puede ser fijo o una Serie con un texto por fila (conteos)
+        texto = np.asarray(texto + "; ", dtype=object)
+        motivos = motivos + np.where(np.asarray(mascara, dtype=bool), texto, "")
+    return pd.Series(motivos, index=indice).str.rstrip("; ")
+
+
+def validar_facturas(df_facturas, productos_por_factura, buscar_pdf=None, pdf_obligatorio=True):
+    """
+    Devuelve un DataFrame (mismo orden que df_facturas) con las columnas
+    N° Factura, Empresa, NIT, productos, ruta_pdf, ejecutable y motivos.
+    Los productos pueden venir como dict {número: [producto]} o como la
+    tabla de items de armado_facturas.
+    `buscar_pdf(empresa, nit, factura_id)` es opcional; sin él no se revisan los PDF.
+    """
+    facturas = df_facturas.copy()
+    numero = facturas["N° Factura"].astype(str).str.strip()
+    nit = facturas.get("NIT", pd.Series("", index=facturas.index)).astype(str).str.strip()
+    empresa = facturas.get("Empresa", pd.Series("", index=facturas.index)).astype(str).str.strip()
+    ids = facturas.get("ID_Factura", pd.Series(None, index=facturas.index, dtype=object))
+
+    # --- Productos: una fila por línea, reglas por columna ---
+    productos = _tabla_productos(productos_por_factura)
+    codigo = productos["Código Producto"].astype(str).str.strip()
+    cantidad = pd.to_numeric(productos["Cantidad"].astype(str).str.replace(",", ".").str.strip(), errors="coerce")
+    precio = pd.to_numeric(productos["Precio"].astype(str).str.replace(",", ".").str.strip(), errors="coerce")
+    productos["sin_codigo"] = codigo.str.upper().isin(CODIGOS_INVALIDOS)
+    productos["cantidad_invalida"] = cantidad.isna() | (cantidad <= 0)
+    productos["precio_invalido"] = precio.isna() | (precio < 0)
+
+    por_factura = productos.groupby("N° Factura").agg(
+        productos=("linea", "size"),
+        sin_codigo=("sin_codigo", "sum"),
+        cantidad_invalida=("cantidad_invalida", "sum"),
+        precio_invalido=("precio_invalido", "sum"),
+    )
+    conteos = por_factura.reindex(numero.values, fill_value=0)
+    conteos.index = facturas.index
+
+    # --- PDF (búsqueda en disco, una por factura) ---
+    if buscar_pdf is not None:
+        ruta_pdf = pd.Series(
+            [_pdf_o_none(buscar_pdf, e, n, i) for e, n, i in zip(empresa, nit, ids)], index=facturas.index, dtype=object
+        )
+    else:
+        ruta_pdf = pd.Series(None, index=facturas.index, dtype=object)
+    sin_pdf = ruta_pdf.isna() if buscar_pdf is not None else pd.Series(False, index=facturas.index)
+
+    def _n(columna):
+        return conteos[columna].astype(int).astype(str)
+
+    reglas = [
+        (numero.isin(("", "nan", "None")), "sin número de factura"),
+        (numero.duplicated(keep=False) & (numero != ""), "número de factura repetido"),
+        (convertir_fechas(facturas["Fecha"]).isna(), "fecha inválida"),
+        (nit.str.upper().isin(NITS_INVALIDOS), "sin NIT"),
+        (conteos["productos"] == 0, "sin productos"),
+        (conteos["sin_codigo"] > 0, _n("sin_codigo") + " producto(s) sin código"),
+        (conteos["cantidad_invalida"] > 0, _n("cantidad_invalida") + " cantidad(es) inválida(s)"),
+        (conteos["precio_invalido"] > 0, _n("precio_invalido") + " precio(s) inválido(s)"),
+    ]
+    if pdf_obligatorio:
+        reglas.append((sin_pdf, "PDF no encontrado"))
+
+    motivos = _unir_motivos(facturas.index, reglas)
+
+    return pd.DataFrame({
+        "N° Factura": numero,
+        "Empresa": empresa,
+        "NIT": nit,
+        "productos": conteos["productos"].astype(int),
+        "ruta_pdf": ruta_pdf,
+        "ejecutable": motivos == "",
+        "motivos": motivos,
+    })
+
+
+def exportar_reporte(veredicto, carpeta, nombre_proceso):
+    """Guarda en CSV las facturas no ejecutables; devuelve la ruta o None si no hay"""
+    rechazadas = veredicto[~veredicto["ejecutable"]]
+    if rechazadas.empty:
+        return None
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{nombre_proceso}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv")
+    rechazadas.drop(columns=["ruta_pdf", "ejecutable"]).to_csv(ruta, index=False, encoding="utf-8-sig")
+    return ruta